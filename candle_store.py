@@ -0,0 +1,297 @@
+"""
+Инкрементальное хранилище OHLCV свечей
+Хранит историю в памяти по ключу (symbol, timeframe) и догружает с биржи
+только новые свечи вместо полного окна на каждом цикле.
+Старшие таймфреймы (config.RESAMPLE_TIMEFRAMES) досчитываются из базовых
+1m свечей, без отдельных запросов к бирже
+"""
+import logging
+import time
+import numpy as np
+import pandas as pd
+import config
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+TIMEFRAME_MS = {
+    '1m': 60_000,
+    '3m': 180_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+    '2h': 7_200_000,
+    '4h': 14_400_000,
+    '1d': 86_400_000
+}
+
+def timeframe_to_ms(timeframe):
+    """Длительность таймфрейма в миллисекундах"""
+    if timeframe not in TIMEFRAME_MS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return TIMEFRAME_MS[timeframe]
+
+def resample_ohlcv(ts, values, tf_ms):
+    """
+    Агрегирует свечи в бары таймфрейма tf_ms (векторно, одним проходом)
+    
+    Args:
+        ts: время открытия свечей в мс (int64, по возрастанию)
+        values: массив (5, n) - open, high, low, close, volume
+        tf_ms: длительность целевого таймфрейма в мс
+    
+    Returns:
+        ndarray (m, 6) в формате fetch_ohlcv; последний бар может быть неполным
+    """
+    buckets = ts - ts % tf_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return np.column_stack([
+        buckets[starts].astype(np.float64),
+        values[0, starts],
+        np.maximum.reduceat(values[1], starts),
+        np.minimum.reduceat(values[2], starts),
+        values[3, ends],
+        np.add.reduceat(values[4], starts)
+    ])
+
+class CandleSeries:
+    """
+    История свечей одного (symbol, timeframe) в колоночных numpy массивах
+    
+    Буфер имеет запас ёмкости x2: добавление амортизированно O(1),
+    при переполнении хвост из max_candles свечей копируется в новый буфер.
+    """
+    
+    def __init__(self, max_candles):
+        self.max_candles = max_candles
+        self._capacity = max_candles * 2
+        self._allocate()
+    
+    def _allocate(self):
+        """Новые пустые буферы (старые остаются у ранее выданных frame())"""
+        self._ts = np.zeros(self._capacity, dtype=np.int64)
+        self._values = np.zeros((5, self._capacity), dtype=np.float64)
+        self._len = 0
+    
+    def __len__(self):
+        return self._len
+    
+    @property
+    def timestamps(self):
+        """Время открытия свечей (мс) - представление без копии"""
+        return self._ts[:self._len]
+    
+    @property
+    def values(self):
+        """Массив (5, n): open, high, low, close, volume - представление без копии"""
+        return self._values[:, :self._len]
+    
+    @property
+    def last_timestamp(self):
+        """Время открытия последней (возможно, ещё формирующейся) свечи в мс"""
+        return int(self._ts[self._len - 1]) if self._len else None
+    
+    def reset(self):
+        """Очищает историю"""
+        self._allocate()
+    
+    def merge(self, ohlcv):
+        """
+        Вливает свечи из ответа fetch_ohlcv
+        
+        Свеча с тем же временем открытия, что и последняя сохранённая,
+        обновляет её на месте; более новые добавляются в конец; более
+        старые игнорируются.
+        
+        Returns:
+            int: Количество добавленных свечей
+        """
+        if ohlcv is None or len(ohlcv) == 0:
+            return 0
+        
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        ts = rows[:, 0].astype(np.int64)
+        
+        last_ts = self.last_timestamp
+        if last_ts is not None:
+            # Обновление формирующейся свечи на месте
+            same = np.nonzero(ts == last_ts)[0]
+            if len(same):
+                self._values[:, self._len - 1] = rows[same[-1], 1:]
+            newer = ts > last_ts
+            rows, ts = rows[newer], ts[newer]
+        
+        added = len(ts)
+        if added == 0:
+            return 0
+        
+        if added >= self.max_candles:
+            rows, ts = rows[-self.max_candles:], ts[-self.max_candles:]
+            self._allocate()
+        elif self._len + added > self._capacity:
+            # Новые буферы вместо сдвига на месте: ранее выданные frame()
+            # продолжают ссылаться на старые данные и не портятся
+            keep = self.max_candles - added
+            old_ts, old_values, old_len = self._ts, self._values, self._len
+            self._allocate()
+            self._ts[:keep] = old_ts[old_len - keep:old_len]
+            self._values[:, :keep] = old_values[:, old_len - keep:old_len]
+            self._len = keep
+        
+        end = self._len + len(ts)
+        self._ts[self._len:end] = ts
+        self._values[:, self._len:end] = rows[:, 1:].T
+        self._len = end
+        return added
+    
+    def frame(self, limit):
+        """
+        Последние limit свечей как DataFrame
+        
+        Колонки цен и объёма - представления (view) внутреннего буфера без
+        копирования; формирующаяся свеча в них обновится при следующем merge.
+        """
+        start = max(0, self._len - limit)
+        data = {'timestamp': pd.to_datetime(self._ts[start:self._len], unit='ms')}
+        for i, col in enumerate(OHLCV_COLUMNS[1:]):
+            data[col] = self._values[i, start:self._len]
+        return pd.DataFrame(data, copy=False)
+
+class CandleStore:
+    """
+    Кэш свечей по ключу (symbol, timeframe) с инкрементальной догрузкой
+    
+    Производные таймфреймы хранятся как обычные истории, но обновляются
+    из базового таймфрейма: пересчитывается только последний бар и
+    добавляются новые, поэтому стоимость обновления - O(новых свечей).
+    """
+    
+    def __init__(self, max_candles=None, base_timeframe=None, derived_timeframes=None):
+        self.max_candles = max_candles or config.CANDLE_STORE_SIZE
+        self.base_timeframe = base_timeframe or config.BASE_TIMEFRAME
+        if derived_timeframes is None:
+            derived_timeframes = config.RESAMPLE_TIMEFRAMES
+        self.derived_timeframes = [tf for tf in derived_timeframes if tf != self.base_timeframe]
+        self._series = {}
+    
+    def get_series(self, symbol, timeframe):
+        """Возвращает (создаёт при необходимости) историю для пары и таймфрейма"""
+        key = (symbol, timeframe)
+        if key not in self._series:
+            self._series[key] = CandleSeries(self.max_candles)
+        return self._series[key]
+    
+    def is_derived(self, timeframe):
+        """True если таймфрейм досчитывается из базового"""
+        return timeframe in self.derived_timeframes
+    
+    def source_timeframe(self, timeframe):
+        """Таймфрейм, который нужно запрашивать у биржи для timeframe"""
+        return self.base_timeframe if self.is_derived(timeframe) else timeframe
+    
+    def base_limit(self, timeframe, limit):
+        """Сколько базовых свечей нужно на limit баров производного таймфрейма"""
+        factor = timeframe_to_ms(timeframe) // timeframe_to_ms(self.base_timeframe)
+        # +1 бар: первый бар истории может оказаться неполным и отбрасывается
+        return min((limit + 1) * factor, self.max_candles)
+    
+    def resample(self, symbol, timeframe):
+        """
+        Досчитывает производный таймфрейм из базовых свечей
+        
+        Returns:
+            int: Количество добавленных баров
+        """
+        base = self.get_series(symbol, self.base_timeframe)
+        if not len(base):
+            return 0
+        derived = self.get_series(symbol, timeframe)
+        tf_ms = timeframe_to_ms(timeframe)
+        ts = base.timestamps
+        first_ts = int(ts[0])
+        
+        last_ts = derived.last_timestamp
+        if last_ts is not None and last_ts >= first_ts:
+            # Пересчитываем последний (формирующийся) бар и добавляем новые
+            from_ts = last_ts
+        else:
+            if last_ts is not None:
+                logger.info(f"Base history no longer covers {symbol} {timeframe}, rebuilding")
+                derived.reset()
+            # Первый бар базовой истории может быть неполным - начинаем с границы
+            from_ts = -(-first_ts // tf_ms) * tf_ms
+        
+        start = int(np.searchsorted(ts, from_ts))
+        if start == len(ts):
+            return 0
+        return derived.merge(resample_ohlcv(ts[start:], base.values[:, start:], tf_ms))
+    
+    def candles(self, symbol, timeframe, limit):
+        """
+        Последние limit свечей из памяти без запросов к бирже
+        
+        Returns:
+            DataFrame или None если истории недостаточно
+        """
+        if self.is_derived(timeframe):
+            self.resample(symbol, timeframe)
+        series = self.get_series(symbol, timeframe)
+        if len(series) < limit:
+            return None
+        return self._frame(symbol, timeframe, series, limit)
+    
+    def fetch_params(self, symbol, timeframe, limit, now_ms=None):
+        """
+        Определяет параметры запроса fetch_ohlcv
+        
+        Returns:
+            tuple: (since, fetch_limit) - since=None означает полную загрузку окна
+        """
+        series = self.get_series(symbol, timeframe)
+        if len(series) < limit:
+            return None, limit
+        
+        tf_ms = timeframe_to_ms(timeframe)
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        # Сколько свечей открылось с момента последней сохранённой (+ она сама)
+        missing = max(0, (now_ms - series.last_timestamp) // tf_ms) + 1
+        if missing >= limit:
+            # Разрыв больше окна - дешевле и надёжнее перезагрузить окно целиком
+            # (той же глубины, что была: базовой историей пользуются и старшие таймфреймы)
+            return None, max(limit, len(series))
+        return series.last_timestamp, int(missing) + 1
+    
+    def update(self, symbol, timeframe, ohlcv, limit, full=False):
+        """
+        Вливает ответ биржи и возвращает последние limit свечей
+        
+        Args:
+            full: True если ответ - полное окно (since=None), старая история
+                  заменяется, чтобы в ней не осталось разрыва
+        
+        Returns:
+            DataFrame с колонками: timestamp, open, high, low, close, volume
+        """
+        series = self.get_series(symbol, timeframe)
+        if full:
+            series.reset()
+        added = series.merge(ohlcv)
+        logger.debug(f"Candle store {symbol} {timeframe}: +{added} new, {len(series)} stored")
+        return self._frame(symbol, timeframe, series, limit)
+    
+    @staticmethod
+    def _frame(symbol, timeframe, series, limit):
+        """Окно свечей с id ряда в attrs (ключ кэша графа индикаторов)"""
+        df = series.frame(limit)
+        df.attrs['series_id'] = (symbol, timeframe)
+        return df
+    
+    def clear(self, symbol=None, timeframe=None):
+        """Сбрасывает историю (всю или для одного ключа)"""
+        if symbol is None:
+            self._series.clear()
+        else:
+            self._series.pop((symbol, timeframe), None)
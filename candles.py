@@ -0,0 +1,102 @@
+"""
+Компактный контейнер свечей для многих пар и длинной истории
+Одна структурированная numpy запись на свечу: int64 timestamp (мс) и
+float32 цены и объём - 28 байт против 48 у DataFrame с float64 колонками
+и datetime (плюс фиксированные накладные расходы pandas на каждый кадр).
+Колонки - представления без копии, DataFrame строится лениво, только
+когда он действительно нужен (pandas бэкенд, отчёты)
+"""
+import numpy as np
+import pandas as pd
+
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', np.int64),
+    ('open', np.float32),
+    ('high', np.float32),
+    ('low', np.float32),
+    ('close', np.float32),
+    ('volume', np.float32)
+])
+
+PRICE_COLUMNS = CANDLE_DTYPE.names[1:]
+
+def timestamps_ms(values):
+    """Время открытия свечей как int64 мс (datetime колонка DataFrame или уже мс)"""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ms]').view(np.int64)
+    return values.astype(np.int64, copy=False)
+
+class Candles:
+    """
+    Свечи одного ряда в структурированном массиве CANDLE_DTYPE
+    
+    Поддерживает то, что нужно NumPy бэкенду индикаторов: len, колонки
+    по имени (candles['close'] - представление), срезы строк (тоже без
+    копии) и attrs['series_id'] как у кадров CandleStore. float32 хранит
+    ~7 значащих цифр - для индикаторов достаточно, для учёта ордеров нет.
+    """
+    
+    __slots__ = ('data', 'attrs', '_df')
+    
+    columns = CANDLE_DTYPE.names
+    
+    def __init__(self, data, series_id=None):
+        self.data = data
+        self.attrs = {'series_id': series_id} if series_id is not None else {}
+        self._df = None
+    
+    @classmethod
+    def from_arrays(cls, timestamps, values, series_id=None):
+        """Из времени (мс) и массива (5, n): open, high, low, close, volume"""
+        data = np.empty(len(timestamps), dtype=CANDLE_DTYPE)
+        data['timestamp'] = timestamps
+        for i, name in enumerate(PRICE_COLUMNS):
+            data[name] = values[i]
+        return cls(data, series_id)
+    
+    @classmethod
+    def from_ohlcv(cls, ohlcv, series_id=None):
+        """Из ответа fetch_ohlcv ([[ts, o, h, l, c, v], ...])"""
+        rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+        return cls.from_arrays(rows[:, 0].astype(np.int64), rows[:, 1:].T, series_id)
+    
+    @classmethod
+    def from_frame(cls, df, series_id=None):
+        """Из DataFrame get_ohlcv_data (id ряда берётся из df.attrs, если не задан)"""
+        if series_id is None:
+            series_id = df.attrs.get('series_id')
+        values = [df[name].to_numpy() for name in PRICE_COLUMNS]
+        return cls.from_arrays(timestamps_ms(df['timestamp']), values, series_id)
+    
+    def __len__(self):
+        return len(self.data)
+    
+    def __getitem__(self, key):
+        """Колонка по имени или срез строк - представления без копии"""
+        if isinstance(key, str):
+            return self.data[key]
+        return Candles(self.data[key], self.attrs.get('series_id'))
+    
+    @property
+    def timestamps(self):
+        return self.data['timestamp']
+    
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+    
+    def arrays(self):
+        """Колонки OHLCV для indicators_numpy (как ohlcv_arrays, но float32 и без копии)"""
+        return {name: self.data[name] for name in PRICE_COLUMNS}
+    
+    @property
+    def df(self):
+        """DataFrame с колонками get_ohlcv_data (float64), строится при первом обращении"""
+        if self._df is None:
+            df = pd.DataFrame({'timestamp': pd.to_datetime(self.data['timestamp'], unit='ms')})
+            for name in PRICE_COLUMNS:
+                df[name] = self.data[name].astype(np.float64)
+            df.attrs.update(self.attrs)
+            self._df = df
+        return self._df
@@ -25,6 +25,17 @@ MACD_SLOW = 26
 MACD_SIGNAL = 9
 BOLLINGER_PERIOD = 20
 VOLUME_MA_PERIOD = 20
+INDICATOR_BACKEND = os.getenv('INDICATOR_BACKEND', 'numpy')  # ✅ НОВОЕ: 'numpy' или 'pandas'
+INDICATOR_CACHE_SIZE = 64  # ✅ НОВОЕ: Графов индикаторов в кэше (по ряду и последней свече)
+EWM_TAIL_TOLERANCE = 1e-15  # ✅ НОВОЕ: EWM считается по хвосту, где вес старых свечей выше этого
+
+# ✅ НОВОЕ: Перцентильный ранг объёма, ATR и спреда (rolling_rank.py)
+RANK_WINDOW = 1440  # Свечей в окне (сутки 1m свечей)
+RANK_MIN_SAMPLES = 50  # Меньше значений в окне - нейтральный ранг 0.5
+RANK_MAX_SERIES = 256  # Сколько рядов (symbol, timeframe) держать в памяти рангов
+VOLUME_RANK_HIGH = 0.95  # Объём в верхних 5% окна - подтверждение сигнала
+ATR_RANK_LOW = 0.10  # ATR в нижних 10% окна - ограничение силы сигнала
+SPREAD_RANK_HIGH = 0.95  # Спред шире 95% замеров окна - сигнал ослабляется
 
 # Пороги для сигналов
 PUMP_THRESHOLD = 0.70  # 70% вероятность для сигнала PUMP
@@ -42,6 +53,29 @@ DAY_TIMEFRAME = '1m'
 DAY_LIMIT = 100
 DAY_CHECK_INTERVAL = 60
 
+# ✅ НОВОЕ: Сколько свечей хранить в памяти на (пара, таймфрейм)
+CANDLE_STORE_SIZE = 1000
+
+# ✅ НОВОЕ: Единая база 1m свечей; старшие таймфреймы досчитываются из неё
+# без отдельных запросов к бирже (пустой список - запрашивать напрямую)
+BASE_TIMEFRAME = '1m'
+RESAMPLE_TIMEFRAMES = ['3m', '5m', '15m', '1h', '4h']
+
+# ✅ НОВОЕ: Источник рыночных данных: 'rest' (опрос) или 'stream' (WebSocket)
+DATA_SOURCE = os.getenv('DATA_SOURCE', 'rest')
+BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', 'wss://stream.binance.com:9443')
+STREAM_DEPTH_LEVELS = 20  # 5, 10 или 20 уровней partial depth
+# ✅ НОВОЕ: Стакан: 'diff' - локальный стакан по diff потоку, 'partial' - снимки STREAM_DEPTH_LEVELS уровней
+ORDERBOOK_MODE = os.getenv('ORDERBOOK_MODE', 'diff')
+ORDERBOOK_SNAPSHOT_LIMIT = 1000  # Глубина REST снимка для бутстрапа (вес 50)
+ORDERBOOK_MAX_LEVELS = 5000  # Максимум уровней на сторону
+ORDERBOOK_BUFFER_SIZE = 1000  # Сколько diff событий копить до прихода снимка
+ORDERBOOK_RESYNC_BACKOFF = 5  # Пауза после неудачного снимка (секунды)
+ORDERBOOK_RESYNC_MAX_BACKOFF = 60  # Предел растущей паузы при устаревших снимках подряд
+STREAM_RECONNECT_MIN = 1  # Начальная задержка переподключения (секунды)
+STREAM_RECONNECT_MAX = 60  # Максимальная задержка переподключения (секунды)
+STREAM_STALE_AFTER = 30  # Без сообщений дольше - данные считаются устаревшими, используем REST
+
 # ✅ НОВОЕ: Параметры для разных режимов торговли
 MODE_CONFIGS = {
     'swing': {
@@ -121,5 +155,78 @@ ALERT_TELEGRAM_CHAT_ID = os.getenv('ALERT_TELEGRAM_CHAT_ID', None)  # Chat ID д
 API_MAX_RETRIES = 3
 API_RETRY_DELAY = 2  # секунды
 
+# ✅ НОВОЕ: Таймауты источников для асинхронного сбора данных (секунды)
+SOURCE_TIMEOUTS = {
+    'ohlcv': 10,
+    'ticker': 5,
+    'orderbook': 5,
+    'fear_greed': 5,
+    'open_interest': 5,
+}
+
+# ✅ НОВОЕ: Окна свежести (секунды) - одинаковые запросы внутри окна
+# не уходят на биржу повторно, одновременные запросы объединяются
+COALESCE_TTL = {
+    'market_data': 5,  # Полный сбор: /status сразу после цикла мониторинга
+    'ohlcv': 2,
+    'ticker': 2,
+    'orderbook': 1,
+    'open_interest': 10,
+}
+
+# ✅ НОВОЕ: Мультисимвольное сканирование (market_scanner.py)
+SCAN_SYMBOLS = [s for s in os.getenv('SCAN_SYMBOLS', '').split(',') if s]  # Пусто - топ пар по объёму
+SCAN_QUOTE = 'USDT'
+SCAN_TOP_N = 100  # Сколько пар сканировать при автоподборе
+SCAN_MIN_QUOTE_VOLUME = 1000000  # Минимальный 24h объём пары в USDT
+SCAN_CONCURRENCY = 10  # Одновременных запросов OHLCV
+
+# ✅ НОВОЕ: История Open Interest в кольцевом буфере
+OI_HISTORY_SIZE = 720  # Точек (12 часов при записи раз в минуту)
+OI_HISTORY_MIN_INTERVAL = 30  # Минимум секунд между точками OI
+SERIES_SNAPSHOT_DIR = os.getenv('SERIES_SNAPSHOT_DIR', 'series_cache')  # '' - без снапшотов на диск
+SERIES_MAX_AGE = 6 * 3600  # При загрузке снапшота отбрасываем точки старше (секунды)
+
+# ✅ НОВОЕ: Фоновое обновление F&G и OI - анализ читает их из кэша без ожидания
+FNG_REFRESH_DELAY = 60  # Запас после time_until_update из ответа API (секунды)
+FNG_REFRESH_MIN = 60
+FNG_REFRESH_MAX = 3600
+OI_REFRESH_INTERVAL = 30
+REFRESH_RETRY_MIN = 5  # Повтор после ошибки, с удвоением до REFRESH_RETRY_MAX
+REFRESH_RETRY_MAX = 300
+
+# ✅ НОВОЕ: Минутный бюджет веса запросов Binance (лимит на IP)
+EXCHANGE_WEIGHT_LIMIT = int(os.getenv('EXCHANGE_WEIGHT_LIMIT', 6000))
+EXCHANGE_WEIGHT_SAFETY = 0.9  # Цикл мониторинга занимает не больше 90% лимита
+EXCHANGE_WEIGHT_LOW_PRIORITY = 0.6  # Запросы пользователя - не больше 60%
+# Сколько цикл мониторинга может ждать нового окна (секунды). Меньше
+# SOURCE_TIMEOUTS бирж (ticker/orderbook - 5с): иначе сбор упрётся в свой
+# таймаут раньше, чем кончится ожидание; дольше - BudgetExceeded и кэш
+EXCHANGE_WEIGHT_MAX_WAIT = 3
+EXCHANGE_BAN_DEFAULT = 60  # Пауза после 429/418 без Retry-After (секунды)
+
+# ✅ НОВОЕ: Запись ответов бирж, F&G и OI в сжатые сегменты (для воспроизведения)
+RECORD_DIR = os.getenv('RECORD_DIR')  # Не задан - запись выключена
+RECORD_SEGMENT_RECORDS = 5000  # Записей в одном сегменте
+RECORD_FLUSH_RECORDS = 50  # Сбрасывать на диск каждые N записей...
+RECORD_FLUSH_INTERVAL = 10  # ...или не реже, чем раз в N секунд
+
+# ✅ НОВОЕ: Архив исторических свечей (ohlcv_archive.py)
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'ohlcv_archive')
+BACKFILL_CONCURRENCY = 4  # Страниц fetch_ohlcv одновременно
+BACKFILL_PAGE_LIMIT = 1000  # Свечей на страницу (максимум Binance)
+BACKFILL_RETRY_DELAY = 5  # Пауза при исчерпании бюджета веса (секунды)
+
+# ✅ НОВОЕ: Модель и офлайн обучение (train_model.py)
+MODEL_PATH = os.getenv('MODEL_PATH', 'btc_model.pkl')
+SCALER_PATH = os.getenv('SCALER_PATH', 'scaler.pkl')
+MODEL_DIR = os.getenv('MODEL_DIR', 'models')  # Версии артефактов: <MODEL_DIR>/<версия>/
+MODEL_RELOAD_INTERVAL = 60  # Секунд между проверками новой версии в MODEL_DIR
+TRAIN_HORIZON_MINUTES = 60  # Метка - доходность через столько минут
+TRAIN_CV_FOLDS = 5  # Фолдов walk-forward кросс-валидации
+PREDICT_CHUNK_SIZE = 100_000  # Строк на блок predict_batch (память под нормализацию)
+ML_INFERENCE_BACKEND = os.getenv('ML_INFERENCE_BACKEND', 'flat')  # 'flat' (forest_eval.py) или 'sklearn'
+FLAT_FOREST_MAX_ROWS = 256  # Больше строк за вызов - прогноз через sklearn (быстрее на больших блоках)
+
 # Graceful shutdown timeout
 SHUTDOWN_TIMEOUT = 30  # секунды
@@ -1,37 +1,150 @@
+import asyncio
 import ccxt
+import ccxt.async_support as ccxt_async
+import aiohttp
+import numpy as np
 import requests
 import config
 import logging
+import os
+import time
 from datetime import datetime, timedelta
-import pandas as pd
+from candle_store import CandleStore
+from stream_collector import StreamCollector
+from request_cache import RequestCoalescer
+from timeseries_buffer import TimeSeriesBuffer
+from market_recorder import MarketRecorder, RecordingExchange, ReplaySession
+from rate_budget import WeightBudget, BudgetedExchange, BudgetExceeded, current_priority
 
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+OPEN_INTEREST_URL = 'https://fapi.binance.com/fapi/v1/openInterest'
+
 class DataCollector:
     def __init__(self):
+        # ✅ НОВОЕ: Общий минутный бюджет веса запросов к Binance (sync и async)
+        self.budget = WeightBudget()
         # Инициализируем Binance без API ключей (публичные данные)
-        self.exchange = ccxt.binance({
+        self.exchange = BudgetedExchange(ccxt.binance({
             'enableRateLimit': True,
-        })
-        # Кэш для FNG
-        self._fng_cache = {'value': None, 'ts': None}
+        }), self.budget)
+        # ✅ НОВОЕ: Асинхронные клиенты создаются лениво внутри event loop
+        self.async_exchange = None
+        self._http_session = None
+        self._sync_session = None
+        # ✅ НОВОЕ: Хранилище свечей - догружаем только новые свечи
+        self.candle_store = CandleStore()
+        # ✅ НОВОЕ: WebSocket поток (включается через start_stream)
+        self.stream = None
+        # ✅ НОВОЕ: Объединение одинаковых запросов и окно свежести результатов
+        self._requests = RequestCoalescer(priority=current_priority)
+        # Кэш для FNG (next_update - когда API обновит значение, по time_until_update)
+        self._fng_cache = {'value': None, 'ts': None, 'next_update': None}
         # Кэш для Open Interest (обновляется каждые 5 минут)
-        self._oi_cache = {'value': None, 'ts': None, 'history': []}
+        self._oi_cache = {'value': None, 'ts': None}
+        # ✅ НОВОЕ: История OI и F&G в кольцевых буферах со снапшотом на диск
+        self._oi_history = self._create_series('open_interest', config.OI_HISTORY_SIZE, config.OI_HISTORY_MIN_INTERVAL)
+        # ✅ НОВОЕ: Часы сбора (при воспроизведении - время записанной сессии)
+        self.clock = time.time
+        # ✅ НОВОЕ: Запись ответов источников / воспроизведение записанной сессии
+        self.recorder = None
+        self.replay = None
+        if config.RECORD_DIR:
+            self.enable_recording(config.RECORD_DIR)
+        # ✅ НОВОЕ: Фоновое обновление F&G и OI (start_background_refresh)
+        self._refresh_tasks = []
+    
+    @staticmethod
+    def _create_series(name, capacity, min_interval):
+        """Создаёт буфер ряда и подгружает снапшот, если он включён"""
+        path = os.path.join(config.SERIES_SNAPSHOT_DIR, f"{name}.npz") if config.SERIES_SNAPSHOT_DIR else None
+        series = TimeSeriesBuffer(capacity, min_interval=min_interval, snapshot_path=path)
+        series.load(max_age=config.SERIES_MAX_AGE)
+        return series
+    
+    def _now(self):
+        """Текущее время по часам сбора"""
+        return datetime.fromtimestamp(self.clock())
+    
+    def enable_recording(self, directory):
+        """
+        Пишет все ответы бирж, F&G и OI в сжатые сегменты directory
+        
+        Returns:
+            MarketRecorder
+        """
+        self.recorder = MarketRecorder(directory)
+        self.exchange = RecordingExchange(self.exchange, self.recorder)
+        if self.async_exchange is not None:
+            self.async_exchange = RecordingExchange(self.async_exchange, self.recorder)
+        logger.info(f"Recording market data to {directory}")
+        return self.recorder
+    
+    def enable_replay(self, directory, speed=None):
+        """
+        Подменяет источники записанной сессией
+        
+        Args:
+            directory: каталог с сегментами записи
+            speed: 1.0 - реальный темп, None - максимально быстро
+        
+        Returns:
+            ReplaySession
+        """
+        self.replay = ReplaySession(directory, speed=speed)
+        self.exchange = self.replay.exchange()
+        self.async_exchange = self.replay.async_exchange()
+        self.clock = self.replay.clock
+        # Без кэша по TTL: часы записи идут только при чтении записей, и
+        # закэшированный market_data остановил бы воспроизведение навсегда
+        self._requests = RequestCoalescer(clock=self.clock, cache=False, priority=current_priority)
+        # История OI без снапшота: в ней только время воспроизведения
+        self._oi_history = TimeSeriesBuffer(config.OI_HISTORY_SIZE, min_interval=config.OI_HISTORY_MIN_INTERVAL)
+        self.candle_store.clear()
+        return self.replay
+    
+    def _record(self, source, data):
+        """Записывает ответ HTTP источника, если включена запись"""
+        if self.recorder is not None:
+            self.recorder.record(source, data)
         
     def get_current_price(self):
         """Получает текущую цену BTC/USDT"""
         try:
-            ticker = self.exchange.fetch_ticker(config.SYMBOL)
-            return {
-                'price': ticker['last'],
-                'volume': ticker['quoteVolume'],
-                'timestamp': datetime.now()
-            }
+            ticker = self._fetch_ticker()
+            return self._parse_current_price(ticker)
         except Exception as e:
             logger.error(f"Error fetching price: {e}")
             return None
     
+    def _fetch_ticker(self):
+        """Тикер с окном свежести - цена и 24h статистика делят один запрос"""
+        key = ('ticker', config.SYMBOL)
+        try:
+            return self._requests.get(
+                key,
+                lambda: self.exchange.fetch_ticker(config.SYMBOL),
+                ttl=config.COALESCE_TTL['ticker']
+            )
+        except BudgetExceeded as e:
+            return self._stale_or_raise(key, e)
+    
+    def _stale_or_raise(self, key, error):
+        """При исчерпанном бюджете веса отдаёт последний результат запроса"""
+        stale = self._requests.peek(key)
+        if stale is None:
+            raise error
+        logger.warning(f"Exchange weight budget: serving cached {key[0]} ({error})")
+        return stale
+    
+    async def _get_exchange_async(self, key, fetch, ttl):
+        """Запрос к бирже через общий кэш; при нехватке бюджета - последний результат"""
+        try:
+            return await self._requests.get_async(key, fetch, ttl=ttl)
+        except BudgetExceeded as e:
+            return self._stale_or_raise(key, e)
+    
     def get_ohlcv_data(self, timeframe='5m', limit=100):
         """
         Получает OHLCV данные (Open, High, Low, Close, Volume)
@@ -44,37 +157,54 @@ class DataCollector:
             DataFrame с колонками: timestamp, open, high, low, close, volume
         """
         try:
-            ohlcv = self.exchange.fetch_ohlcv(
-                config.SYMBOL,
-                timeframe=timeframe,
-                limit=limit
-            )
-            
-            df = pd.DataFrame(
-                ohlcv,
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            store = self.candle_store
+            if store.is_derived(timeframe):
+                # Старший таймфрейм досчитывается из базовых 1m свечей
+                self._update_candles(store.base_timeframe, store.base_limit(timeframe, limit))
+                df = store.candles(config.SYMBOL, timeframe, limit)
+                if df is not None:
+                    return df
+                # Базовой истории не хватает на окно - один раз загружаем
+                # таймфрейм напрямую, дальше он досчитывается из базовых свечей
+            return self._update_candles(timeframe, limit)
             
-            logger.info(f"Fetched {len(df)} candles for {config.SYMBOL} ({timeframe})")
+        except BudgetExceeded as e:
+            # Бюджет веса исчерпан - отдаём уже загруженные свечи
+            df = self.candle_store.candles(config.SYMBOL, timeframe, limit)
+            if df is None:
+                logger.error(f"Error fetching OHLCV data: {e}")
+            else:
+                logger.warning(f"Exchange weight budget: serving cached candles ({e})")
             return df
             
         except Exception as e:
             logger.error(f"Error fetching OHLCV data: {e}")
             return None
     
+    def _update_candles(self, timeframe, limit):
+        """Догружает свечи таймфрейма в хранилище и возвращает окно"""
+        # Запрашиваем только свечи начиная с последней сохранённой
+        since, fetch_limit = self.candle_store.fetch_params(config.SYMBOL, timeframe, limit, now_ms=int(self.clock() * 1000))
+        ohlcv = self.exchange.fetch_ohlcv(
+            config.SYMBOL,
+            timeframe=timeframe,
+            since=since,
+            limit=fetch_limit
+        )
+        
+        df = self.candle_store.update(config.SYMBOL, timeframe, ohlcv, limit, full=since is None)
+        
+        logger.info(f"Fetched {len(ohlcv)} candles for {config.SYMBOL} ({timeframe}), window {len(df)}")
+        return df
+    
     def get_orderbook(self, limit=20):
         """Получает стакан ордеров (bid/ask)"""
         try:
+            local = self._local_orderbook(limit)
+            if local is not None:
+                return local
             orderbook = self.exchange.fetch_order_book(config.SYMBOL, limit)
-            
-            return {
-                'bids': orderbook['bids'],  # Заявки на покупку
-                'asks': orderbook['asks'],  # Заявки на продажу
-                'bid_volume': sum([bid[1] for bid in orderbook['bids']]),
-                'ask_volume': sum([ask[1] for ask in orderbook['asks']])
-            }
+            return self._parse_orderbook(orderbook)
         except Exception as e:
             logger.error(f"Error fetching orderbook: {e}")
             return None
@@ -87,60 +217,29 @@ class DataCollector:
             int: Значение от 0 (Extreme Fear) до 100 (Extreme Greed)
         """
         try:
-            now = datetime.now()
-            # Кэш TTL 5 минут
-            if self._fng_cache['ts'] and (now - self._fng_cache['ts']).seconds < 300:
+            now = self._now()
+            # Кэш TTL 5 минут (при фоновом обновлении - всегда из кэша)
+            if self._fng_cache_fresh(now) or self._warm('fear_greed'):
                 logger.debug(f"Using cached F&G: {self._fng_cache['value']}")
                 return self._fng_cache['value']
 
-            # Ретраи через Session + HTTPAdapter
-            session = requests.Session()
-            try:
-                adapter = requests.adapters.HTTPAdapter(max_retries=3)
-                session.mount('https://', adapter)
-                session.mount('http://', adapter)
-            except Exception:
-                pass
+            if self.replay is not None:
+                return self._store_fear_greed(self.replay.next_data('fear_greed'), now)
 
-            response = session.get(config.FEAR_GREED_API, timeout=5)
+            response = self._get_sync_session().get(config.FEAR_GREED_API, timeout=5)
             data = response.json()
-            
-            value = None
-            if data and 'data' in data and len(data['data']) > 0:
-                value = int(data['data'][0]['value'])
-                classification = data['data'][0]['value_classification']
-                logger.info(f"Fear & Greed Index: {value} ({classification})")
-
-            if value is None:
-                # fallback значение
-                value = 50
-                logger.warning("F&G returned None, using default: 50")
-
-            self._fng_cache = {'value': value, 'ts': now}
-            return value
+            self._record('fear_greed', data)
+            return self._store_fear_greed(data, now)
             
         except Exception as e:
             logger.error(f"Error fetching Fear & Greed Index: {e}")
-            # Возвращаем кэш или дефолт
-            cached_value = self._fng_cache['value']
-            if cached_value is not None:
-                logger.warning(f"Using cached F&G value: {cached_value}")
-                return cached_value
-            else:
-                logger.warning("No cache available, using default: 50")
-                return 50
+            return self._get_cached_fng_or_default()
     
     def get_24h_stats(self):
         """Получает статистику за 24 часа"""
         try:
-            ticker = self.exchange.fetch_ticker(config.SYMBOL)
-            
-            return {
-                'price_change_24h': ticker.get('percentage', 0),
-                'high_24h': ticker.get('high', 0),
-                'low_24h': ticker.get('low', 0),
-                'volume_24h': ticker.get('quoteVolume', 0)
-            }
+            ticker = self._fetch_ticker()
+            return self._parse_24h_stats(ticker)
         except Exception as e:
             logger.error(f"Error fetching 24h stats: {e}")
             return None
@@ -159,82 +258,501 @@ class DataCollector:
             }
         """
         try:
-            now = datetime.now()
+            if self._warm('open_interest'):
+                return self._oi_cache['value']
+            
+            if self.replay is not None:
+                data = self.replay.next_data('open_interest')
+                return self._record_open_interest(float(data['openInterest']))
             
             # Запрашиваем текущий OI (всегда свежий)
-            url = 'https://fapi.binance.com/fapi/v1/openInterest'
             params = {'symbol': 'BTCUSDT'}
-            response = requests.get(url, params=params, timeout=5)
+            response = self._get_sync_session().get(OPEN_INTEREST_URL, params=params, timeout=5)
             
             if response.status_code != 200:
                 logger.error(f"OI API error: {response.status_code}")
                 return self._get_cached_oi_or_default()
             
             data = response.json()
-            current_oi = float(data['openInterest'])
-            
-            # Обновляем историю (храним последние 60 записей = ~5 часов при проверке каждые 5 мин)
-            self._oi_cache['history'].append({
-                'value': current_oi,
-                'timestamp': now
-            })
-            
-            # Обрезаем историю до 60 записей
-            if len(self._oi_cache['history']) > 60:
-                self._oi_cache['history'] = self._oi_cache['history'][-60:]
-            
-            # Вычисляем изменения
-            change_5m = self._calculate_oi_change(minutes=5)
-            change_1h = self._calculate_oi_change(minutes=60)
-            change_4h = self._calculate_oi_change(minutes=240)
-            
-            result = {
-                'value': current_oi,
-                'change_5m': change_5m,
-                'change_1h': change_1h,
-                'change_4h': change_4h,
-                'timestamp': now
-            }
-            
-            # Обновляем кэш
-            self._oi_cache['value'] = result
-            self._oi_cache['ts'] = now
-            
-            logger.info(
-                f"Open Interest: {current_oi:,.0f} | "
-                f"5m: {change_5m:+.2f}% | 1h: {change_1h:+.2f}% | 4h: {change_4h:+.2f}%"
-            )
-            
-            return result
+            self._record('open_interest', data)
+            return self._record_open_interest(float(data['openInterest']))
             
         except Exception as e:
             logger.error(f"Error fetching Open Interest: {e}")
             return self._get_cached_oi_or_default()
+            
+    # ------------------------------------------------------------------
+    # ✅ НОВОЕ: Асинхронный сбор данных (не блокирует event loop)
+    # ------------------------------------------------------------------
     
-    def _calculate_oi_change(self, minutes):
-        """Вычисляет изменение OI за указанный период"""
+    async def _get_async_exchange(self):
+        """Возвращает асинхронный клиент ccxt (создаётся в текущем event loop)"""
+        if self.async_exchange is None:
+            self.async_exchange = BudgetedExchange(ccxt_async.binance({
+                'enableRateLimit': True,
+            }), self.budget)
+            if self.recorder is not None:
+                self.async_exchange = RecordingExchange(self.async_exchange, self.recorder)
+        return self.async_exchange
+    
+    def _get_sync_session(self):
+        """Общая requests сессия с ретраями (создаётся один раз)"""
+        if self._sync_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(max_retries=3)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sync_session = session
+        return self._sync_session
+    
+    async def _get_http_session(self):
+        """Возвращает общую aiohttp сессию для F&G и Open Interest"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
+    
+    async def _with_timeout(self, source, coro):
+        """
+        Выполняет запрос к источнику с собственным таймаутом
+        
+        Returns:
+            Результат запроса или None при ошибке/таймауте
+        """
+        timeout = config.SOURCE_TIMEOUTS.get(source, 10)
         try:
-            history = self._oi_cache['history']
-            if len(history) < 2:
-                return 0.0
-            
-            now = datetime.now()
-            target_time = now - timedelta(minutes=minutes)
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{source} request timed out after {timeout}s")
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching {source}: {e}")
+            return None
+    
+    async def fetch_ohlcv_async(self, timeframe='5m', limit=100, symbol=None):
+        """Асинхронно получает OHLCV данные (см. get_ohlcv_data)"""
+        symbol = symbol or config.SYMBOL
+        
+        store = self.candle_store
+        
+        async def fetch():
+            if store.is_derived(timeframe):
+                await self.fetch_ohlcv_async(store.base_timeframe, store.base_limit(timeframe, limit), symbol)
+                df = store.candles(symbol, timeframe, limit)
+                if df is not None:
+                    return df
             
-            # Находим ближайшую запись к целевому времени
-            closest = min(
-                history,
-                key=lambda x: abs((x['timestamp'] - target_time).total_seconds())
+            exchange = await self._get_async_exchange()
+            since, fetch_limit = store.fetch_params(symbol, timeframe, limit, now_ms=int(self.clock() * 1000))
+            ohlcv = await exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=fetch_limit)
+            df = store.update(symbol, timeframe, ohlcv, limit, full=since is None)
+            logger.info(f"Fetched {len(ohlcv)} candles for {symbol} ({timeframe}), window {len(df)}")
+            return df
+        
+        return await self._get_exchange_async(
+            ('ohlcv', symbol, timeframe, limit), fetch, ttl=config.COALESCE_TTL['ohlcv']
+        )
+    
+    async def fetch_ticker_async(self):
+        """Асинхронно получает тикер (цена и 24h статистика из одного запроса)"""
+        async def fetch():
+            exchange = await self._get_async_exchange()
+            return await exchange.fetch_ticker(config.SYMBOL)
+        
+        return await self._get_exchange_async(
+            ('ticker', config.SYMBOL), fetch, ttl=config.COALESCE_TTL['ticker']
+        )
+    
+    async def fetch_tickers_async(self, symbols=None):
+        """
+        Асинхронно получает тикеры многих пар одним запросом
+        
+        Returns:
+            dict: symbol -> тикер в формате ccxt
+        """
+        key = ('tickers', tuple(sorted(symbols)) if symbols else None)
+        
+        async def fetch():
+            exchange = await self._get_async_exchange()
+            return await exchange.fetch_tickers(symbols)
+        
+        return await self._get_exchange_async(key, fetch, ttl=config.COALESCE_TTL['ticker'])
+    
+    async def load_markets_async(self):
+        """Асинхронно загружает список рынков биржи (ccxt кэширует его сам)"""
+        exchange = await self._get_async_exchange()
+        return await exchange.load_markets()
+    
+    async def fetch_orderbook_async(self, limit=20):
+        """Асинхронно получает стакан ордеров"""
+        local = self._local_orderbook(limit)
+        if local is not None:
+            return local
+        
+        async def fetch():
+            exchange = await self._get_async_exchange()
+            orderbook = await exchange.fetch_order_book(config.SYMBOL, limit)
+            return self._parse_orderbook(orderbook)
+        
+        return await self._get_exchange_async(
+            ('orderbook', config.SYMBOL, limit), fetch, ttl=config.COALESCE_TTL['orderbook']
+        )
+    
+    def _local_orderbook(self, limit):
+        """Стакан из локального diff-стакана потока без запроса (или None)"""
+        if self.stream is None or not self.stream.is_fresh():
+            return None
+        book = self.stream.order_book
+        if book is None or not book.synced:
+            return None
+        return book.top(limit)
+    
+    async def _fetch_orderbook_snapshot(self):
+        """Глубокий REST снимок для бутстрапа локального стакана"""
+        exchange = await self._get_async_exchange()
+        return await exchange.fetch_order_book(config.SYMBOL, config.ORDERBOOK_SNAPSHOT_LIMIT)
+    
+    async def fetch_fear_greed_async(self):
+        """Асинхронно получает Fear & Greed Index с кэшированием"""
+        now = self._now()
+        if self._fng_cache_fresh(now) or self._warm('fear_greed'):
+            logger.debug(f"Using cached F&G: {self._fng_cache['value']}")
+            return self._fng_cache['value']
+        return await self._fetch_fear_greed_now()
+    
+    async def _fetch_fear_greed_now(self):
+        """Запрос F&G к API в обход кэша (одновременные вызовы объединяются)"""
+        async def fetch():
+            now = self._now()
+            if self.replay is not None:
+                return self._store_fear_greed(await self.replay.next_data_async('fear_greed'), now)
+            session = await self._get_http_session()
+            async with session.get(config.FEAR_GREED_API) as response:
+                data = await response.json(content_type=None)
+            self._record('fear_greed', data)
+            return self._store_fear_greed(data, now)
+        
+        # Свой 5-минутный кэш уже есть - объединяем только одновременные запросы
+        return await self._requests.get_async(('fear_greed',), fetch, ttl=0)
+    
+    async def fetch_open_interest_async(self):
+        """Асинхронно получает Open Interest"""
+        if self._warm('open_interest'):
+            return self._oi_cache['value']
+        return await self._fetch_open_interest_now()
+    
+    async def _fetch_open_interest_now(self):
+        """Запрос OI к API (одновременные вызовы объединяются)"""
+        async def fetch():
+            if self.replay is not None:
+                data = await self.replay.next_data_async('open_interest')
+                return self._record_open_interest(float(data['openInterest']))
+            session = await self._get_http_session()
+            params = {'symbol': 'BTCUSDT'}
+            async with session.get(OPEN_INTEREST_URL, params=params) as response:
+                if response.status != 200:
+                    logger.error(f"OI API error: {response.status}")
+                    return None
+                data = await response.json(content_type=None)
+            self._record('open_interest', data)
+            return self._record_open_interest(float(data['openInterest']))
+        
+        return await self._requests.get_async(
+            ('open_interest',), fetch, ttl=config.COALESCE_TTL['open_interest']
+        )
+    
+    async def get_market_data_async(self, timeframe=None, limit=None):
+        """
+        Асинхронная версия get_market_data
+        
+        Все источники запрашиваются одновременно через asyncio.gather,
+        у каждого свой таймаут (config.SOURCE_TIMEOUTS). Время цикла
+        равно самому медленному запросу, а не сумме всех запросов.
+        
+        Если запущен WebSocket поток (start_stream) и его состояние свежее,
+        свечи, тикер и стакан читаются из памяти без запросов к бирже.
+        
+        Одновременные вызовы (цикл мониторинга и /status) получают один и тот
+        же сбор, результат переиспользуется config.COALESCE_TTL['market_data'] секунд.
+        
+        Returns:
+            dict: Тот же формат, что и get_market_data
+        """
+        tf = timeframe or config.TIMEFRAME
+        lm = limit or 100
+        
+        return await self._requests.get_async(
+            ('market_data', config.SYMBOL, tf, lm),
+            lambda: self._collect_market_data_async(tf, lm),
+            ttl=config.COALESCE_TTL['market_data']
+        )
+    
+    async def _collect_market_data_async(self, tf, lm):
+        """Один цикл асинхронного сбора данных (см. get_market_data_async)"""
+        logger.info("Collecting market data (async)...")
+        
+        snapshot = self.stream.get_snapshot(tf, lm) if self.stream is not None else None
+        if snapshot is not None:
+            # Свечи, тикер и стакан берём из памяти WebSocket потока
+            df = snapshot['df']
+            ticker = snapshot['ticker']
+            orderbook = self._parse_orderbook(snapshot['orderbook']) if snapshot['orderbook'] else None
+            fear_greed, open_interest = await asyncio.gather(
+                self._with_timeout('fear_greed', self.fetch_fear_greed_async()),
+                self._with_timeout('open_interest', self.fetch_open_interest_async()),
+            )
+        else:
+            df, ticker, orderbook, fear_greed, open_interest = await asyncio.gather(
+                self._with_timeout('ohlcv', self.fetch_ohlcv_async(timeframe=tf, limit=lm)),
+                self._with_timeout('ticker', self.fetch_ticker_async()),
+                self._with_timeout('orderbook', self.fetch_orderbook_async()),
+                self._with_timeout('fear_greed', self.fetch_fear_greed_async()),
+                self._with_timeout('open_interest', self.fetch_open_interest_async()),
+            )
+        
+        if df is None:
+            logger.error("Failed to fetch OHLCV data")
+            return None
+        
+        if ticker is None:
+            logger.error("Failed to fetch current price")
+            return None
+        
+        if fear_greed is None:
+            fear_greed = self._get_cached_fng_or_default()
+        
+        if open_interest is None:
+            open_interest = self._get_cached_oi_or_default()
+        
+        return self._build_market_data(
+            df,
+            self._parse_current_price(ticker),
+            fear_greed,
+            self._parse_24h_stats(ticker),
+            orderbook,
+            open_interest,
+            tf
+        )
+    
+    # ------------------------------------------------------------------
+    # ✅ НОВОЕ: Фоновое обновление F&G и OI (stale-while-revalidate)
+    # ------------------------------------------------------------------
+    
+    def _warm(self, source):
+        """True если значение источника поддерживается фоновым обновлением"""
+        if not self._refresh_tasks:
+            return False
+        cache = self._fng_cache if source == 'fear_greed' else self._oi_cache
+        return cache['value'] is not None
+    
+    async def start_background_refresh(self):
+        """
+        Запускает фоновое обновление F&G и OI
+        
+        F&G обновляется к моменту time_until_update из ответа API, OI - каждые
+        config.OI_REFRESH_INTERVAL секунд. Сбор данных после этого читает
+        значения из кэша мгновенно и не ждёт внешние API; возраст значений
+        есть в market_data['data_age'].
+        """
+        if self._refresh_tasks:
+            return
+        sources = {
+            'fear_greed': self._refresh_fear_greed,
+            'open_interest': self._refresh_open_interest
+        }
+        # Первое обновление - до старта анализа, чтобы не начинать с дефолтов
+        first = await asyncio.gather(*[
+            self._refresh_once(source, refresh, config.REFRESH_RETRY_MIN) for source, refresh in sources.items()
+        ])
+        self._refresh_tasks = [
+            asyncio.create_task(self._refresh_loop(source, refresh, delay, retry))
+            for (source, refresh), (delay, retry) in zip(sources.items(), first)
+        ]
+        logger.info("Background refresh of F&G and Open Interest started")
+    
+    async def stop_background_refresh(self):
+        """Останавливает фоновое обновление"""
+        tasks, self._refresh_tasks = self._refresh_tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _refresh_loop(self, source, refresh, delay, retry):
+        while True:
+            await asyncio.sleep(delay)
+            delay, retry = await self._refresh_once(source, refresh, retry)
+    
+    async def _refresh_once(self, source, refresh, retry):
+        """
+        Одно обновление источника
+        
+        Returns:
+            tuple: (пауза до следующего обновления, пауза для следующей ошибки)
+        """
+        try:
+            delay = await asyncio.wait_for(refresh(), timeout=config.SOURCE_TIMEOUTS[source])
+            return delay, config.REFRESH_RETRY_MIN
+        except Exception as e:
+            # Старое значение продолжает отдаваться, повторяем с backoff
+            logger.warning(f"Background refresh of {source} failed: {e!r}, retry in {retry}s")
+            return retry, min(retry * 2, config.REFRESH_RETRY_MAX)
+    
+    async def _refresh_fear_greed(self):
+        """Обновляет F&G; возвращает паузу до обновления значения на стороне API"""
+        await self._fetch_fear_greed_now()
+        next_update = self._fng_cache['next_update']
+        if next_update is None:
+            return config.FNG_REFRESH_MAX
+        delay = (next_update - self._now()).total_seconds() + config.FNG_REFRESH_DELAY
+        return min(max(delay, config.FNG_REFRESH_MIN), config.FNG_REFRESH_MAX)
+    
+    async def _refresh_open_interest(self):
+        if await self._fetch_open_interest_now() is None:
+            raise RuntimeError("Open Interest API returned no data")
+        return config.OI_REFRESH_INTERVAL
+    
+    def _data_age(self):
+        """Возраст значений F&G и OI в секундах (None - ещё не получены)"""
+        now = self._now()
+        return {
+            source: (now - cache['ts']).total_seconds() if cache['ts'] else None
+            for source, cache in (('fear_greed', self._fng_cache), ('open_interest', self._oi_cache))
+        }
+    
+    async def start_stream(self, timeframes=None):
+        """
+        Запускает WebSocket поток рыночных данных
+        
+        Args:
+            timeframes: Таймфреймы свечей для подписки (по умолчанию оба режима)
+        """
+        if self.stream is None:
+            self.stream = StreamCollector(
+                self.candle_store,
+                timeframes=timeframes,
+                snapshot_fetcher=self._fetch_orderbook_snapshot
             )
+        await self.stream.start()
+    
+    async def close(self):
+        """Закрывает асинхронные соединения"""
+        await self.stop_background_refresh()
+        if self.stream is not None:
+            await self.stream.stop()
+        if self.async_exchange is not None:
+            await self.async_exchange.close()
+            self.async_exchange = None
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+        if self.recorder is not None:
+            self.recorder.flush()
+    
+    # ------------------------------------------------------------------
+    # Разбор ответов (общий для sync и async путей)
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _parse_current_price(ticker):
+        """Извлекает текущую цену и объём из тикера"""
+        return {
+            'price': ticker['last'],
+            'volume': ticker['quoteVolume'],
+            'timestamp': datetime.now()
+        }
+    
+    @staticmethod
+    def _parse_24h_stats(ticker):
+        """Извлекает статистику за 24 часа из тикера"""
+        return {
+            'price_change_24h': ticker.get('percentage', 0),
+            'high_24h': ticker.get('high', 0),
+            'low_24h': ticker.get('low', 0),
+            'volume_24h': ticker.get('quoteVolume', 0)
+        }
+    
+    @staticmethod
+    def _parse_orderbook(orderbook):
+        """Суммирует объёмы стакана"""
+        if 'bid_volume' in orderbook:
+            # Уже разобран (локальный стакан считает объёмы накопленными суммами)
+            return orderbook
+        return {
+            'bids': orderbook['bids'],  # Заявки на покупку
+            'asks': orderbook['asks'],  # Заявки на продажу
+            'bid_volume': sum([bid[1] for bid in orderbook['bids']]),
+            'ask_volume': sum([ask[1] for ask in orderbook['asks']])
+        }
+    
+    def _fng_cache_fresh(self, now):
+        """Проверяет, что кэш F&G моложе 5 минут"""
+        return bool(self._fng_cache['ts']) and (now - self._fng_cache['ts']).seconds < 300
+    
+    def _store_fear_greed(self, data, now):
+        """Разбирает ответ F&G API и сохраняет значение в кэш"""
+        value = None
+        next_update = None
+        if data and 'data' in data and len(data['data']) > 0:
+            value = int(data['data'][0]['value'])
+            classification = data['data'][0]['value_classification']
+            logger.info(f"Fear & Greed Index: {value} ({classification})")
+            until = data['data'][0].get('time_until_update')
+            if until is not None:
+                next_update = now + timedelta(seconds=int(until))
+        
+        if value is None:
+            # fallback значение
+            value = 50
+            logger.warning("F&G returned None, using default: 50")
+        
+        self._fng_cache = {'value': value, 'ts': now, 'next_update': next_update}
+        return value
+    
+    def _get_cached_fng_or_default(self):
+        """Возвращает кэшированный F&G или дефолт"""
+        cached_value = self._fng_cache['value']
+        if cached_value is not None:
+            logger.warning(f"Using cached F&G value: {cached_value}")
+            return cached_value
+        else:
+            logger.warning("No cache available, using default: 50")
+            return 50
+    
+    def _record_open_interest(self, current_oi):
+        """Добавляет значение OI в историю и считает изменения"""
+        now = self._now()
+        
+        # Обновляем историю (кольцевой буфер фиксированной ёмкости)
+        self._oi_history.append(current_oi, ts=now.timestamp())
+            
+        # Вычисляем изменения
+        change_5m = self._calculate_oi_change(minutes=5)
+        change_1h = self._calculate_oi_change(minutes=60)
+        change_4h = self._calculate_oi_change(minutes=240)
+            
+        result = {
+            'value': current_oi,
+            'change_5m': change_5m,
+            'change_1h': change_1h,
+            'change_4h': change_4h,
+            'timestamp': now
+        }
             
-            current_oi = history[-1]['value']
-            past_oi = closest['value']
+        # Обновляем кэш
+        self._oi_cache['value'] = result
+        self._oi_cache['ts'] = now
             
-            if past_oi == 0:
-                return 0.0
+        logger.info(
+            f"Open Interest: {current_oi:,.0f} | "
+            f"5m: {change_5m:+.2f}% | 1h: {change_1h:+.2f}% | 4h: {change_4h:+.2f}%"
+        )
             
-            change = ((current_oi - past_oi) / past_oi) * 100
-            return round(change, 2)
+        return result
+            
+    def _calculate_oi_change(self, minutes):
+        """Вычисляет изменение OI за указанный период"""
+        try:
+            # Ближайшая по времени запись находится бинарным поиском
+            return self._oi_history.change_pct(minutes * 60, now=self.clock())
             
         except Exception as e:
             logger.debug(f"Error calculating OI change: {e}")
@@ -260,7 +778,7 @@ class DataCollector:
         Рассчитывает изменение цены за N периодов
         
         Args:
-            df: DataFrame с ценами
+            df: DataFrame с ценами или Candles
             periods: Количество периодов назад
             
         Returns:
@@ -270,8 +788,10 @@ class DataCollector:
             logger.warning(f"Not enough data for price change calculation: {len(df) if df is not None else 0} < {periods}")
             return 0
         
-        current_price = df['close'].iloc[-1]
-        past_price = df['close'].iloc[-periods]
+        # ✅ НОВОЕ: np.asarray - работает и для DataFrame, и для компактных Candles
+        close = np.asarray(df['close'])
+        current_price = float(close[-1])
+        past_price = float(close[-periods])
         
         if past_price == 0:
             logger.warning("Past price is 0, cannot calculate change")
@@ -299,27 +819,6 @@ class DataCollector:
         tf = timeframe or config.TIMEFRAME
         lm = limit or 100
         
-        # ✅ Динамический расчёт периодов в зависимости от таймфрейма
-        timeframe_minutes = {
-            '1m': 1,
-            '3m': 3,
-            '5m': 5,
-            '15m': 15,
-            '30m': 30,
-            '1h': 60,
-            '2h': 120,
-            '4h': 240,
-            '1d': 1440
-        }
-        
-        tf_min = timeframe_minutes.get(tf, 5)  # Default 5m если неизвестный
-        
-        # Рассчитываем периоды для 1h и 4h
-        periods_1h = max(1, 60 // tf_min)   # Защита от деления на 0
-        periods_4h = max(1, 240 // tf_min)
-        
-        logger.info(f"Timeframe: {tf} ({tf_min} min), Periods: 1h={periods_1h}, 4h={periods_4h}")
-        
         # Получаем OHLCV данные
         df = self.get_ohlcv_data(timeframe=tf, limit=lm)
         if df is None:
@@ -344,6 +843,31 @@ class DataCollector:
         # ✅ Open Interest (НОВОЕ!)
         open_interest = self.get_open_interest()
         
+        return self._build_market_data(df, current, fear_greed, stats_24h, orderbook, open_interest, tf)
+    
+    def _build_market_data(self, df, current, fear_greed, stats_24h, orderbook, open_interest, tf):
+        """Формирует словарь market_data из собранных источников"""
+        # ✅ Динамический расчёт периодов в зависимости от таймфрейма
+        timeframe_minutes = {
+            '1m': 1,
+            '3m': 3,
+            '5m': 5,
+            '15m': 15,
+            '30m': 30,
+            '1h': 60,
+            '2h': 120,
+            '4h': 240,
+            '1d': 1440
+        }
+        
+        tf_min = timeframe_minutes.get(tf, 5)  # Default 5m если неизвестный
+        
+        # Рассчитываем периоды для 1h и 4h
+        periods_1h = max(1, 60 // tf_min)   # Защита от деления на 0
+        periods_4h = max(1, 240 // tf_min)
+        
+        logger.info(f"Timeframe: {tf} ({tf_min} min), Periods: 1h={periods_1h}, 4h={periods_4h}")
+        
         # ✅ Изменение цены с правильными периодами
         price_change_1h = self.calculate_price_change(df, periods=periods_1h)
         price_change_4h = self.calculate_price_change(df, periods=periods_4h)
@@ -363,6 +887,8 @@ class DataCollector:
             'oi_change_5m': open_interest['change_5m'],
             'oi_change_1h': open_interest['change_1h'],
             'oi_change_4h': open_interest['change_4h'],
+            # ✅ НОВОЕ: Возраст F&G и OI (секунды)
+            'data_age': self._data_age(),
             # ✅ Метаданные для отладки
             'timeframe': tf,
             'timeframe_minutes': tf_min,
@@ -374,4 +900,4 @@ class DataCollector:
                     f"Change 1h={price_change_1h}% ({periods_1h} periods), "
                     f"Change 4h={price_change_4h}% ({periods_4h} periods)")
         
-        return market_data
\ No newline at end of file
+        return market_data
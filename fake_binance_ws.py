@@ -0,0 +1,212 @@
+"""
+Локальный фейковый WebSocket сервер Binance для офлайн тестов
+Отдаёт комбинированные потоки kline/bookTicker/ticker/depth со случайным
+блужданием цены. Также умеет отдавать историю свечей (как REST fetch_ohlcv)
+и снимок стакана (как REST fetch_order_book), чтобы бутстрап хранилища
+свечей и локального стакана совпадал с потоком.
+
+Запуск вручную (ws://127.0.0.1:8765/stream?streams=...):
+    python fake_binance_ws.py
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from aiohttp import web, WSMsgType
+from candle_store import timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+class FakeBinanceStream:
+    """Фейковый сервер комбинированных потоков Binance"""
+    
+    def __init__(self, host='127.0.0.1', port=0, interval=0.02, ticks_per_candle=5, start_price=60000.0, seed=42):
+        self.host = host
+        self.port = port
+        self.interval = interval  # Пауза между пачками сообщений (секунды)
+        self.ticks_per_candle = ticks_per_candle  # Сколько тиков длится одна свеча
+        self.start_ts = (int(time.time() * 1000) // 3_600_000) * 3_600_000
+        self.rng = random.Random(seed)
+        self.price = start_price
+        self.tick = 0
+        self.candles = {}  # timeframe -> list [ts, o, h, l, c, v]
+        self.messages_sent = 0
+        # Стакан для diff потока: цена -> количество
+        self.book = {'bids': {}, 'asks': {}}
+        self.book_levels = 50
+        self.update_id = 1000
+        self.drop_depth_updates = 0  # Сколько следующих diff событий "потерять"
+        self.connections = set()
+        self._runner = None
+    
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+    
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/stream', self.handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Binance stream on {self.url}")
+    
+    async def stop(self):
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def drop_connections(self):
+        """Разрывает все соединения (для проверки переподключения)"""
+        for ws in list(self.connections):
+            await ws.close()
+        self.connections.clear()
+    
+    def history(self, timeframe, limit):
+        """Последние limit свечей (включая формирующуюся) в формате fetch_ohlcv"""
+        return [list(c) for c in self.candles.get(timeframe, [])[-limit:]]
+    
+    def seed_history(self, timeframe, n):
+        """Генерирует n закрытых свечей до начала потока"""
+        tf_ms = timeframe_to_ms(timeframe)
+        candles = []
+        price = self.price
+        for i in range(n, 0, -1):
+            o = price
+            c = o * (1 + self.rng.gauss(0, 0.001))
+            candles.append([self.start_ts - i * tf_ms, o, max(o, c) * 1.0005, min(o, c) * 0.9995, c, self.rng.uniform(5, 50)])
+            price = c
+        self.price = price
+        self.candles[timeframe] = candles
+    
+    def order_book_snapshot(self, limit=1000):
+        """Снимок стакана diff потока в формате fetch_order_book ccxt"""
+        if not self.book['bids']:
+            self._book_diff()
+        return {
+            'bids': [[p, q] for p, q in sorted(self.book['bids'].items(), reverse=True)[:limit]],
+            'asks': [[p, q] for p, q in sorted(self.book['asks'].items())[:limit]],
+            'nonce': self.update_id
+        }
+    
+    def _book_diff(self):
+        """Перестраивает стакан вокруг цены: изменения (bids, asks) с нулями для удалённых уровней"""
+        step = 0.5
+        top = int(self.price / step) * step
+        changes = []
+        for side, sign, start in (('bids', -1, top), ('asks', 1, top + step)):
+            book = self.book[side]
+            new = {round(start + sign * i * step, 2): round(self.rng.uniform(0.1, 5.0), 3)
+                   for i in range(self.book_levels)}
+            # Часть уровней не меняется между обновлениями
+            for price in new:
+                if price in book and self.rng.random() < 0.7:
+                    new[price] = book[price]
+            diff = [[str(p), '0'] for p in book if p not in new]
+            diff += [[str(p), str(q)] for p, q in new.items() if book.get(p) != q]
+            self.book[side] = new
+            changes.append(diff)
+        return changes
+    
+    def _depth_update(self, symbol):
+        """depthUpdate событие с диапазоном U..u как у Binance"""
+        bids, asks = self._book_diff()
+        first_id = self.update_id + 1
+        self.update_id += max(1, len(bids) + len(asks))
+        return {'e': 'depthUpdate', 's': symbol.upper(), 'U': first_id, 'u': self.update_id, 'b': bids, 'a': asks}
+    
+    def _advance(self, timeframe):
+        """Следующий тик свечи таймфрейма: (свеча, закрыта ли)"""
+        tf_ms = timeframe_to_ms(timeframe)
+        candles = self.candles.setdefault(timeframe, [])
+        index = self.tick // self.ticks_per_candle
+        open_ts = self.start_ts + index * tf_ms
+        
+        if not candles or candles[-1][0] != open_ts:
+            candles.append([open_ts, self.price, self.price, self.price, self.price, 0.0])
+        candle = candles[-1]
+        candle[2] = max(candle[2], self.price)
+        candle[3] = min(candle[3], self.price)
+        candle[4] = self.price
+        candle[5] += self.rng.uniform(0.1, 2.0)
+        is_closed = (self.tick + 1) % self.ticks_per_candle == 0
+        return candle, is_closed
+    
+    def _messages(self, streams):
+        """Сообщения для одного тика по всем запрошенным потокам"""
+        self.price *= 1 + self.rng.gauss(0, 0.0005)
+        spread = self.price * 0.00001
+        messages = []
+        for stream in streams:
+            symbol, kind = stream.split('@', 1)
+            if kind.startswith('kline_'):
+                timeframe = kind[len('kline_'):]
+                candle, is_closed = self._advance(timeframe)
+                tf_ms = timeframe_to_ms(timeframe)
+                data = {'e': 'kline', 's': symbol.upper(), 'k': {
+                    't': candle[0], 'T': candle[0] + tf_ms - 1, 'i': timeframe,
+                    'o': str(candle[1]), 'h': str(candle[2]), 'l': str(candle[3]),
+                    'c': str(candle[4]), 'v': str(candle[5]), 'x': is_closed
+                }}
+            elif kind == 'bookTicker':
+                data = {'s': symbol.upper(), 'b': str(self.price - spread), 'B': '1.5',
+                        'a': str(self.price + spread), 'A': '2.0'}
+            elif kind == 'ticker':
+                data = {'e': '24hrTicker', 's': symbol.upper(), 'c': str(self.price),
+                        'q': '1500000000', 'P': '1.25', 'h': str(self.price * 1.02), 'l': str(self.price * 0.98)}
+            elif kind == 'depth' or kind.startswith('depth@'):
+                data = self._depth_update(symbol)
+                if self.drop_depth_updates > 0:
+                    self.drop_depth_updates -= 1
+                    continue
+            elif kind.startswith('depth'):
+                levels = int(kind[len('depth'):].split('@')[0])
+                data = {'lastUpdateId': self.tick,
+                        'bids': [[str(self.price - spread * (i + 1)), str(1.0 + i)] for i in range(levels)],
+                        'asks': [[str(self.price + spread * (i + 1)), str(1.0 + i)] for i in range(levels)]}
+            else:
+                continue
+            messages.append({'stream': stream, 'data': data})
+        self.tick += 1
+        return messages
+    
+    async def handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections.add(ws)
+        streams = request.query.get('streams', '').split('/')
+        
+        try:
+            while not ws.closed:
+                for message in self._messages(streams):
+                    await ws.send_str(json.dumps(message))
+                    self.messages_sent += 1
+                try:
+                    msg = await ws.receive(timeout=self.interval)
+                    if msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED):
+                        break
+                except asyncio.TimeoutError:
+                    pass
+        except ConnectionResetError:
+            pass
+        finally:
+            self.connections.discard(ws)
+        return ws
+
+async def _serve_forever():
+    server = FakeBinanceStream(port=8765, interval=1.0, ticks_per_candle=60)
+    for timeframe in ('1m', '5m'):
+        server.seed_history(timeframe, 200)
+    await server.start()
+    print(f"Fake Binance stream running on {server.url} (Ctrl+C to stop)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+if __name__ == '__main__':
+    asyncio.run(_serve_forever())
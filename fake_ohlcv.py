@@ -0,0 +1,26 @@
+"""
+Синтетические минутные свечи для офлайн тестов
+Случайное блуждание цены в формате ответа fetch_ohlcv ccxt:
+[timestamp, open, high, low, close, volume].
+"""
+import numpy as np
+
+def make_ohlcv(n, seed=0, volatility=0.002, spread=0.001, start=0):
+    """
+    Генерирует n минутных свечей
+    
+    Args:
+        n: Количество свечей
+        seed: Зерно генератора (одинаковое зерно - одинаковые свечи)
+        volatility: Стандартное отклонение лог-доходности за свечу
+        spread: Отступ high/low от close (доля цены)
+        start: Номер первой свечи (продолжение ряда со сдвигом по времени)
+    
+    Returns:
+        list: Свечи [timestamp, open, high, low, close, volume]
+    """
+    rng = np.random.default_rng(seed)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    ts = 1_700_000_000_000 + (start + np.arange(n)) * 60_000
+    return [[int(t), c, c * (1 + spread), c * (1 - spread), c, float(v)]
+            for t, c, v in zip(ts, close, rng.uniform(1, 100, n))]
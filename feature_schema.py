@@ -0,0 +1,100 @@
+"""
+Схемы признаков ML модели по режимам
+Схема фиксирует имена, порядок и типы колонок матрицы признаков
+(prepare_features / prepare_features_batch) и имеет версию. Схема пишется в
+meta.json каждой версии модели и сверяется при загрузке: модель режима day
+не попадёт в swing и наоборот, а изменение набора признаков требует
+переобучения вместо тихого отката на rule-based прогноз.
+dtype колонки - область значений (float64 - число, int8 - код категории
+-1/0/1 или флаг 0/1); сама матрица всегда float64, как ждёт StandardScaler
+"""
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+BASE_COLUMNS = (
+    ('rsi', 'float64'),
+    ('macd', 'float64'),
+    ('macd_signal', 'float64'),
+    ('macd_histogram', 'float64'),
+    ('macd_crossover', 'int8'),
+    ('bb_upper', 'float64'),
+    ('bb_lower', 'float64'),
+    ('bb_position', 'int8'),
+    ('ema_50', 'float64'),
+    ('ema_200', 'float64'),
+    ('volume_ratio', 'float64'),
+    ('is_high_volume', 'int8'),
+    ('momentum', 'float64'),
+    ('atr', 'float64'),
+    ('price_change_1h', 'float64'),
+    ('price_change_4h', 'float64'),
+    ('fear_greed', 'float64'),
+    ('current_volume', 'float64')
+)
+
+# Имена - как колонки calculate_indicator_series
+DAY_COLUMNS = (
+    ('day_trend_strength', 'float64'),
+    ('day_volatility_value', 'float64'),
+    ('day_volume_surge', 'float64'),
+    ('day_is_consolidating', 'int8'),
+    ('day_price_momentum', 'float64'),
+    ('day_current_spread', 'float64'),
+    ('day_ma_cross', 'int8'),
+    ('day_volume_confirmed', 'int8'),
+    ('day_spread_ok', 'int8'),
+    ('is_valid_for_daytrading', 'int8')
+)
+
+class FeatureSchema:
+    """Колонки матрицы признаков одного режима"""
+    
+    __slots__ = ('mode', 'version', 'columns', 'index')
+    
+    def __init__(self, mode, columns, version=SCHEMA_VERSION):
+        self.mode = mode
+        self.version = version
+        self.columns = tuple(columns)
+        self.index = {name: i for i, (name, _) in enumerate(self.columns)}  # Имя -> номер колонки
+    
+    def __len__(self):
+        return len(self.columns)
+    
+    @property
+    def names(self):
+        return [name for name, _ in self.columns]
+    
+    def empty(self, n=1):
+        """Матрица признаков под n строк (заполняется по index)"""
+        return np.empty((n, len(self.columns)))
+    
+    def to_meta(self):
+        """Описание схемы для meta.json"""
+        return {'mode': self.mode, 'version': self.version, 'columns': [list(column) for column in self.columns]}
+    
+    def check(self, meta):
+        """
+        Сверяет схему с meta.json версии модели
+        
+        Версии без схемы (обученные до её появления) - по числу признаков.
+        
+        Raises:
+            ValueError: модель обучена на другом наборе признаков
+        """
+        schema = meta.get('schema')
+        if schema is None:
+            if meta.get('features') != len(self):
+                raise ValueError(f"{self.mode} model has {meta.get('features')} features, schema has {len(self)}")
+            return
+        if schema != self.to_meta():
+            raise ValueError(f"{self.mode} model schema v{schema.get('version')} does not match v{self.version}")
+
+FEATURE_SCHEMAS = {
+    'swing': FeatureSchema('swing', BASE_COLUMNS),
+    'day': FeatureSchema('day', BASE_COLUMNS + DAY_COLUMNS)
+}
+
+def schema_for(mode):
+    """Схема режима (неизвестный режим - swing, как в prepare_features)"""
+    return FEATURE_SCHEMAS['day' if mode == 'day' else 'swing']
@@ -0,0 +1,138 @@
+"""
+Быстрый прогноз RandomForest по плоским массивам
+Все деревья обученного леса выгружаются в общие непрерывные массивы
+(признак, порог, дети, значения листьев); строка проходит все деревья сразу -
+один векторный шаг numpy на уровень глубины вместо вызова predict_proba
+каждого дерева. Вероятности побитово совпадают с sklearn (листья
+суммируются в порядке деревьев, как при n_jobs=1)
+
+Сравнение задержки:
+    python forest_eval.py --rows 1 --runs 1000
+"""
+import argparse
+import threading
+import time
+import numpy as np
+import config
+
+class FlatForest:
+    """
+    Лес sklearn (RandomForestClassifier) в плоских массивах
+    
+    Листья замкнуты сами на себя (порог +inf, оба ребёнка - сам лист),
+    поэтому обход - ровно max_depth шагов без проверок "лист ли это".
+    Интерфейс для MLPredictor: classes_, predict_proba, predict.
+    """
+    
+    # Плоские массивы - сохраняются рядом с лесом (model_registry) и
+    # загружаются через mmap без повторной распаковки деревьев
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots', 'classes_')
+    
+    def __init__(self, estimator=None, arrays=None, loader=None):
+        """
+        Args:
+            estimator: обученный RandomForestClassifier
+            arrays: плоские массивы (arrays()) - тогда лес не распаковывается
+            loader: загрузка исходного леса по требованию, если estimator не задан
+        """
+        self._forest = estimator
+        self._loader = loader
+        self._lock = threading.Lock()
+        if arrays is not None:
+            # np.memmap -> обычный ndarray над теми же страницами (индексация memmap медленнее)
+            for name in self.ARRAYS:
+                setattr(self, name, arrays[name].view(np.ndarray))
+            self.max_depth = int(arrays['max_depth'])
+            return
+        self.classes_ = estimator.classes_
+        n_classes = len(self.classes_)
+        trees = [e.tree_ for e in estimator.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+        
+        is_leaf = np.concatenate([t.children_left == -1 for t in trees])
+        self.feature = np.where(is_leaf, 0, np.concatenate([t.feature for t in trees])).astype(np.intp)
+        self.threshold = np.where(is_leaf, np.inf, np.concatenate([t.threshold for t in trees]))
+        nodes = np.arange(len(is_leaf))
+        self.left = np.where(is_leaf, nodes, np.concatenate([t.children_left + o for t, o in zip(trees, offsets)]))
+        self.right = np.where(is_leaf, nodes, np.concatenate([t.children_right + o for t, o in zip(trees, offsets)]))
+        # NaN идёт в сторону, выбранную при обучении (как tree_.apply)
+        self.missing_left = np.concatenate([
+            t.missing_go_to_left.astype(bool) if hasattr(t, 'missing_go_to_left') else np.zeros(t.node_count, bool)
+            for t in trees
+        ]) & ~is_leaf
+        # Для классификатора sklearn (с 1.4, см. requirements.txt) хранит в value
+        # доли классов - это и есть predict_proba дерева; 1.3 хранил число объектов
+        self.value = np.ascontiguousarray(np.concatenate([t.value[:, 0, :n_classes] for t in trees]))
+        self.roots = offsets.astype(np.intp)
+        self.max_depth = max(t.max_depth for t in trees)
+    
+    @classmethod
+    def from_sklearn(cls, estimator):
+        return cls(estimator)
+    
+    @property
+    def forest(self):
+        """Исходный лес - для save_model и больших блоков (загружается при первом обращении)"""
+        if self._forest is None:
+            with self._lock:
+                if self._forest is None:
+                    self._forest = self._loader()
+        return self._forest
+    
+    def arrays(self):
+        """Плоские массивы для joblib.dump (обратно - FlatForest(arrays=..., loader=...))"""
+        return {**{name: getattr(self, name) for name in self.ARRAYS}, 'max_depth': self.max_depth}
+    
+    def apply(self, X):
+        """Индексы листьев (строки x деревья) - обход уровень за уровнем"""
+        # Деревья sklearn сравнивают признаки во float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+    
+    def predict_proba(self, X):
+        """
+        Вероятности классов, побитово как RandomForestClassifier.predict_proba
+        
+        Больше config.FLAT_FOREST_MAX_ROWS строк - исходный лес: на больших
+        блоках Cython обход sklearn быстрее векторного.
+        """
+        if len(X) > config.FLAT_FOREST_MAX_ROWS:
+            return self.forest.predict_proba(X)
+        leaves = self.value[self.apply(X)]  # (строки, деревья, классы)
+        # cumsum складывает строго по порядку деревьев, как накопление в sklearn
+        return np.cumsum(leaves, axis=1)[:, -1] / len(self.roots)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def _benchmark(args):
+    from ml_model import default_model
+    
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20_000, args.features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 0.5, len(X)) > 0).astype(int) + (X[:, 3] > 1.5)
+    model = default_model(n_jobs=1).fit(X, y)
+    flat = FlatForest.from_sklearn(model)
+    rows = X[:args.rows]
+    assert np.array_equal(flat.predict_proba(rows), model.predict_proba(rows))
+    
+    config.FLAT_FOREST_MAX_ROWS = len(rows)  # Замеряем именно плоский обход
+    for name, predict_proba in (('sklearn', model.predict_proba), ('flat', flat.predict_proba)):
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            predict_proba(rows)
+        elapsed = (time.perf_counter() - start) / args.runs
+        print(f"{name:<8} {args.rows} rows: {elapsed * 1e6:.0f}us per call")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark flat forest inference against sklearn')
+    parser.add_argument('--rows', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=500)
+    parser.add_argument('--features', type=int, default=18)
+    _benchmark(parser.parse_args())
@@ -0,0 +1,185 @@
+"""
+Потоковый расчёт индикаторов: O(1) на закрытую свечу
+Держит текущее состояние EMA, скользящих среднего и дисперсии (Welford по
+кольцевому буферу), ATR, среднего объёма, моментума и VWAP вместо пересчёта
+всего DataFrame на каждом цикле. Значения совпадают с TechnicalIndicators
+по той же истории свечей
+"""
+import math
+import config
+
+# Раз в столько обновлений скользящие суммы пересчитываются из буфера,
+# чтобы ошибка округления не накапливалась
+RESYNC_EVERY = 10_000
+
+class RollingWindow:
+    """Скользящее окно: среднее и выборочная дисперсия (Welford) за O(1)"""
+    
+    def __init__(self, period):
+        self.period = period
+        self._buffer = [0.0] * period
+        self._index = 0
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+    
+    @property
+    def ready(self):
+        return self.count == self.period
+    
+    def push(self, x):
+        """Добавляет значение, вытесняя самое старое при полном окне"""
+        if self.count < self.period:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (x - self.mean)
+        else:
+            old = self._buffer[self._index]
+            old_mean = self.mean
+            self.mean += (x - old) / self.period
+            self._m2 += (x - old) * (x - self.mean + old - old_mean)
+        self._buffer[self._index] = x
+        self._index = (self._index + 1) % self.period
+        
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._resync()
+    
+    def _resync(self):
+        values = self.values()
+        self.mean = math.fsum(values) / len(values)
+        self._m2 = math.fsum((v - self.mean) ** 2 for v in values)
+    
+    def values(self):
+        """Значения окна от старого к новому"""
+        if self.count < self.period:
+            return self._buffer[:self.count]
+        return self._buffer[self._index:] + self._buffer[:self._index]
+    
+    def oldest(self):
+        """Самое старое значение окна"""
+        return self._buffer[self._index] if self.ready else self._buffer[0]
+    
+    @property
+    def variance(self):
+        """Выборочная дисперсия (ddof=1, как pandas rolling().std())"""
+        if self.count < 2:
+            return math.nan
+        return max(self._m2, 0.0) / (self.count - 1)
+    
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+class EMA:
+    """EMA как pandas ewm(span, adjust=False): старт с первого значения"""
+    
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+        self.count = 0
+    
+    def push(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        self.count += 1
+
+class StreamingIndicators:
+    """
+    Индикаторы calculate_all_indicators, обновляемые по одной свече
+    
+    EMA и VWAP накапливаются с первой поданной свечи, как и батч-расчёт
+    по DataFrame: совпадают, если движок прогрет той же историей.
+    """
+    
+    def __init__(self, bb_period=None, volume_period=None, momentum_period=10, atr_period=14):
+        self.bb = RollingWindow(bb_period or config.BOLLINGER_PERIOD)
+        self.volume = RollingWindow(volume_period or config.VOLUME_MA_PERIOD)
+        self.true_range = RollingWindow(atr_period)
+        # momentum = close[-1] - close[-period]: окно из period последних цен
+        self.closes = RollingWindow(momentum_period)
+        self.ema_50 = EMA(50)
+        self.ema_200 = EMA(200)
+        self.prev_close = None
+        self.cum_tp_volume = 0.0
+        self.cum_volume = 0.0
+        self.last = None  # Последняя свеча (open, high, low, close, volume)
+        self.timestamp = None
+        self.count = 0
+    
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        """Прогревает движок историей DataFrame (колонки как в get_ohlcv_data)"""
+        engine = cls(**kwargs)
+        columns = [df[c].to_numpy(dtype=float) for c in ('open', 'high', 'low', 'close', 'volume')]
+        for o, h, l, c, v in zip(*columns):
+            engine.update(o, h, l, c, v)
+        if len(df) and 'timestamp' in df.columns:
+            engine.timestamp = df['timestamp'].iloc[-1]
+        return engine
+    
+    def update(self, open_, high, low, close, volume, timestamp=None):
+        """Добавляет закрытую свечу - O(1)"""
+        open_, high, low, close, volume = float(open_), float(high), float(low), float(close), float(volume)
+        self.bb.push(close)
+        self.volume.push(volume)
+        self.closes.push(close)
+        self.ema_50.push(close)
+        self.ema_200.push(close)
+        
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.true_range.push(tr)
+        self.prev_close = close
+        
+        self.cum_tp_volume += (high + low + close) / 3 * volume
+        self.cum_volume += volume
+        self.last = (open_, high, low, close, volume)
+        if timestamp is not None:
+            self.timestamp = timestamp
+        self.count += 1
+    
+    @property
+    def ready(self):
+        """Достаточно истории для всех окон (как минимум 50 свечей батч-расчёта)"""
+        return self.count >= 50
+    
+    def vwap(self):
+        if self.cum_volume == 0:
+            return None
+        result = self.cum_tp_volume / self.cum_volume
+        return result if math.isfinite(result) else None
+    
+    def snapshot(self):
+        """
+        Текущие значения в формате calculate_all_indicators
+        
+        Returns:
+            dict или None, если истории недостаточно
+        """
+        if not self.ready:
+            return None
+        close, volume = self.last[3], self.last[4]
+        
+        middle = self.bb.mean
+        std = self.bb.std
+        upper, lower = middle + 2 * std, middle - 2 * std
+        avg_volume = self.volume.mean
+        volume_ratio = volume / avg_volume if avg_volume > 0 else 1
+        
+        return {
+            'bb_upper': upper,
+            'bb_middle': middle,
+            'bb_lower': lower,
+            'bb_position': 'above_upper' if close > upper else 'below_lower' if close < lower else 'inside',
+            'ema_50': self.ema_50.value,
+            'ema_200': self.ema_200.value if self.ema_200.count >= 200 else None,
+            'volume_ratio': volume_ratio,
+            'is_high_volume': volume_ratio > 1.5,
+            'momentum': close - self.closes.oldest(),
+            'atr': self.true_range.mean,
+            'vwap': self.vwap()
+        }
@@ -0,0 +1,241 @@
+"""
+Граф индикаторов с общими промежуточными значениями и кэшем
+Каждый узел объявляет свои входы; граф вычисляет узел один раз на набор
+свечей (скользящие средние, EWM, max/min окон общие для swing и day режимов).
+Готовые графы кэшируются по (id ряда, последняя свеча), поэтому повторный
+запрос (/status сразу после цикла мониторинга) отдаётся из кэша
+"""
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+import config
+from candles import timestamps_ms
+from indicators_numpy import ewm_last, ohlcv_arrays, true_range_tail
+
+logger = logging.getLogger(__name__)
+
+# kind -> (функция, входы): функция получает значения входов и параметры ключа
+NODES = {}
+
+def node(kind, inputs=None):
+    """
+    Регистрирует узел графа
+    
+    Ключ узла - кортеж (kind, *params). inputs(*params) возвращает ключи
+    входов; их значения передаются в функцию перед параметрами.
+    """
+    def register(fn):
+        NODES[kind] = (fn, inputs or (lambda *params: ()))
+        return fn
+    return register
+
+def _column(name):
+    return ('column', name)
+
+@node('mean', inputs=lambda column, period: [_column(column)])
+def _mean(x, column, period):
+    # NaN при нехватке истории - как rolling().mean()
+    return x[-period:].mean() if len(x) >= period else np.nan
+
+@node('std', inputs=lambda column, period: [_column(column), ('mean', column, period)])
+def _std(x, mean, column, period):
+    if len(x) < period:
+        return np.nan
+    return np.sqrt(((x[-period:] - mean) ** 2).sum() / (period - 1))
+
+@node('max', inputs=lambda column, period: [_column(column)])
+def _max(x, column, period):
+    return x[-period:].max()
+
+@node('min', inputs=lambda column, period: [_column(column)])
+def _min(x, column, period):
+    return x[-period:].min()
+
+@node('ewm', inputs=lambda column, span, adjust: [_column(column)])
+def _ewm(x, column, span, adjust):
+    return ewm_last(x, span, adjust)
+
+@node('ewm_prev', inputs=lambda column, span, adjust: [_column(column)])
+def _ewm_prev(x, column, span, adjust):
+    """EWM на предыдущей свече (для пересечений)"""
+    return ewm_last(x[:-1], span, adjust)
+
+@node('atr', inputs=lambda period: [_column('high'), _column('low'), _column('close')])
+def _atr(high, low, close, period):
+    return true_range_tail(high, low, close, period).mean() if len(close) >= period else np.nan
+
+@node('vwap', inputs=lambda: [_column('high'), _column('low'), _column('close'), _column('volume')])
+def _vwap(high, low, close, volume):
+    cum_vol = volume.sum()
+    if cum_vol == 0 or np.isnan(cum_vol):
+        return None
+    result = float(((high + low + close) / 3) @ volume / cum_vol)
+    return result if np.isfinite(result) else None
+
+@node('bollinger', inputs=lambda period: [_column('close'), ('mean', 'close', period), ('std', 'close', period)])
+def _bollinger(close, sma, std, period):
+    upper, lower = sma + 2 * std, sma - 2 * std
+    current_price = close[-1]
+    return {
+        'bb_upper': upper,
+        'bb_middle': sma,
+        'bb_lower': lower,
+        'bb_position': 'above_upper' if current_price > upper else
+                       'below_lower' if current_price < lower else 'inside'
+    }
+
+@node('volume_ratio', inputs=lambda period: [_column('volume'), ('mean', 'volume', period)])
+def _volume_ratio(volume, avg_volume, period):
+    return (volume[-1] / avg_volume) if avg_volume > 0 else 1
+
+@node('swing', inputs=lambda bb_period, volume_period: [
+    _column('close'), ('bollinger', bb_period), ('ewm', 'close', 50, False), ('ewm', 'close', 200, False),
+    ('volume_ratio', volume_period), ('atr', 14), ('vwap',)
+])
+def _swing(close, bollinger, ema_50, ema_200, volume_ratio, atr, vwap, bb_period, volume_period):
+    """Индикаторы swing режима (как TechnicalIndicators._base_indicators)"""
+    return {
+        **bollinger,
+        'ema_50': ema_50,
+        'ema_200': ema_200 if len(close) >= 200 else None,
+        'volume_ratio': volume_ratio,
+        'is_high_volume': volume_ratio > 1.5,
+        'momentum': close[-1] - close[-10],
+        'atr': atr,
+        'vwap': vwap
+    }
+
+@node('day', inputs=lambda fast, slow, consolidation: [
+    _column('close'), _column('volume'),
+    ('ewm', 'close', fast, True), ('ewm', 'close', slow, True),
+    ('ewm_prev', 'close', fast, True), ('ewm_prev', 'close', slow, True),
+    ('max', 'high', 5), ('min', 'low', 5), ('mean', 'volume', 20),
+    ('max', 'high', consolidation), ('min', 'low', consolidation), ('mean', 'close', consolidation)
+])
+def _day(close, volume, fast_ma, slow_ma, fast_prev, slow_prev, high_5, low_5, volume_ma,
+         high_c, low_c, close_c, fast, slow, consolidation):
+    """Числовая часть индикаторов дейтрейдинга (пороги и спред - в day_trading_indicators)"""
+    return {
+        'ma_fast': fast_ma,
+        'ma_slow': slow_ma,
+        'ma_fast_prev': fast_prev,
+        'ma_slow_prev': slow_prev,
+        'volatility_value': high_5 / low_5 - 1,
+        'volume_surge': volume[-1] / volume_ma,
+        'price_range': (high_c - low_c) / close_c,
+        'price_momentum': (close[-1] - close[-5]) / close[-5] * 100
+    }
+
+class IndicatorGraph:
+    """Значения узлов для одного набора свечей (вычисляются по запросу, один раз)"""
+    
+    def __init__(self, arrays, copy=False):
+        # Кэшируемому графу нужны копии: окна CandleStore - представления
+        # буфера, который сдвигается при догрузке
+        self.values = {_column(name): values.copy() if copy else values for name, values in arrays.items()}
+        self.computed = 0
+    
+    def get(self, key):
+        """Значение узла; входы вычисляются рекурсивно и запоминаются"""
+        if key in self.values:
+            return self.values[key]
+        fn, inputs = NODES[key[0]]
+        params = key[1:]
+        value = fn(*[self.get(k) for k in inputs(*params)], *params)
+        self.values[key] = value
+        self.computed += 1
+        return value
+
+class IndicatorCache:
+    """
+    LRU кэш графов по (id ряда, время и длина окна, последняя свеча)
+    
+    Цена закрытия и объём последней свечи входят в ключ: формирующаяся
+    свеча меняется между циклами при том же времени открытия.
+    """
+    
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or config.INDICATOR_CACHE_SIZE
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(df, series_id=None):
+        """Ключ кэша или None, если ряд не идентифицирован"""
+        series_id = series_id or df.attrs.get('series_id')
+        if series_id is None or 'timestamp' not in df.columns or not len(df):
+            return None
+        # np.asarray - и для колонок DataFrame, и для Candles (время в мс у обоих)
+        last_ts = int(timestamps_ms(np.asarray(df['timestamp'])[-1:])[0])
+        return (series_id, last_ts, len(df), float(np.asarray(df['close'])[-1]), float(np.asarray(df['volume'])[-1]))
+    
+    def graph(self, df, series_id=None):
+        """Граф для свечей df: из кэша или новый"""
+        key = self.key(df, series_id)
+        if key is not None:
+            with self._lock:
+                graph = self._graphs.get(key)
+                if graph is not None:
+                    self._graphs.move_to_end(key)
+                    self.hits += 1
+                    return graph
+                self.misses += 1
+        
+        graph = IndicatorGraph(ohlcv_arrays(df), copy=key is not None)
+        if key is not None:
+            with self._lock:
+                self._graphs[key] = graph
+                while len(self._graphs) > self.maxsize:
+                    self._graphs.popitem(last=False)
+        return graph
+    
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+
+CACHE = IndicatorCache()
+
+def _scalars(values):
+    """float32 скаляры (свечи Candles) -> float, чтобы результат не зависел от хранения"""
+    return {k: float(v) if isinstance(v, np.float32) else v for k, v in values.items()}
+
+def swing_indicators(graph):
+    """Индикаторы swing режима из графа"""
+    return _scalars(graph.get(('swing', config.BOLLINGER_PERIOD, config.VOLUME_MA_PERIOD)))
+
+def day_trading_indicators(graph, orderbook=None):
+    """Аналог calculate_day_trading_indicators: числа из графа, пороги и спред - на месте"""
+    day_config = config.DAY_TRADING_CONFIG
+    day = _scalars(graph.get(('day', day_config['fast_ma'], day_config['slow_ma'], day_config['consolidation_period'])))
+    fast_ma, slow_ma = day['ma_fast'], day['ma_slow']
+    fast_prev, slow_prev = day['ma_fast_prev'], day['ma_slow_prev']
+    threshold = day_config['volatility_threshold']
+    
+    if orderbook:
+        best_bid = float(orderbook['bids'][0][0])
+        best_ask = float(orderbook['asks'][0][0])
+        current_spread = (best_ask - best_bid) / best_bid * 100
+    else:
+        current_spread = 0
+    
+    return {
+        'trend': 'up' if fast_ma > slow_ma else 'down',
+        'trend_strength': abs(fast_ma - slow_ma) / slow_ma * 100,
+        'is_volatile': day['volatility_value'] > threshold,
+        'volatility_value': day['volatility_value'],
+        'volume_surge': day['volume_surge'],
+        'is_consolidating': day['price_range'] < threshold,
+        'price_momentum': day['price_momentum'],
+        'current_spread': current_spread,
+        'ma_fast': fast_ma,
+        'ma_slow': slow_ma,
+        'signals': {
+            'ma_cross': 'buy' if (fast_ma > slow_ma and fast_prev <= slow_prev) else
+                      'sell' if (fast_ma < slow_ma and fast_prev >= slow_prev) else None,
+            'volume_confirmed': day['volume_surge'] > day_config['volume_increase_threshold'],
+            'spread_ok': current_spread < day_config['max_spread']
+        }
+    }
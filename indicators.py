@@ -2,6 +2,10 @@ import pandas as pd
 import numpy as np
 import config
 import logging
+import indicators_numpy
+import indicator_graph
+import rolling_rank
+from candles import Candles
 
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
@@ -131,8 +135,12 @@ class TechnicalIndicators:
             if not orderbook or not orderbook.get('bids') or not orderbook.get('asks'):
                 return 0.0
             
-            bid_vol = sum(b[1] for b in orderbook['bids'])
-            ask_vol = sum(a[1] for a in orderbook['asks'])
+            if 'bid_volume' in orderbook:
+                # Локальный стакан уже посчитал объёмы по накопленным суммам
+                bid_vol, ask_vol = orderbook['bid_volume'], orderbook['ask_volume']
+            else:
+                bid_vol = sum(b[1] for b in orderbook['bids'])
+                ask_vol = sum(a[1] for a in orderbook['asks'])
             total = bid_vol + ask_vol
             
             if total == 0:
@@ -149,6 +157,18 @@ class TechnicalIndicators:
         except Exception as e:
             logger.error(f"Error calculating orderbook imbalance: {e}")
             return 0.0
+    
+    @staticmethod
+    def orderbook_spread(orderbook):
+        """
+        ✅ НОВОЕ: Спред лучших цен стакана в % (как current_spread дейтрейдинга)
+        Возвращает None если стакана нет
+        """
+        if not orderbook or not orderbook.get('bids') or not orderbook.get('asks'):
+            return None
+        best_bid = float(orderbook['bids'][0][0])
+        best_ask = float(orderbook['asks'][0][0])
+        return (best_ask - best_bid) / best_bid * 100 if best_bid > 0 else None
 
     @staticmethod
     def calculate_volume_analysis(df, period=20):
@@ -199,14 +219,15 @@ class TechnicalIndicators:
         return atr
     
     @staticmethod
-    def calculate_all_indicators(df, orderbook=None, mode='swing'):
+    def calculate_all_indicators(df, orderbook=None, mode='swing', backend=None):
         """
         Рассчитывает все индикаторы и возвращает единый словарь
         
         Args:
-            df: DataFrame с OHLCV данными
+            df: DataFrame с OHLCV данными или Candles
             orderbook: dict стакан ордеров (опционально)
             mode: str режим работы ('swing' или 'day')
+            backend: 'numpy' или 'pandas' (по умолчанию config.INDICATOR_BACKEND)
             
         Returns:
             dict: Все рассчитанные индикаторы
@@ -226,28 +247,22 @@ class TechnicalIndicators:
                 'crossover': 'none'
             }
             
-            # Bollinger Bands
-            bb_data = TechnicalIndicators.calculate_bollinger_bands(df, config.BOLLINGER_PERIOD)
-            
-            # EMA
-            ema_50 = TechnicalIndicators.calculate_ema(df, 50)
-            ema_200 = TechnicalIndicators.calculate_ema(df, 200) if len(df) >= 200 else None
-            
-            # Volume Analysis
-            volume_data = TechnicalIndicators.calculate_volume_analysis(df, config.VOLUME_MA_PERIOD)
-            
-            # Momentum
-            momentum = TechnicalIndicators.calculate_momentum(df, 10)
-            
-            # ATR
-            atr = TechnicalIndicators.calculate_atr(df, 14)
-
-            # VWAP (исправленный - может вернуть None)
-            vwap = TechnicalIndicators.calculate_vwap(df)
+            # ✅ НОВОЕ: NumPy бэкенд - граф индикаторов по массивам без промежуточных Series,
+            # общие промежуточные считаются один раз и кэшируются по ряду и последней свече
+            use_numpy = (backend or config.INDICATOR_BACKEND) == 'numpy'
+            if isinstance(df, Candles) and not use_numpy:
+                # ✅ НОВОЕ: компактные свечи - pandas бэкенду нужен DataFrame (строится лениво)
+                df = df.df
+            graph = indicator_graph.CACHE.graph(df) if use_numpy else None
+            base = indicator_graph.swing_indicators(graph) if use_numpy else TechnicalIndicators._base_indicators(df)
 
             # Orderbook imbalance (безопасный - всегда возвращает число)
             ob_imbalance = TechnicalIndicators.orderbook_imbalance(orderbook) if orderbook else 0.0
             
+            # ✅ НОВОЕ: Перцентильный ранг объёма, ATR и спреда за длинное окно
+            # (config.RANK_WINDOW свечей) - всплеск не сглаживается средним, как в volume_ratio
+            ranks = rolling_rank.RANKS.ranks(df, base['atr'], TechnicalIndicators.orderbook_spread(orderbook))
+            
             indicators = {
                 # RSI и MACD - заглушки (не используются)
                 'rsi': rsi,
@@ -256,30 +271,29 @@ class TechnicalIndicators:
                 'macd_histogram': macd_data['histogram'],
                 'macd_crossover': macd_data['crossover'],
                 # Активные индикаторы
-                'bb_upper': bb_data['upper'],
-                'bb_middle': bb_data['middle'],
-                'bb_lower': bb_data['lower'],
-                'bb_position': bb_data['position'],
-                'ema_50': ema_50,
-                'ema_200': ema_200,
-                'volume_ratio': volume_data['volume_ratio'],
-                'is_high_volume': volume_data['is_high'],
-                'momentum': momentum,
-                'atr': atr,
-                'vwap': vwap,
-                'orderbook_imbalance': ob_imbalance
+                **base,
+                'orderbook_imbalance': ob_imbalance,
+                **ranks
             }
+            volume_ratio, momentum, vwap = base['volume_ratio'], base['momentum'], base['vwap']
             
             # Добавляем индикаторы дейтрейдинга если нужно
             if mode == 'day':
-                day_indicators = TechnicalIndicators.calculate_day_trading_indicators(df, orderbook)
+                if use_numpy:
+                    try:
+                        day_indicators = indicator_graph.day_trading_indicators(graph, orderbook)
+                    except Exception as e:
+                        logger.error(f"Error calculating day trading indicators: {e}")
+                        day_indicators = None
+                else:
+                    day_indicators = TechnicalIndicators.calculate_day_trading_indicators(df, orderbook)
                 if day_indicators:
                     indicators.update({
                         'day_trading': day_indicators,
                         'is_valid_for_daytrading': TechnicalIndicators.validate_day_trading_conditions(indicators, day_indicators)[0]
                     })
             
-            logger.info(f"Indicators calculated for {mode} mode: Volume={volume_data['volume_ratio']:.2f}x, Momentum={momentum:.2f}, VWAP={'OK' if vwap else 'None'}")
+            logger.info(f"Indicators calculated for {mode} mode: Volume={volume_ratio:.2f}x, Momentum={momentum:.2f}, VWAP={'OK' if vwap else 'None'}")
             return indicators
             
         except Exception as e:
@@ -287,19 +301,83 @@ class TechnicalIndicators:
             return None
     
     @staticmethod
-    def calculate_day_trading_indicators(df, orderbook=None):
+    def calculate_indicator_series(df, mode='swing', spread=None):
+        """
+        ✅ НОВОЕ: Индикаторы по всей истории одним векторным проходом
+        
+        Строка t совпадает с calculate_all_indicators(df.iloc[:t + 1]) для
+        t >= 49; категории закодированы как в MLPredictor.prepare_features.
+        
+        Args:
+            df: DataFrame с OHLCV данными
+            mode: str режим работы ('swing' или 'day')
+            spread: спред в % по строкам (опционально)
+        
+        Returns:
+            DataFrame: timestamp + признак на колонку, индекс как у df
+        """
+        series = indicators_numpy.indicator_series(indicators_numpy.ohlcv_arrays(df), mode, spread)
+        features = pd.DataFrame(series, index=df.index)
+        if 'timestamp' in df.columns:
+            features.insert(0, 'timestamp', df['timestamp'])
+        return features
+    
+    @staticmethod
+    def _base_indicators(df):
+        """Индикаторы swing режима через pandas (бэкенд 'pandas')"""
+        # Bollinger Bands
+        bb_data = TechnicalIndicators.calculate_bollinger_bands(df, config.BOLLINGER_PERIOD)
+        
+        # Volume Analysis
+        volume_data = TechnicalIndicators.calculate_volume_analysis(df, config.VOLUME_MA_PERIOD)
+        
+        return {
+            'bb_upper': bb_data['upper'],
+            'bb_middle': bb_data['middle'],
+            'bb_lower': bb_data['lower'],
+            'bb_position': bb_data['position'],
+            'ema_50': TechnicalIndicators.calculate_ema(df, 50),
+            'ema_200': TechnicalIndicators.calculate_ema(df, 200) if len(df) >= 200 else None,
+            'volume_ratio': volume_data['volume_ratio'],
+            'is_high_volume': volume_data['is_high'],
+            'momentum': TechnicalIndicators.calculate_momentum(df, 10),
+            'atr': TechnicalIndicators.calculate_atr(df, 14),
+            # VWAP (исправленный - может вернуть None)
+            'vwap': TechnicalIndicators.calculate_vwap(df)
+        }
+    
+    @staticmethod
+    def day_trading_lookback():
+        """
+        ✅ НОВОЕ: Сколько последних свечей нужно calculate_day_trading_indicators
+        
+        Максимальное окно (объём за 20, консолидация, волатильность за 5) или
+        горизонт EWM, за которым вклад старых свечей меньше точности float64,
+        плюс свеча для пересечения MA.
+        """
+        day_config = config.DAY_TRADING_CONFIG
+        horizon = max(indicators_numpy.ewm_horizon(day_config['fast_ma']),
+                      indicators_numpy.ewm_horizon(day_config['slow_ma']))
+        return max(20, 5, day_config['consolidation_period'], horizon) + 1
+    
+    @staticmethod
+    def calculate_day_trading_indicators(df, orderbook=None, tail=True):
         """
         Специализированные индикаторы для дейтрейдинга
         
         Args:
             df: DataFrame с OHLCV данными минутного таймфрейма
             orderbook: Актуальный стакан заявок
+            tail: считать только по последним day_trading_lookback() свечам -
+                  стоимость не зависит от длины истории
             
         Returns:
             dict: Индикаторы для дейтрейдинга
         """
         try:
             day_config = config.DAY_TRADING_CONFIG
+            if tail:
+                df = df.iloc[-TechnicalIndicators.day_trading_lookback():]
             
             # Быстрые и медленные MA
             fast_ma = df['close'].ewm(span=day_config['fast_ma']).mean()
@@ -423,6 +501,11 @@ class TechnicalIndicators:
             if indicators.get('volume_ratio', 1) > 2.5:
                 score += 2
         
+        # ✅ НОВОЕ: Объём в верхних перцентилях длинного окна (2 балла) -
+        # всплеск, который среднее за 20 свечей уже сгладило
+        if indicators.get('volume_rank', 0.5) >= config.VOLUME_RANK_HIGH:
+            score += 2
+        
         # Momentum (3 балла)
         momentum = indicators.get('momentum', 0)
         if abs(momentum) > 500:  # Сильный импульс
@@ -444,4 +527,33 @@ class TechnicalIndicators:
         elif score >= 6:
             return 'MEDIUM'
         else:
-            return 'WEAK'
\ No newline at end of file
+            return 'WEAK'
+    
+    @staticmethod
+    def get_signal_strength_batch(indicators, price_change):
+        """
+        ✅ НОВОЕ: get_signal_strength для целых колонок за один векторный проход
+        
+        Args:
+            indicators: dict/DataFrame колонок (как calculate_indicator_series)
+            price_change: массив изменений цены в % (или скаляр)
+        
+        Returns:
+            numpy array: 'STRONG' / 'MEDIUM' / 'WEAK' для каждой строки
+        """
+        bb_position = indicators_numpy.category_codes(indicators['bb_position'], 'above_upper', 'below_lower')
+        n = len(bb_position)
+        high_volume = np.asarray(indicators['is_high_volume'], dtype=bool)
+        volume_ratio = indicators_numpy.column(indicators, 'volume_ratio', 1, n)
+        volume_rank = indicators_numpy.column(indicators, 'volume_rank', 0.5, n)
+        momentum = np.abs(indicators_numpy.column(indicators, 'momentum', 0, n))
+        price_change = np.abs(np.broadcast_to(np.asarray(price_change, dtype=np.float64), (n,)))
+        
+        score = (
+            (bb_position != 0) * 4
+            + high_volume * (3 + (volume_ratio > 2.5) * 2)
+            + (volume_rank >= config.VOLUME_RANK_HIGH) * 2
+            + np.select([momentum > 500, momentum > 200], [3, 1], 0)
+            + np.select([price_change > 5, price_change > 3, price_change > 1.5], [3, 2, 1], 0)
+        )
+        return np.where(score >= 10, 'STRONG', np.where(score >= 6, 'MEDIUM', 'WEAK'))
\ No newline at end of file
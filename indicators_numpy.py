@@ -0,0 +1,344 @@
+"""
+NumPy бэкенд calculate_all_indicators
+OHLCV колонки извлекаются из DataFrame один раз в непрерывные float64
+массивы. Для бота считаются только последние значения: окна по хвосту
+массива, EWM как скалярное произведение с весами затухания (узлы графа
+в indicator_graph). indicator_series - те же индикаторы по всей истории
+сразу (матрица признаков для обучения и бэктеста)
+
+Сравнение с pandas бэкендом:
+    python indicators_numpy.py --candles 1000 --runs 500
+Стоимость индикаторов дейтрейдинга от длины истории:
+    python indicators_numpy.py --day-tail 100,1000,10000,100000
+"""
+import argparse
+import math
+import time
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+import config
+from candles import Candles
+from rolling_rank import rank_series
+
+# Длина блока рекуррентного EWM по всей истории (матрица блока B x B)
+EWM_BLOCK = 64
+
+@lru_cache(maxsize=64)
+def _decay_weights(alpha, n):
+    """(1 - alpha) ** (n-1 ... 0) - веса EWM от старых свечей к новым"""
+    weights = (1 - alpha) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    weights.flags.writeable = False
+    return weights
+
+@lru_cache(maxsize=64)
+def ewm_horizon(span):
+    """
+    Сколько последних значений определяют EWM с точностью EWM_TAIL_TOLERANCE
+    
+    Вес значения возраста k - (1 - a) ** k; более старые свечи не меняют
+    результат в пределах точности float64.
+    """
+    alpha = 2 / (span + 1)
+    return int(math.ceil(math.log(config.EWM_TAIL_TOLERANCE) / math.log(1 - alpha))) + 1
+
+def ewm_last(x, span, adjust=False):
+    """
+    Последнее значение x.ewm(span=span, adjust=adjust).mean()
+    
+    adjust=False: y[0] = x[0], y[t] = (1 - a) * y[t-1] + a * x[t]
+    adjust=True: взвешенное среднее с весами (1 - a) ** возраст
+    Считается по хвосту ewm_horizon(span) значений - стоимость не растёт с историей.
+    """
+    alpha = 2 / (span + 1)
+    x = x[-ewm_horizon(span):]
+    weights = _decay_weights(alpha, len(x))
+    if adjust:
+        return weights @ x / weights.sum()
+    # Первое значение входит с весом (1 - a) ** (n-1), остальные - a * (1 - a) ** возраст
+    return weights[0] * x[0] + alpha * (weights[1:] @ x[1:])
+
+def ohlcv_arrays(df):
+    """Колонки OHLCV как непрерывные float64 массивы (без копии, если возможно)"""
+    if isinstance(df, Candles):
+        # ✅ НОВОЕ: компактные свечи - float32 представления структурированного массива
+        return df.arrays()
+    return {c: np.ascontiguousarray(df[c].to_numpy(dtype=np.float64))
+            for c in ('open', 'high', 'low', 'close', 'volume')}
+
+def true_range_tail(high, low, close, period):
+    """True range последних period свечей (у первой свечи ряда - high - low)"""
+    start = max(len(close) - period, 0)
+    h, l = high[start:], low[start:]
+    tr = h - l
+    if start > 0:
+        prev = close[start - 1:-1]
+    else:
+        prev = np.r_[np.nan, close[:-1]]
+    with np.errstate(invalid='ignore'):
+        return np.fmax(tr, np.fmax(np.abs(h - prev), np.abs(l - prev)))
+
+# ------------------------------------------------------------------
+# Индикаторы по всей истории
+# ------------------------------------------------------------------
+
+@lru_cache(maxsize=16)
+def _recursion_matrix(beta, size):
+    """Нижнетреугольная матрица beta ** (j - i) для блока рекурсии"""
+    power = np.arange(size)[:, None] - np.arange(size)[None, :]
+    with np.errstate(over='ignore'):
+        matrix = np.where(power >= 0, beta ** np.maximum(power, 0), 0.0)
+    matrix.flags.writeable = False
+    return matrix
+
+def _linear_recursion(x, beta, gain, y0):
+    """
+    y[t] = beta * y[t-1] + gain * x[t] для всего ряда, y[-1] = y0
+    
+    Блоками по EWM_BLOCK: внутри блока - умножение на матрицу, между
+    блоками переносится последнее значение.
+    """
+    n = len(x)
+    y = np.empty(n)
+    matrix = _recursion_matrix(beta, EWM_BLOCK)
+    carry_powers = beta ** np.arange(1, EWM_BLOCK + 1)
+    carry = y0
+    for start in range(0, n, EWM_BLOCK):
+        block = x[start:start + EWM_BLOCK]
+        size = len(block)
+        out = matrix[:size, :size] @ (gain * block) + carry_powers[:size] * carry
+        y[start:start + size] = out
+        carry = out[-1]
+    return y
+
+def ewm_series(x, span, adjust=False):
+    """x.ewm(span=span, adjust=adjust).mean() по всему ряду"""
+    alpha = 2 / (span + 1)
+    beta = 1 - alpha
+    if len(x) == 0:
+        return np.empty(0)
+    if adjust:
+        numerator = _linear_recursion(x, beta, 1.0, 0.0)
+        denominator = (1 - beta ** np.arange(1, len(x) + 1)) / alpha
+        return numerator / denominator
+    # y[0] = x[0]: перенос (1 - a) * y[-1] + a * x[0] = x[0] при y[-1] = x[0]
+    return _linear_recursion(x, beta, alpha, x[0])
+
+def _rolling(x, period, reducer):
+    """Скользящая агрегация окна period (NaN в первых period - 1 строках, как rolling)"""
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = reducer(sliding_window_view(x, period), axis=1)
+    return out
+
+def _rolling_std(x, period):
+    """Скользящее стандартное отклонение ddof=1"""
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = sliding_window_view(x, period).std(axis=1, ddof=1)
+    return out
+
+def _lagged(x, lag):
+    """x[t - lag] (NaN для первых lag строк)"""
+    out = np.full(len(x), np.nan)
+    out[lag:] = x[:len(x) - lag]
+    return out
+
+def _code(positive, negative):
+    """Категория -> 1 / -1 / 0, как в MLPredictor.prepare_features"""
+    return positive.astype(np.int8) - negative.astype(np.int8)
+
+def category_codes(values, positive, negative):
+    """Категории строками (как в dict индикаторов) или уже коды -> int8 коды"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'OUS':
+        return _code(values == positive, values == negative)
+    return values.astype(np.int8)
+
+def column(columns, key, default, n):
+    """
+    Колонка как float массив длины n (скаляр растягивается)
+    
+    Нет колонки - default; None (и default=None) становятся NaN, поэтому
+    сравнения с ними ложны, как проверки "is not None" в скалярном коде.
+    """
+    value = columns.get(key)
+    if value is None:
+        return np.full(n, np.nan if default is None else float(default))
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (n,))
+
+def indicator_series(a, mode='swing', spread=None):
+    """
+    Индикаторы calculate_all_indicators для каждой строки истории
+    
+    Строка t совпадает с calculate_all_indicators(df.iloc[:t + 1]) - то есть
+    с тем, что бот посчитал бы в момент закрытия свечи t (EMA и VWAP
+    накапливаются с первой строки). Категории закодированы числами как
+    в prepare_features: bb_position, macd_crossover, day_trend, day_ma_cross -
+    1 / -1 / 0; флаги - bool. Признаки дейтрейдинга - с префиксом 'day_'.
+    
+    Args:
+        a: ohlcv_arrays(df)
+        mode: 'swing' или 'day'
+        spread: спред в % по строкам (истории стакана обычно нет - 0)
+    
+    Returns:
+        dict: имя признака -> массив длины n
+    """
+    close, high, low, volume = a['close'], a['high'], a['low'], a['volume']
+    n = len(close)
+    zeros = np.zeros(n)
+    
+    period = config.BOLLINGER_PERIOD
+    sma = _rolling(close, period, np.mean)
+    std = _rolling_std(close, period)
+    upper, lower = sma + 2 * std, sma - 2 * std
+    bb_position = _code(close > upper, close < lower)
+    
+    avg_volume = _rolling(volume, config.VOLUME_MA_PERIOD, np.mean)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = np.where(avg_volume > 0, volume / avg_volume, 1.0)
+    
+    prev_close = _lagged(close, 1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = _rolling(true_range, 14, np.mean)
+    
+    cum_volume = np.cumsum(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(cum_volume != 0, np.cumsum((high + low + close) / 3 * volume) / cum_volume, np.nan)
+    
+    ema_200 = ewm_series(close, 200)
+    ema_200[:199] = np.nan  # calculate_all_indicators: None при < 200 свечах
+    
+    series = {
+        'rsi': np.full(n, 50.0),
+        'macd': zeros,
+        'macd_signal': zeros,
+        'macd_histogram': zeros,
+        'macd_crossover': np.zeros(n, dtype=np.int8),
+        'bb_upper': upper,
+        'bb_middle': sma,
+        'bb_lower': lower,
+        'bb_position': bb_position,
+        'ema_50': ewm_series(close, 50),
+        'ema_200': ema_200,
+        'volume_ratio': volume_ratio,
+        'is_high_volume': volume_ratio > 1.5,
+        'momentum': close - _lagged(close, 9),
+        'atr': atr,
+        'vwap': vwap,
+        'orderbook_imbalance': zeros,
+        # Ранг строки t - среди config.RANK_WINDOW предыдущих (закрытых) значений
+        'volume_rank': rank_series(volume),
+        'atr_rank': rank_series(atr),
+        'spread_rank': np.full(n, 0.5) if spread is None else rank_series(spread)
+    }
+    if mode != 'day':
+        return series
+    
+    day_config = config.DAY_TRADING_CONFIG
+    threshold = day_config['volatility_threshold']
+    fast = ewm_series(close, day_config['fast_ma'], adjust=True)
+    slow = ewm_series(close, day_config['slow_ma'], adjust=True)
+    trend_strength = np.abs(fast - slow) / slow * 100
+    
+    recent_volatility = _rolling(high, 5, np.max) / _rolling(low, 5, np.min) - 1
+    volume_surge = volume / _rolling(volume, 20, np.mean)
+    consolidation = day_config['consolidation_period']
+    price_range = (_rolling(high, consolidation, np.max) - _rolling(low, consolidation, np.min)) \
+        / _rolling(close, consolidation, np.mean)
+    close_4 = _lagged(close, 4)
+    spread = zeros if spread is None else np.asarray(spread, dtype=np.float64)
+    
+    above = fast > slow
+    prev_above, prev_below = _lagged(fast, 1) > _lagged(slow, 1), _lagged(fast, 1) < _lagged(slow, 1)
+    # Первая строка: в батч-расчёте нет предыдущей свечи - пересечения нет
+    ma_cross = _code(above & ~prev_above, (fast < slow) & ~prev_below)
+    ma_cross[0] = 0
+    
+    is_volatile = recent_volatility > threshold
+    volume_confirmed = volume_surge > day_config['volume_increase_threshold']
+    spread_ok = spread < day_config['max_spread']
+    
+    series.update({
+        'day_trend': np.where(above, 1, -1).astype(np.int8),
+        'day_trend_strength': trend_strength,
+        'day_is_volatile': is_volatile,
+        'day_volatility_value': recent_volatility,
+        'day_volume_surge': volume_surge,
+        'day_is_consolidating': price_range < threshold,
+        'day_price_momentum': (close - close_4) / close_4 * 100,
+        'day_current_spread': spread,
+        'day_ma_fast': fast,
+        'day_ma_slow': slow,
+        'day_ma_cross': ma_cross,
+        'day_volume_confirmed': volume_confirmed,
+        'day_spread_ok': spread_ok,
+        # validate_day_trading_conditions построчно
+        'is_valid_for_daytrading': is_volatile & volume_confirmed & spread_ok
+                                   & (trend_strength >= threshold) & (bb_position == 0)
+    })
+    return series
+
+def _benchmark_day_tail(lengths, runs):
+    """Индикаторы дейтрейдинга: полная история против хвостового окна"""
+    import logging
+    from indicators import TechnicalIndicators
+    import indicator_graph
+    
+    logging.getLogger('indicators').setLevel(logging.WARNING)
+    rng = np.random.default_rng(0)
+    print(f"lookback: {TechnicalIndicators.day_trading_lookback()} candles")
+    for n in lengths:
+        close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+        df = pd.DataFrame({'open': close, 'high': close * 1.001, 'low': close * 0.999,
+                           'close': close, 'volume': rng.uniform(1, 100, n)})
+        timings = []
+        for call in (lambda: TechnicalIndicators.calculate_day_trading_indicators(df, tail=False),
+                     lambda: TechnicalIndicators.calculate_day_trading_indicators(df),
+                     lambda: indicator_graph.day_trading_indicators(indicator_graph.IndicatorGraph(ohlcv_arrays(df)))):
+            start = time.perf_counter()
+            for _ in range(runs):
+                call()
+            timings.append((time.perf_counter() - start) / runs * 1000)
+        print(f"{n:>7} candles: full {timings[0]:.3f}ms, tail {timings[1]:.3f}ms, numpy graph {timings[2]:.3f}ms")
+
+def _benchmark(args):
+    """Сравнивает pandas и numpy бэкенды на синтетических свечах"""
+    import logging
+    from indicators import TechnicalIndicators
+    
+    logging.getLogger('indicators').setLevel(logging.WARNING)
+    rng = np.random.default_rng(0)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.002, args.candles)))
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=args.candles, freq='1min'),
+        'open': close, 'high': close * 1.001, 'low': close * 0.999, 'close': close,
+        'volume': rng.uniform(1, 100, args.candles)
+    })
+    
+    for mode in ('swing', 'day'):
+        timings = {}
+        for backend in ('pandas', 'numpy'):
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                TechnicalIndicators.calculate_all_indicators(df, mode=mode, backend=backend)
+            timings[backend] = (time.perf_counter() - start) / args.runs
+        print(f"{mode:<5} {args.candles} candles: pandas {timings['pandas'] * 1000:.3f}ms, "
+              f"numpy {timings['numpy'] * 1000:.3f}ms ({timings['pandas'] / timings['numpy']:.1f}x)")
+        
+        start = time.perf_counter()
+        TechnicalIndicators.calculate_indicator_series(df, mode=mode)
+        print(f"{mode:<5} full series: {(time.perf_counter() - start) * 1000:.1f}ms for {args.candles} rows")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark indicator backends')
+    parser.add_argument('--candles', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--day-tail', default='', help='Comma-separated history lengths for the day indicators benchmark')
+    args = parser.parse_args()
+    if args.day_tail:
+        _benchmark_day_tail([int(n) for n in args.day_tail.split(',')], args.runs)
+    else:
+        _benchmark(args)
@@ -83,8 +83,8 @@ class BTCPumpDumpBot:
             logger.info("=" * 50)
             logger.info(f"Starting market analysis (mode={mode})...")
             
-            # 1. Собираем данные c учётом режима
-            market_data = self.data_collector.get_market_data(
+            # 1. Собираем данные c учётом режима (асинхронно, все источники параллельно)
+            market_data = await self.data_collector.get_market_data_async(
                 timeframe=params['timeframe'],
                 limit=params['limit']
             )
@@ -155,7 +155,7 @@ class BTCPumpDumpBot:
             logger.info("Starting market analysis...")
             
             # 1. Собираем данные
-            market_data = self.data_collector.get_market_data()
+            market_data = await self.data_collector.get_market_data_async()
             if not market_data:
                 logger.error("Failed to collect market data")
                 return None
@@ -305,10 +305,18 @@ class BTCPumpDumpBot:
                 logger.info(f"Waiting {sleep_s} seconds until next check (mode={mode})...")
                 
                 # Прерываемый sleep для быстрого shutdown
+                # (в режиме потока просыпаемся сразу по закрытию свечи)
+                stream = self.data_collector.stream
+                timeframe = self._get_params_for_mode(mode)['timeframe']
                 for _ in range(sleep_s):
                     if self.shutdown_requested:
                         break
-                    await asyncio.sleep(1)
+                    if stream is not None and stream.is_fresh():
+                        if await stream.wait_candle_close(timeframe, timeout=1):
+                            logger.info(f"{timeframe} candle closed, analysing now")
+                            break
+                    else:
+                        await asyncio.sleep(1)
                 
             except KeyboardInterrupt:
                 logger.info("Monitoring loop stopped by user")
@@ -358,12 +366,23 @@ class BTCPumpDumpBot:
         logger.info(f"Timeframe: {config.TIMEFRAME}")
         logger.info(f"Check interval: {config.CHECK_INTERVAL}s")
         logger.info(f"Trading mode: {config.TRADING_MODE}")
+        logger.info(f"Data source: {config.DATA_SOURCE}")
         logger.info("=" * 50)
         
         try:
             # 1. Запускаем healthcheck сервер
             await self.healthcheck.start()
             
+            # WebSocket поток рыночных данных (если включён)
+            if config.DATA_SOURCE == 'stream':
+                await self.data_collector.start_stream()
+            
+            # F&G и Open Interest обновляются в фоне и не задерживают анализ
+            await self.data_collector.start_background_refresh()
+            
+            # Новые версии модели из реестра - без перезапуска бота
+            await self.ml_predictor.start_watching()
+            
             # 2. Создаём задачи для параллельного выполнения
             bot_task = asyncio.create_task(self.start_telegram_bot())
             monitor_task = asyncio.create_task(self.monitoring_loop())
@@ -399,6 +418,11 @@ class BTCPumpDumpBot:
                 logger.info("Stopping healthcheck server...")
                 await self.healthcheck.stop()
                 
+                await self.ml_predictor.stop_watching()
+                
+                # Закрываем соединения с биржей и API
+                await self.data_collector.close()
+                
                 logger.info("✅ Bot stopped gracefully")
                 
             except asyncio.TimeoutError:
@@ -0,0 +1,368 @@
+"""
+Запись и воспроизведение рыночных данных
+Каждый ответ ccxt, F&G и OI пишется с временем получения в сжатые
+append-only сегменты (gzip JSONL). Воспроизведение отдаёт записанные ответы
+через тот же интерфейс DataCollector - в реальном темпе или максимально быстро,
+чтобы повторять рабочие циклы и мерить пайплайн без сети.
+
+Запуск:
+    RECORD_DIR=recordings python main.py          # запись во время работы
+    python market_recorder.py recordings --mode swing           # бенчмарк
+    python market_recorder.py recordings --speed 1 --cycles 10  # реальный темп
+"""
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+import config
+from candle_store import CandleSeries
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = 'segment-*.jsonl.gz'
+
+# Binance отдаёт не больше 1000 свечей за запрос, по умолчанию 500
+EXCHANGE_MAX_LIMIT = 1000
+EXCHANGE_DEFAULT_LIMIT = 500
+
+# Сколько свечей воспроизводимой истории держать на (пара, таймфрейм)
+REPLAY_HISTORY_CANDLES = 10_000
+
+def _arg(args, kwargs, index, name, default=None):
+    """Аргумент вызова по позиции или имени"""
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(name, default)
+
+def request_key(method, args=(), kwargs=None):
+    """
+    Ключ записи: по нему воспроизведение находит ответы того же запроса
+    
+    fetch_ohlcv:BTC/USDT:5m, fetch_ticker:BTC/USDT, fetch_tickers, fear_greed, ...
+    """
+    kwargs = kwargs or {}
+    if method == 'fetch_ohlcv':
+        return f"{method}:{_arg(args, kwargs, 0, 'symbol')}:{_arg(args, kwargs, 1, 'timeframe', '1m')}"
+    if method in ('fetch_ticker', 'fetch_order_book'):
+        return f"{method}:{_arg(args, kwargs, 0, 'symbol')}"
+    return method
+
+RECORDED_METHODS = ('fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_order_book', 'load_markets')
+
+class ReplayFinished(Exception):
+    """Записанные ответы для запроса закончились"""
+
+class MarketRecorder:
+    """
+    Пишет ответы источников в сжатые сегменты
+    
+    Записи копятся в буфере и дописываются в текущий сегмент отдельным
+    gzip member'ом (конкатенация gzip потоков - валидный gzip), поэтому
+    файлы только растут и читаются даже после аварийной остановки.
+    """
+    
+    def __init__(self, directory=None, segment_records=None, flush_records=None, flush_interval=None):
+        self.directory = directory or config.RECORD_DIR
+        self.segment_records = segment_records or config.RECORD_SEGMENT_RECORDS
+        self.flush_records = flush_records or config.RECORD_FLUSH_RECORDS
+        self.flush_interval = flush_interval or config.RECORD_FLUSH_INTERVAL
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._segment_path = None
+        self._segment_count = 0
+        self._last_flush = time.monotonic()
+        self.records_written = 0
+    
+    def record(self, source, data, ts=None):
+        """
+        Добавляет ответ источника
+        
+        Args:
+            source: ключ запроса (см. request_key)
+            data: ответ (JSON-сериализуемый)
+            ts: время получения (unix секунды), по умолчанию сейчас
+        """
+        line = json.dumps(
+            {'t': time.time() if ts is None else ts, 'source': source, 'data': data},
+            separators=(',', ':'), default=str
+        )
+        with self._lock:
+            self._buffer.append(line)
+            if (len(self._buffer) >= self.flush_records
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+    
+    def flush(self):
+        """Дописывает буфер на диск"""
+        with self._lock:
+            self._flush_locked()
+    
+    def close(self):
+        self.flush()
+    
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._segment_path is None or self._segment_count >= self.segment_records:
+            # Новый сегмент; имя по времени начала - сортируется хронологически
+            self._segment_path = os.path.join(self.directory, f"segment-{int(time.time() * 1000):015d}.jsonl.gz")
+            self._segment_count = 0
+        try:
+            with gzip.open(self._segment_path, 'ab') as f:
+                f.write(('\n'.join(self._buffer) + '\n').encode('utf-8'))
+            self._segment_count += len(self._buffer)
+            self.records_written += len(self._buffer)
+        except Exception as e:
+            logger.error(f"Could not write recording segment {self._segment_path}: {e}")
+        self._buffer = []
+
+def read_records(directory):
+    """Читает записи всех сегментов в хронологическом порядке"""
+    for path in sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN))):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, OSError, json.JSONDecodeError) as e:
+            # Недописанный хвост последнего сегмента после аварийной остановки
+            logger.warning(f"Truncated recording segment {path}: {e}")
+
+class RecordingExchange:
+    """Прокси биржи ccxt (sync или async), записывающий ответы публичных запросов"""
+    
+    def __init__(self, exchange, recorder):
+        self._exchange = exchange
+        self._recorder = recorder
+    
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in RECORDED_METHODS:
+            return attr
+        recorder = self._recorder
+        
+        if asyncio.iscoroutinefunction(attr):
+            async def recorded_async(*args, **kwargs):
+                data = await attr(*args, **kwargs)
+                recorder.record(request_key(name, args, kwargs), data)
+                return data
+            return recorded_async
+        
+        def recorded(*args, **kwargs):
+            data = attr(*args, **kwargs)
+            recorder.record(request_key(name, args, kwargs), data)
+            return data
+        return recorded
+
+class ReplaySession:
+    """
+    Записанная сессия: очереди ответов по ключу запроса и часы воспроизведения
+    
+    Ответы отдаются в порядке записи, часы сессии - время последнего
+    отданного ответа. Свечи дополнительно сливаются в историю, и запрос
+    с since/limit отвечается по ней - поэтому воспроизведение корректно,
+    даже если догрузка свечей в новом коде запрашивает иначе, чем при записи.
+    """
+    
+    def __init__(self, directory, speed=None):
+        self.directory = directory
+        self.speed = speed or None  # None/0 - максимально быстро, 1.0 - реальный темп
+        self._queues = {}
+        self._candles = {}
+        count = 0
+        for record in read_records(self.directory):
+            self._queues.setdefault(record['source'], deque()).append(record)
+            count += 1
+        if not count:
+            raise ValueError(f"No recorded data in {self.directory}")
+        self.start_time = min(q[0]['t'] for q in self._queues.values())
+        self.end_time = max(q[-1]['t'] for q in self._queues.values())
+        self._now = self.start_time
+        self._wall_start = None
+        logger.info(
+            f"Replay session: {count} records, {len(self._queues)} sources, "
+            f"{self.end_time - self.start_time:.0f}s of market time"
+        )
+    
+    def clock(self):
+        """Текущее время воспроизведения (unix секунды)"""
+        return self._now
+    
+    @property
+    def finished(self):
+        return not any(self._queues.values())
+    
+    def take(self, source):
+        """
+        Следующий записанный ответ источника
+        
+        Returns:
+            tuple: (запись, сколько секунд подождать для реального темпа)
+        """
+        queue = self._queues.get(source)
+        if not queue:
+            raise ReplayFinished(source)
+        record = queue.popleft()
+        self._now = max(self._now, record['t'])
+        return record, self._delay(record['t'])
+    
+    def _delay(self, t):
+        if not self.speed:
+            return 0.0
+        if self._wall_start is None:
+            self._wall_start = time.monotonic()
+        target = (t - self.start_time) / self.speed
+        return max(0.0, target - (time.monotonic() - self._wall_start))
+    
+    def response(self, method, record, symbols=None, since=None, limit=None):
+        """Ответ на запрос из записи (свечи - по накопленной истории)"""
+        data = record['data']
+        if method == 'fetch_tickers' and symbols:
+            return {s: t for s, t in data.items() if s in symbols}
+        if method != 'fetch_ohlcv':
+            return data
+        
+        series = self._candles.setdefault(record['source'], CandleSeries(REPLAY_HISTORY_CANDLES))
+        series.merge(data)
+        ts, values = series.timestamps, series.values
+        if since is None:
+            start = max(0, len(ts) - (limit or EXCHANGE_DEFAULT_LIMIT))
+            end = len(ts)
+        else:
+            # С since отдаём всё до текущего момента (в пределах лимита биржи):
+            # темп запросов при воспроизведении может отличаться от записи
+            start = int(np.searchsorted(ts, since))
+            end = min(len(ts), start + max(limit or 0, EXCHANGE_MAX_LIMIT))
+        return [[t, *row] for t, row in zip(ts[start:end].tolist(), values[:, start:end].T.tolist())]
+    
+    def exchange(self):
+        return ReplayExchange(self)
+    
+    def async_exchange(self):
+        return AsyncReplayExchange(self)
+    
+    def next_data(self, source):
+        """Синхронно: следующий записанный ответ HTTP источника (F&G, OI)"""
+        record, delay = self.take(source)
+        if delay:
+            time.sleep(delay)
+        return record['data']
+    
+    async def next_data_async(self, source):
+        """Асинхронно: следующий записанный ответ HTTP источника (F&G, OI)"""
+        record, delay = self.take(source)
+        if delay:
+            await asyncio.sleep(delay)
+        return record['data']
+
+class ReplayExchange:
+    """Синхронная биржа на записанных ответах (интерфейс ccxt.binance)"""
+    
+    def __init__(self, session):
+        self.session = session
+    
+    def _take(self, source):
+        record, delay = self.session.take(source)
+        if delay:
+            time.sleep(delay)
+        return record
+    
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        record = self._take(request_key('fetch_ohlcv', (symbol, timeframe)))
+        return self.session.response('fetch_ohlcv', record, since=since, limit=limit)
+    
+    def fetch_ticker(self, symbol):
+        return self._take(request_key('fetch_ticker', (symbol,)))['data']
+    
+    def fetch_tickers(self, symbols=None):
+        record = self._take(request_key('fetch_tickers'))
+        return self.session.response('fetch_tickers', record, symbols=symbols)
+    
+    def fetch_order_book(self, symbol, limit=None):
+        return self._take(request_key('fetch_order_book', (symbol,)))['data']
+    
+    def load_markets(self):
+        return self._take(request_key('load_markets'))['data']
+    
+    def close(self):
+        pass
+
+class AsyncReplayExchange:
+    """Асинхронная биржа на записанных ответах (интерфейс ccxt.async_support.binance)"""
+    
+    def __init__(self, session):
+        self.session = session
+    
+    async def _take(self, source):
+        record, delay = self.session.take(source)
+        if delay:
+            await asyncio.sleep(delay)
+        return record
+    
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        record = await self._take(request_key('fetch_ohlcv', (symbol, timeframe)))
+        return self.session.response('fetch_ohlcv', record, since=since, limit=limit)
+    
+    async def fetch_ticker(self, symbol):
+        return (await self._take(request_key('fetch_ticker', (symbol,))))['data']
+    
+    async def fetch_tickers(self, symbols=None):
+        record = await self._take(request_key('fetch_tickers'))
+        return self.session.response('fetch_tickers', record, symbols=symbols)
+    
+    async def fetch_order_book(self, symbol, limit=None):
+        return (await self._take(request_key('fetch_order_book', (symbol,))))['data']
+    
+    async def load_markets(self):
+        return (await self._take(request_key('load_markets')))['data']
+    
+    async def close(self):
+        pass
+
+async def _benchmark(args):
+    """Прогоняет записанную сессию через сбор данных, индикаторы и прогноз"""
+    from data_collector import DataCollector
+    from indicators import TechnicalIndicators
+    from ml_model import MLPredictor
+    
+    data_collector = DataCollector()
+    session = data_collector.enable_replay(args.directory, speed=args.speed)
+    ml_predictor = MLPredictor()
+    timeframe, limit = (config.DAY_TIMEFRAME, config.DAY_LIMIT) if args.mode == 'day' else (config.TIMEFRAME, 100)
+    
+    cycles = 0
+    start = time.perf_counter()
+    try:
+        while not session.finished and (not args.cycles or cycles < args.cycles):
+            market_data = await data_collector.get_market_data_async(timeframe=timeframe, limit=limit)
+            if market_data is None:
+                break
+            indicators = TechnicalIndicators.calculate_all_indicators(market_data['df'], mode=args.mode)
+            if indicators:
+                indicators['fear_greed'] = market_data['fear_greed']
+                ml_predictor.predict(indicators, market_data, mode=args.mode)
+            cycles += 1
+    finally:
+        await data_collector.close()
+    
+    elapsed = time.perf_counter() - start
+    market_time = session.clock() - session.start_time
+    print(f"Replayed {cycles} cycles ({market_time:.0f}s of market time) in {elapsed:.2f}s "
+          f"- {cycles / elapsed if elapsed > 0 else 0:.1f} cycles/s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a recorded market session')
+    parser.add_argument('directory', help='Directory with recorded segments')
+    parser.add_argument('--mode', choices=['swing', 'day'], default=config.TRADING_MODE)
+    parser.add_argument('--speed', type=float, default=0, help='1 = real time, 0 = as fast as possible')
+    parser.add_argument('--cycles', type=int, default=0, help='Stop after N cycles (0 = whole session)')
+    asyncio.run(_benchmark(parser.parse_args()))
@@ -0,0 +1,292 @@
+"""
+Мультисимвольное сканирование рынка
+Один пакетный запрос тикеров на цикл, OHLCV по всем парам параллельно
+с ограничением одновременных запросов (или из WebSocket потока),
+индикаторы и прогноз по каждой паре, пропускная способность в парах/сек
+
+Запуск:
+    python market_scanner.py --mode day --top 100
+    python market_scanner.py --symbols ETH/USDT,SOL/USDT --cycles 3 --stream
+"""
+import argparse
+import asyncio
+import logging
+import time
+import config
+from candles import Candles
+from data_collector import DataCollector
+from feature_schema import schema_for
+from indicators import TechnicalIndicators
+from ml_model import MLPredictor
+from stream_collector import StreamCollector
+
+logger = logging.getLogger(__name__)
+
+# Open Interest собирается только для основной пары
+NO_OPEN_INTEREST = {
+    'value': 0,
+    'change_5m': 0.0,
+    'change_1h': 0.0,
+    'change_4h': 0.0
+}
+
+class MarketScanner:
+    """Сканер многих пар на базе DataCollector"""
+    
+    def __init__(self, data_collector=None, ml_predictor=None, symbols=None, concurrency=None):
+        self.data_collector = data_collector or DataCollector()
+        self.ml_predictor = ml_predictor or MLPredictor()
+        self.symbols = list(symbols or config.SCAN_SYMBOLS)
+        self.concurrency = concurrency or config.SCAN_CONCURRENCY
+        self.stream = None
+        self.last_stats = None
+    
+    @staticmethod
+    def _params_for_mode(mode):
+        if mode == 'day':
+            return config.DAY_TIMEFRAME, config.DAY_LIMIT
+        return config.TIMEFRAME, 100
+    
+    async def discover_symbols(self, top_n=None):
+        """
+        Подбирает топ пар к config.SCAN_QUOTE по 24h объёму
+        
+        Returns:
+            list: символы в формате ccxt ('ETH/USDT', ...)
+        """
+        markets = await self.data_collector.load_markets_async()
+        tickers = await self.data_collector.fetch_tickers_async()
+        
+        candidates = []
+        for symbol, ticker in tickers.items():
+            market = markets.get(symbol)
+            if not market or not market.get('spot') or not market.get('active', True):
+                continue
+            if market.get('quote') != config.SCAN_QUOTE:
+                continue
+            if (ticker.get('quoteVolume') or 0) < config.SCAN_MIN_QUOTE_VOLUME:
+                continue
+            candidates.append(ticker)
+        
+        candidates.sort(key=lambda t: t.get('quoteVolume') or 0, reverse=True)
+        self.symbols = [t['symbol'] for t in candidates[:top_n or config.SCAN_TOP_N]]
+        logger.info(f"Scanner universe: {len(self.symbols)} {config.SCAN_QUOTE} pairs")
+        return self.symbols
+    
+    async def start_stream(self, mode='swing'):
+        """Подписывается на kline потоки всех пар одним соединением"""
+        if not self.symbols:
+            await self.discover_symbols()
+        timeframe, _ = self._params_for_mode(mode)
+        self.stream = StreamCollector(
+            self.data_collector.candle_store,
+            symbol=self.symbols[0],
+            timeframes=[self.data_collector.candle_store.source_timeframe(timeframe)],
+            extra_symbols=self.symbols[1:],
+            depth_mode='partial'  # Сканеру стакан не нужен, локальный стакан не ведём
+        )
+        await self.stream.start()
+    
+    async def close(self):
+        if self.stream is not None:
+            await self.stream.stop()
+        await self.data_collector.close()
+    
+    async def _get_candles(self, symbol, timeframe, limit, semaphore):
+        """Свечи пары: из потока, иначе REST под семафором"""
+        if self.stream is not None:
+            df = self.stream.get_candles(symbol, timeframe, limit)
+            if df is not None:
+                return df
+        
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self.data_collector.fetch_ohlcv_async(timeframe=timeframe, limit=limit, symbol=symbol),
+                    timeout=config.SOURCE_TIMEOUTS['ohlcv']
+                )
+            except Exception as e:
+                logger.warning(f"Scanner: OHLCV for {symbol} failed: {e}")
+                return None
+    
+    def analyze_symbol(self, symbol, df, ticker, fear_greed, mode='swing', predict=True):
+        """
+        Индикаторы, прогноз и сила сигнала для одной пары
+        
+        Args:
+            predict: False - без прогноза, входы модели остаются в '_inputs'
+                     для общего predict_batch (scan)
+        
+        Returns:
+            dict или None если данных недостаточно
+        """
+        timeframe, _ = self._params_for_mode(mode)
+        market_data = self.data_collector._build_market_data(
+            df,
+            DataCollector._parse_current_price(ticker),
+            fear_greed,
+            DataCollector._parse_24h_stats(ticker),
+            None,
+            NO_OPEN_INTEREST,
+            timeframe
+        )
+        
+        indicators = TechnicalIndicators.calculate_all_indicators(df, mode=mode)
+        if not indicators:
+            return None
+        indicators['fear_greed'] = fear_greed
+        
+        signal_strength = TechnicalIndicators.get_signal_strength(indicators, market_data['price_change_1h'])
+        
+        result = {
+            'symbol': symbol,
+            'price': market_data['current_price'],
+            'price_change_1h': market_data['price_change_1h'],
+            'price_change_24h': market_data['stats_24h']['price_change_24h'],
+            'volume_ratio': indicators['volume_ratio'],
+            'signal_strength': signal_strength
+        }
+        if not predict:
+            result['_inputs'] = (indicators, market_data)
+            return result
+        
+        result.update(self._prediction_fields(self.ml_predictor.predict(indicators, market_data, mode=mode)))
+        return result
+    
+    @staticmethod
+    def _prediction_fields(prediction):
+        return {
+            'signal': prediction['signal'],
+            'probability': prediction['probability'],
+            'confidence': prediction['confidence']
+        }
+    
+    def predict_all(self, results, mode='swing'):
+        """
+        ✅ НОВОЕ: Прогноз обученной модели для всех пар одним predict_batch
+        
+        Один проход по лесу на весь цикл вместо predict_proba на каждую пару;
+        при ошибке (например, разная длина признаков) - прогноз по одной паре.
+        """
+        inputs = [result.pop('_inputs') for result in results]
+        if not inputs:
+            return
+        try:
+            if mode == 'day' and any('day_trading' not in ind for ind, _ in inputs):
+                raise ValueError("day trading indicators are missing")  # predict вернёт rule-based
+            # Строки пишутся сразу в общую матрицу по схеме режима
+            features = schema_for(mode).empty(len(inputs))
+            for row, (ind, md) in zip(features, inputs):
+                self.ml_predictor.prepare_features(ind, md, mode, out=row)
+            conditions = None
+            if mode == 'day':
+                rows = [MLPredictor.day_conditions(ind) for ind, _ in inputs]
+                conditions = {key: [row[key][0] for row in rows] for key in rows[0]}
+            batch = self.ml_predictor.predict_batch(features, mode, conditions)
+            predictions = [
+                {'signal': str(signal), 'probability': float(probability), 'confidence': str(confidence)}
+                for signal, probability, confidence in zip(batch['signal'], batch['probability'], batch['confidence'])
+            ]
+        except Exception as e:
+            logger.warning(f"Scanner: batch prediction failed ({e}), predicting per symbol")
+            predictions = [self.ml_predictor.predict(ind, md, mode=mode) for ind, md in inputs]
+        for result, prediction in zip(results, predictions):
+            result.update(self._prediction_fields(prediction))
+    
+    async def scan(self, mode='swing', symbols=None):
+        """
+        Один цикл сканирования
+        
+        Returns:
+            list: результаты по парам, сильные сигналы первыми
+                  (статистика цикла - в self.last_stats)
+        """
+        symbols = symbols or self.symbols or await self.discover_symbols()
+        timeframe, limit = self._params_for_mode(mode)
+        start = time.perf_counter()
+        
+        # Один пакетный запрос тикеров на все пары
+        tickers = await self.data_collector.fetch_tickers_async(symbols)
+        try:
+            fear_greed = await self.data_collector.fetch_fear_greed_async()
+        except Exception as e:
+            logger.warning(f"Scanner: F&G unavailable: {e}")
+            fear_greed = self.data_collector._get_cached_fng_or_default()
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # ✅ НОВОЕ: обученная модель - прогноз одним predict_batch после сбора всех пар
+        batched = self.ml_predictor.model_version(mode) is not None
+        
+        async def scan_symbol(symbol):
+            ticker = tickers.get(symbol)
+            if not ticker or ticker.get('last') is None:
+                return None
+            df = await self._get_candles(symbol, timeframe, limit, semaphore)
+            if df is None:
+                return None
+            # Расчёт в потоке, чтобы не блокировать event loop; копия защищает
+            # от обновления формирующейся свечи потоком во время расчёта.
+            # ✅ НОВОЕ: копия - компактные Candles (float32), а не DataFrame
+            candles = Candles.from_frame(df, (symbol, timeframe))
+            try:
+                return await asyncio.to_thread(
+                    self.analyze_symbol, symbol, candles, ticker, fear_greed, mode, not batched
+                )
+            except Exception as e:
+                logger.error(f"Scanner: analysis for {symbol} failed: {e}")
+                return None
+        
+        results = await asyncio.gather(*[scan_symbol(s) for s in symbols])
+        results = [r for r in results if r]
+        if batched:
+            await asyncio.to_thread(self.predict_all, results, mode)
+        
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            'symbols': len(symbols),
+            'analysed': len(results),
+            'elapsed': elapsed,
+            'symbols_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+            'mode': mode
+        }
+        logger.info(
+            f"Scan complete: {len(results)}/{len(symbols)} symbols in {elapsed:.2f}s "
+            f"({self.last_stats['symbols_per_sec']:.1f} symbols/s)"
+        )
+        
+        results.sort(key=lambda r: (r['signal'] != 'NEUTRAL', r['probability']), reverse=True)
+        return results
+
+async def _run(args):
+    symbols = [s for s in args.symbols.split(',') if s] if args.symbols else None
+    scanner = MarketScanner(symbols=symbols, concurrency=args.concurrency)
+    try:
+        if not scanner.symbols:
+            await scanner.discover_symbols(args.top)
+        if args.stream:
+            await scanner.start_stream(args.mode)
+        
+        for cycle in range(args.cycles):
+            results = await scanner.scan(mode=args.mode)
+            stats = scanner.last_stats
+            print(f"\nCycle {cycle + 1}: {stats['analysed']}/{stats['symbols']} symbols, "
+                  f"{stats['elapsed']:.2f}s, {stats['symbols_per_sec']:.1f} symbols/s")
+            for r in results[:args.show]:
+                print(f"  {r['symbol']:<14} {r['signal']:<8} {r['probability']:.0%} "
+                      f"{r['signal_strength']:<7} 1h {r['price_change_1h']:+.2f}% vol {r['volume_ratio']:.2f}x")
+            if cycle + 1 < args.cycles:
+                await asyncio.sleep(args.interval)
+    finally:
+        await scanner.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-symbol market scanner')
+    parser.add_argument('--mode', choices=['swing', 'day'], default=config.TRADING_MODE)
+    parser.add_argument('--symbols', default='', help='Comma-separated ccxt symbols (default: top by volume)')
+    parser.add_argument('--top', type=int, default=config.SCAN_TOP_N)
+    parser.add_argument('--concurrency', type=int, default=config.SCAN_CONCURRENCY)
+    parser.add_argument('--cycles', type=int, default=1)
+    parser.add_argument('--interval', type=int, default=60)
+    parser.add_argument('--show', type=int, default=10)
+    parser.add_argument('--stream', action='store_true', help='Serve candles from kline streams')
+    asyncio.run(_run(parser.parse_args()))
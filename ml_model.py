@@ -1,3 +1,4 @@
+import asyncio
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
@@ -5,35 +6,106 @@ import joblib
 import config
 import logging
 import os
+import indicators_numpy
+from feature_schema import BASE_COLUMNS, DAY_COLUMNS, FEATURE_SCHEMAS, schema_for
+from forest_eval import FlatForest
+from model_registry import ModelRegistry, ModelVersion
 
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+def default_model(**params):
+    """✅ НОВОЕ: Random Forest с параметрами бота (общий для create_default_model и обучения)"""
+    return RandomForestClassifier(**{
+        'n_estimators': 100,
+        'max_depth': 10,
+        'random_state': 42,
+        'class_weight': 'balanced',
+        **params
+    })
+
 class MLPredictor:
     """ML модель для прогнозирования пампов и дампов"""
     
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
-        self.model_path = 'btc_model.pkl'
-        self.scaler_path = 'scaler.pkl'
+    def __init__(self, registry=None):
+        # ✅ НОВОЕ: версии моделей по режимам (ключ - режим схемы признаков);
+        # None - модель без режима (MODEL_PATH / SCALER_PATH или присвоенная
+        # через model / scaler). Словарь заменяется целиком - горячая замена
+        # одной ссылкой, прогноз не увидит модель одной версии с нормализатором другой
+        self.models = {None: ModelVersion(None, StandardScaler())}
+        self.model_path = config.MODEL_PATH
+        self.scaler_path = config.SCALER_PATH
+        self.registry = registry or ModelRegistry()
+        self._watch_task = None
         
         # Попытка загрузить существующую модель
         self.load_model()
     
-    def prepare_features(self, indicators, market_data, mode='swing'):
+    @property
+    def model(self):
+        """Модель без режима (MODEL_PATH) - модели режимов в self.models"""
+        return self.models[None].model
+    
+    @model.setter
+    def model(self, model):
+        self._set_unbound(ModelVersion(model, self.scaler))
+    
+    @property
+    def scaler(self):
+        return self.models[None].scaler
+    
+    @scaler.setter
+    def scaler(self, scaler):
+        self._set_unbound(ModelVersion(self.model, scaler))
+    
+    def _set_unbound(self, version):
+        self.models = {**self.models, None: version}
+    
+    def model_version(self, mode='swing'):
+        """
+        ✅ НОВОЕ: Версия модели для режима
+        
+        Своя модель режима из реестра, иначе модель без режима, если число
+        её признаков совпадает со схемой режима.
+        
+        Returns:
+            ModelVersion или None (прогноз rule-based)
+        """
+        schema = schema_for(mode)
+        models = self.models
+        version = models.get(schema.mode)
+        if version is not None:
+            return version
+        version = models[None]
+        if version.model is None:
+            return None
+        # Нормализатор не обучен - число признаков неизвестно, проверит прогноз
+        width = getattr(version.scaler, 'n_features_in_', len(schema))
+        return version if width == len(schema) else None
+    
+    def prepare_features(self, indicators, market_data, mode='swing', out=None):
         """
         Подготавливает features для ML модели
         
+        ✅ НОВОЕ: колонки - по схеме режима (feature_schema.py), значения
+        пишутся сразу в заранее выделенную строку матрицы
+        
         Args:
             indicators: dict с техническими индикаторами
             market_data: dict с рыночными данными
             mode: режим работы ('swing' или 'day')
+            out: строка заранее выделенной матрицы (schema.empty(n)[i]) -
+                 заполняется на месте
             
         Returns:
-            numpy array: вектор признаков
+            numpy array: вектор признаков (1 x признаков)
         """
-        features = [
+        schema = schema_for(mode)
+        features = schema.empty(1) if out is None else out.reshape(1, -1)
+        base = len(BASE_COLUMNS)
+        # Порядок значений - BASE_COLUMNS / DAY_COLUMNS схемы; блок пишется
+        # в строку одним присваиванием (поэлементная запись numpy медленнее)
+        features[0, :base] = (
             indicators['rsi'],
             indicators['macd'],
             indicators['macd_signal'],
@@ -52,35 +124,72 @@ class MLPredictor:
             market_data['price_change_4h'],
             market_data['fear_greed'] if market_data['fear_greed'] else 50,
             market_data['current_volume']
-        ]
+        )
         
         # Добавляем специфические features для дейтрейдинга
-        if mode == 'day' and 'day_trading' in indicators:
-            day_features = [
-                indicators['day_trading']['trend_strength'],
-                indicators['day_trading']['volatility_value'],
-                indicators['day_trading']['volume_surge'],
-                1 if indicators['day_trading']['is_consolidating'] else 0,
-                indicators['day_trading']['price_momentum'],
-                indicators['day_trading']['current_spread'],
-                1 if indicators['day_trading']['signals']['ma_cross'] == 'buy' else 
-                -1 if indicators['day_trading']['signals']['ma_cross'] == 'sell' else 0,
-                1 if indicators['day_trading']['signals']['volume_confirmed'] else 0,
-                1 if indicators['day_trading']['signals']['spread_ok'] else 0,
-                1 if indicators.get('is_valid_for_daytrading', False) else 0
-            ]
-            features.extend(day_features)
-        
-        return np.array(features).reshape(1, -1)
+        if schema.mode == 'day':
+            day = indicators.get('day_trading')
+            if day is None:
+                # Нет индикаторов дейтрейдинга - NaN, как в prepare_features_batch
+                features[0, base:] = np.nan
+            else:
+                signals = day['signals']
+                features[0, base:] = (
+                    day['trend_strength'],
+                    day['volatility_value'],
+                    day['volume_surge'],
+                    1 if day['is_consolidating'] else 0,
+                    day['price_momentum'],
+                    day['current_spread'],
+                    1 if signals['ma_cross'] == 'buy' else -1 if signals['ma_cross'] == 'sell' else 0,
+                    1 if signals['volume_confirmed'] else 0,
+                    1 if signals['spread_ok'] else 0,
+                    1 if indicators.get('is_valid_for_daytrading', False) else 0
+                )
+        
+        return features
+    
+    @staticmethod
+    def prepare_features_batch(series, market_data, mode='swing'):
+        """
+        ✅ НОВОЕ: prepare_features для целых колонок - матрица признаков истории
+        
+        Строка t совпадает с prepare_features по индикаторам свечи t.
+        
+        Args:
+            series: колонки calculate_indicator_series (dict или DataFrame)
+            market_data: колонки price_change_1h, price_change_4h, fear_greed,
+                current_volume (скаляр растягивается; F&G None/NaN -> 50)
+            mode: режим работы ('swing' или 'day')
+        
+        Returns:
+            numpy array: (n, признаков) - колонки по схеме режима
+        """
+        schema = schema_for(mode)
+        n = len(series['rsi'])
+        
+        def col(columns, key, default=None):
+            return indicators_numpy.column(columns, key, default, n)
+        
+        X, i = schema.empty(n), schema.index
+        # Колонки индикаторов без преобразований (имена схемы = колонки series)
+        for name in ('rsi', 'macd', 'macd_signal', 'macd_histogram', 'macd_crossover', 'bb_upper', 'bb_lower',
+                     'bb_position', 'ema_50', 'volume_ratio', 'is_high_volume', 'momentum', 'atr'):
+            X[:, i[name]] = col(series, name)
+        ema_50, ema_200 = X[:, i['ema_50']], col(series, 'ema_200')
+        X[:, i['ema_200']] = np.where(np.isnan(ema_200) | (ema_200 == 0), ema_50, ema_200)
+        for name in ('price_change_1h', 'price_change_4h', 'current_volume'):
+            X[:, i[name]] = col(market_data, name)
+        fear_greed = col(market_data, 'fear_greed')
+        X[:, i['fear_greed']] = np.where(np.isnan(fear_greed) | (fear_greed == 0), 50, fear_greed)
+        if schema.mode == 'day':
+            for name, _ in DAY_COLUMNS:
+                X[:, i[name]] = col(series, name)
+        return X
     
     def create_default_model(self):
         """Создаёт базовую модель Random Forest"""
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            class_weight='balanced'
-        )
+        self.model = default_model()
         logger.info("Created new Random Forest model")
     
     def predict(self, indicators, market_data, mode='swing'):
@@ -102,43 +211,22 @@ class MLPredictor:
             }
         """
         # Если модель не обучена, используем rule-based подход
-        if self.model is None:
+        # ✅ НОВОЕ: модель ищется по режиму; day без индикаторов дейтрейдинга - тоже rule-based
+        if self.model_version(mode) is None or (mode == 'day' and 'day_trading' not in indicators):
             return self.rule_based_prediction(indicators, market_data)
         
         try:
             # Подготовка features с учетом режима
             features = self.prepare_features(indicators, market_data, mode)
             
-            # Нормализация
-            features_scaled = self.scaler.transform(features)
-            
-            # Прогноз с учетом режима
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
-            
-            # Дополнительная валидация для дейтрейдинга
-            if mode == 'day':
-                prediction, probabilities = self.validate_day_trading_signal(
-                    prediction, 
-                    probabilities, 
-                    indicators
-                )
-            
-            # Определяем confidence level
-            max_prob = max(probabilities)
-            if max_prob >= 0.80:
-                confidence = 'HIGH'
-            elif max_prob >= 0.65:
-                confidence = 'MEDIUM'
-            else:
-                confidence = 'LOW'
-            
-            signal_map = {0: 'DUMP', 1: 'NEUTRAL', 2: 'PUMP'}
+            # ✅ НОВОЕ: одна строка через predict_batch - один проход по лесу
+            # (predict_proba), поправки дейтрейдинга - как validate_day_trading_signal
+            batch = self.predict_batch(features, mode, self.day_conditions(indicators) if mode == 'day' else None)
             
             result = {
-                'signal': signal_map[prediction],
-                'probability': max_prob,
-                'confidence': confidence
+                'signal': str(batch['signal'][0]),
+                'probability': float(batch['probability'][0]),
+                'confidence': str(batch['confidence'][0])
             }
             
             # Добавляем специфическую информацию для дейтрейдинга
@@ -152,6 +240,76 @@ class MLPredictor:
             logger.error(f"Error in ML prediction: {e}")
             return self.rule_based_prediction(indicators, market_data)
     
+    def predict_batch(self, features, mode='swing', indicators=None, market_data=None, chunk_size=None):
+        """
+        ✅ НОВОЕ: Прогноз для матрицы признаков (N x F)
+        
+        Один predict_proba на блок строк (класс - argmax вероятностей, как
+        model.predict), поправки дейтрейдинга и уверенность - векторно.
+        Строки обрабатываются блоками по chunk_size - память под
+        нормализованные признаки не растёт с N.
+        
+        Args:
+            features: prepare_features_batch (или prepare_features) - N x F
+            mode: режим работы ('swing' или 'day')
+            indicators: колонки условий дейтрейдинга - is_valid_for_daytrading,
+                day_spread_ok, day_volume_confirmed, day_is_volatile (как в
+                calculate_indicator_series); нет колонки - условие не выполнено,
+                как в validate_day_trading_signal
+            market_data: колонки для rule-based прогноза, если модель не обучена
+        
+        Returns:
+            dict: signal, probability, confidence, prediction (класс 0/1/2),
+                  probabilities (N x классов модели) - массивы
+        """
+        # Одна версия на весь вызов - горячая замена не разорвёт модель и нормализатор
+        active = self.model_version(mode)
+        if active is None:
+            if indicators is None or market_data is None:
+                raise ValueError("Model is not trained: indicators and market_data are needed for rule-based fallback")
+            return self.rule_based_prediction_batch(indicators, market_data)
+        
+        features = np.asarray(features, dtype=np.float64)
+        n = len(features)
+        chunk_size = chunk_size or config.PREDICT_CHUNK_SIZE
+        probabilities = np.empty((n, len(active.model.classes_)))
+        for start in range(0, n, chunk_size):
+            block = features[start:start + chunk_size]
+            probabilities[start:start + len(block)] = active.model.predict_proba(active.scaler.transform(block))
+        prediction = active.model.classes_[np.argmax(probabilities, axis=1)]
+        
+        if mode == 'day':
+            def condition(key):
+                return indicators_numpy.column(indicators if indicators is not None else {}, key, 0, n) > 0
+            
+            # Те же шаги и порядок умножений, что в validate_day_trading_signal
+            valid = condition('is_valid_for_daytrading')
+            probabilities = np.where(valid[:, None], probabilities, probabilities * 0.5)
+            prediction = np.where(~valid & (probabilities.max(axis=1) < 0.5), 1, prediction)
+            for key, factor in (('day_spread_ok', 0.7), ('day_volume_confirmed', 0.8), ('day_is_volatile', 0.6)):
+                probabilities = np.where(condition(key)[:, None], probabilities, probabilities * factor)
+        
+        max_prob = probabilities.max(axis=1)
+        return {
+            'signal': np.array(['DUMP', 'NEUTRAL', 'PUMP'])[prediction],
+            'probability': max_prob,
+            'confidence': np.where(max_prob >= 0.80, 'HIGH', np.where(max_prob >= 0.65, 'MEDIUM', 'LOW')),
+            'prediction': prediction,
+            'probabilities': probabilities
+        }
+    
+    @staticmethod
+    def day_conditions(indicators):
+        """✅ НОВОЕ: Условия validate_day_trading_signal из dict индикаторов - колонки для predict_batch"""
+        day_indicators = indicators.get('day_trading', {})
+        signals = day_indicators.get('signals', {})
+        return {
+            'is_valid_for_daytrading': [bool(indicators.get('is_valid_for_daytrading', False))],
+            'day_spread_ok': [bool(signals.get('spread_ok', False))],
+            'day_volume_confirmed': [bool(signals.get('volume_confirmed', False))],
+            'day_is_volatile': [bool(day_indicators.get('is_volatile', False))]
+        }
+    
     def rule_based_prediction(self, indicators, market_data):
         """
         Rule-based прогноз на основе технических индикаторов
@@ -269,6 +427,21 @@ class MLPredictor:
         except Exception:
             pass
         
+        # ✅ НОВОЕ: Перцентильные ранги за длинное окно (rolling_rank.py)
+        try:
+            volume_rank = indicators.get('volume_rank', 0.5)
+            if volume_rank >= config.VOLUME_RANK_HIGH and score != 0:
+                score += 1 if score > 0 else -1
+                reasons.append(f"Объём в верхних {(1 - config.VOLUME_RANK_HIGH) * 100:.0f}% за окно")
+            if indicators.get('atr_rank', 0.5) <= config.ATR_RANK_LOW and abs(score) > 1:
+                score = 1 if score > 0 else -1
+                reasons.append("ATR у минимума окна — ограничение силы сигнала")
+            if indicators.get('spread_rank', 0.5) >= config.SPREAD_RANK_HIGH and score != 0:
+                score -= 1 if score > 0 else -1
+                reasons.append("Спред шире обычного — сигнал ослаблен")
+        except Exception:
+            pass
+        
         # Определяем сигнал
         if score >= 4:
             signal = 'PUMP'
@@ -298,26 +471,199 @@ class MLPredictor:
         logger.info(f"Rule-based Prediction: {signal} ({probability:.2%}) - Score: {score}")
         return result
     
+    def rule_based_prediction_batch(self, indicators, market_data):
+        """
+        ✅ НОВОЕ: rule_based_prediction для целых колонок за один векторный проход
+        
+        Строка i совпадает со скалярным прогнозом по строке i (кроме reasons).
+        Пороги читаются из config на каждый вызов - их можно подбирать,
+        прогоняя историю (calculate_indicator_series) с разными значениями.
+        
+        Args:
+            indicators: dict/DataFrame колонок индикаторов; bb_position строками
+                или кодами 1 / -1 / 0 (как в calculate_indicator_series)
+            market_data: dict/DataFrame колонок oi_change_1h, price_change_1h,
+                fear_greed, current_price (скаляр растягивается; None/NaN - нет данных)
+        
+        Returns:
+            dict: score (int), signal, probability, confidence - массивы длины n
+        """
+        bb_position = indicators_numpy.category_codes(indicators['bb_position'], 'above_upper', 'below_lower')
+        n = len(bb_position)
+        
+        def col(columns, key, default):
+            return indicators_numpy.column(columns, key, default, n)
+        
+        score = np.zeros(n, dtype=np.int64)
+        
+        # Open Interest
+        oi_change = col(market_data, 'oi_change_1h', 0)
+        price_change = col(market_data, 'price_change_1h', 0)
+        strong_oi = (np.abs(oi_change) > 2.0) & (oi_change > 0)
+        score += np.where(strong_oi & (price_change > 0), 3, np.where(strong_oi & (price_change < 0), -3, 0))
+        
+        # Bollinger Bands
+        score += np.where(bb_position == -1, 2, np.where(bb_position == 1, -2, 0))
+        
+        # Volume анализ - в сторону уже набранного score
+        score += np.asarray(indicators['is_high_volume'], dtype=bool) * np.sign(score) * 2
+        
+        # Price change
+        score += np.where(price_change > 2.5, 2, np.where(price_change < -2.5, -2, 0))
+        
+        # Fear & Greed (0 и None пропускаются, как в скалярной версии)
+        fg = col(market_data, 'fear_greed', None)
+        fg_known = (fg != 0) & ~np.isnan(fg)
+        score += np.where(fg_known & (fg > 75), -1, np.where(fg_known & (fg < 25), 1, 0))
+        
+        # Momentum
+        momentum = col(indicators, 'momentum', 0)
+        score += np.select([momentum > 300, momentum < -300, momentum > 0, momentum < 0], [2, -2, 1, -1], 0)
+        
+        # VWAP side
+        vwap = col(indicators, 'vwap', None)
+        current_price = col(market_data, 'current_price', None)
+        vwap_known = ~np.isnan(vwap) & ~np.isnan(current_price)
+        score += np.where(vwap_known, np.where(current_price > vwap, 1, -1), 0)
+        
+        # Блоки ниже повторяют try/except скалярной версии: без порога в config
+        # блок пропускается так же, как там
+        try:
+            ob = col(indicators, 'orderbook_imbalance', 0.0)
+            score += np.where(ob > config.OB_IMBALANCE_THRESHOLD, 1, np.where(ob < -config.OB_IMBALANCE_THRESHOLD, -1, 0))
+        except Exception:
+            pass
+        
+        try:
+            spike = col(indicators, 'volume_ratio', 1.0) > config.VOLUME_SPIKE_RATIO
+            score += spike * np.sign(score)
+        except Exception:
+            pass
+        
+        try:
+            atr = col(indicators, 'atr', None)
+            low_atr = ~np.isnan(atr) & ~np.isnan(current_price) & (atr < config.ATR_LOW_RATIO * current_price)
+            score = np.where(low_atr & (np.abs(score) > 1), np.sign(score), score)
+        except Exception:
+            pass
+        
+        try:
+            score += (col(indicators, 'volume_rank', 0.5) >= config.VOLUME_RANK_HIGH) * np.sign(score)
+            low_atr_rank = col(indicators, 'atr_rank', 0.5) <= config.ATR_RANK_LOW
+            score = np.where(low_atr_rank & (np.abs(score) > 1), np.sign(score), score)
+            score -= (col(indicators, 'spread_rank', 0.5) >= config.SPREAD_RANK_HIGH) * np.sign(score)
+        except Exception:
+            pass
+        
+        # Сигнал, вероятность и уверенность - те же формулы
+        signal = np.where(score >= 4, 'PUMP', np.where(score <= -4, 'DUMP', 'NEUTRAL'))
+        probability = np.where(
+            np.abs(score) >= 4,
+            np.minimum(0.65 + (np.abs(score) - 4) * 0.05, 0.90),
+            0.50 + np.abs(score) * 0.05
+        )
+        confidence = np.where(probability >= 0.75, 'HIGH', np.where(probability >= 0.60, 'MEDIUM', 'LOW'))
+        
+        return {
+            'score': score,
+            'signal': signal,
+            'probability': probability,
+            'confidence': confidence
+        }
+    
     def save_model(self):
         """Сохраняет обученную модель на диск"""
         if self.model:
-            joblib.dump(self.model, self.model_path)
+            # FlatForest - только представление для прогноза, на диск идёт исходный лес
+            model = self.model.forest if isinstance(self.model, FlatForest) else self.model
+            joblib.dump(model, self.model_path)
             joblib.dump(self.scaler, self.scaler_path)
             logger.info("Model saved successfully")
     
-    def load_model(self):
-        """Загружает модель с диска"""
+    def load_model(self, backend=None):
+        """
+        Загружает модель с диска
+        
+        ✅ НОВОЕ: последние версии реестра (config.MODEL_DIR) по режимам;
+        если версия есть не у каждого режима - ещё и прежние MODEL_PATH /
+        SCALER_PATH (модель без режима) для остальных режимов
+        
+        Args:
+            backend: 'flat' (FlatForest) или 'sklearn' - по умолчанию config.ML_INFERENCE_BACKEND
+        """
+        try:
+            self.reload(backend, force=True)
+        except Exception as e:
+            logger.warning(f"Could not load model from registry: {e}")
+        if all(mode in self.models for mode in FEATURE_SCHEMAS):
+            return
+        
         if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
             try:
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-                logger.info("Model loaded successfully")
+                model = joblib.load(self.model_path)
+                scaler = joblib.load(self.scaler_path)
+                # ✅ НОВОЕ: Прогноз по плоским массивам - те же вероятности без накладных расходов sklearn
+                if (backend or config.ML_INFERENCE_BACKEND) == 'flat' and isinstance(model, RandomForestClassifier):
+                    model = FlatForest.from_sklearn(model)
+                self._set_unbound(ModelVersion(model, scaler))
+                logger.info(f"Model loaded successfully ({type(self.model).__name__})")
             except Exception as e:
                 logger.warning(f"Could not load model: {e}")
                 self.model = None
         else:
             logger.info("No trained model found, using rule-based approach")
     
+    def reload(self, backend=None, force=False):
+        """
+        ✅ НОВОЕ: Переходит на последние версии реестра по режимам, если они новее текущих
+        
+        Версия загружается и проверяется целиком (схема признаков, пробный
+        прогноз), затем self.models заменяется одной ссылкой - идущие
+        прогнозы доводятся на прежней версии. Ошибка версии одного режима
+        не мешает другому.
+        
+        Returns:
+            bool: True если заменена хотя бы одна модель
+        """
+        changed = False
+        for mode in FEATURE_SCHEMAS:
+            version = self.registry.latest(mode)
+            current = self.models.get(mode)
+            if version is None or (current is not None and current.version == version and not force):
+                continue
+            try:
+                loaded = self.registry.load(version, backend)
+            except Exception as e:
+                logger.warning(f"Could not load {mode} model {version}: {e}")
+                continue
+            self.models = {**self.models, mode: loaded}
+            changed = True
+            logger.info(f"Model version {version} loaded for {mode} ({type(loaded.model).__name__}, "
+                        f"{loaded.meta.get('start')} - {loaded.meta.get('end')})")
+        return changed
+    
+    async def start_watching(self, interval=None):
+        """✅ НОВОЕ: Фоновая проверка реестра - новая версия подхватывается без перезапуска бота"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_loop(interval or config.MODEL_RELOAD_INTERVAL))
+            logger.info(f"Watching model registry {self.registry.directory}")
+    
+    async def stop_watching(self):
+        """Останавливает проверку реестра"""
+        task, self._watch_task = self._watch_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def _watch_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Загрузка (распаковка деревьев) - в потоке, event loop не блокируется
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.warning(f"Model reload failed, keeping current versions: {e}")
+    
     def should_send_signal(self, prediction):
         """
         Определяет, нужно ли отправлять сигнал пользователям
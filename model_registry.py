@@ -0,0 +1,138 @@
+"""
+Версионированный реестр обученных моделей
+Версия - каталог <MODEL_DIR>/<UTC время>-<режим>/: model.pkl, scaler.pkl,
+flat.pkl (плоские массивы FlatForest) и meta.json (режим, таймфрейм, схема
+признаков, окно обучения, метрики фолдов). Версия собирается во временном
+каталоге и переименовывается целиком - реестр не видит недописанных версий.
+Массивы flat.pkl и scaler.pkl загружаются через joblib.load(mmap_mode='r'):
+они отображаются из page cache и общие для всех процессов, загрузивших ту
+же версию (бот, сканер, рекордер). Лес sklearn (model.pkl) так не делится -
+при распаковке дерево копирует массивы узлов в свою память; при бэкенде
+'flat' он загружается только когда нужен (большие блоки, save_model)
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+import config
+from feature_schema import FEATURE_SCHEMAS
+from forest_eval import FlatForest
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+
+class ModelVersion:
+    """
+    Модель, нормализатор и метаданные одной версии
+    
+    MLPredictor держит текущую версию одной ссылкой: горячая замена -
+    одно присваивание, прогноз не увидит модель одной версии с
+    нормализатором другой.
+    """
+    
+    __slots__ = ('model', 'scaler', 'meta')
+    
+    def __init__(self, model, scaler, meta=None):
+        self.model = model
+        self.scaler = scaler
+        self.meta = meta or {}
+    
+    @property
+    def version(self):
+        return self.meta.get('version')
+
+class ModelRegistry:
+    """Каталог версий моделей (по умолчанию config.MODEL_DIR)"""
+    
+    def __init__(self, directory=None):
+        self.directory = directory or config.MODEL_DIR
+    
+    def read_meta(self, version):
+        """meta.json версии или None, если версия неполная"""
+        try:
+            with open(os.path.join(self.directory, version, META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def versions(self, mode=None):
+        """Готовые версии (имена каталогов) от старых к новым"""
+        if not os.path.isdir(self.directory):
+            return []
+        versions = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.tmp'):
+                continue
+            meta = self.read_meta(name)
+            if meta is not None and (mode is None or meta.get('mode') == mode):
+                versions.append(name)
+        return versions
+    
+    def latest(self, mode=None):
+        """Последняя версия режима или None"""
+        versions = self.versions(mode)
+        return versions[-1] if versions else None
+    
+    def save(self, model, scaler, meta):
+        """
+        Пишет новую версию
+        
+        Returns:
+            str: Путь к версии
+        """
+        version = f"{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}-{meta['mode']}"
+        path = os.path.join(self.directory, version)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path)
+        # Без сжатия - иначе mmap_mode при загрузке невозможен
+        joblib.dump(model, os.path.join(tmp_path, 'model.pkl'))
+        joblib.dump(scaler, os.path.join(tmp_path, 'scaler.pkl'))
+        if isinstance(model, RandomForestClassifier):
+            joblib.dump(FlatForest.from_sklearn(model).arrays(), os.path.join(tmp_path, 'flat.pkl'))
+        with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+            json.dump({**meta, 'version': version}, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+    
+    def load(self, version, backend=None, mmap_mode='r'):
+        """
+        Загружает версию
+        
+        Args:
+            backend: 'flat' или 'sklearn' - по умолчанию config.ML_INFERENCE_BACKEND
+            mmap_mode: режим np.memmap для массивов артефактов (None - чтение в память)
+        
+        Returns:
+            ModelVersion (проверенная схемой признаков и пробным прогнозом)
+        
+        Raises:
+            ValueError: версия неполная или обучена на другой схеме признаков
+        """
+        path = os.path.join(self.directory, version)
+        meta = self.read_meta(version)
+        if meta is None:
+            raise ValueError(f"Model version {version} is incomplete")
+        schema = FEATURE_SCHEMAS.get(meta.get('mode'))
+        if schema is None:
+            raise ValueError(f"Model version {version} has unknown mode {meta.get('mode')}")
+        schema.check(meta)
+        model_path = os.path.join(path, 'model.pkl')
+        scaler = joblib.load(os.path.join(path, 'scaler.pkl'), mmap_mode=mmap_mode)
+        flat_path = os.path.join(path, 'flat.pkl')
+        flat = (backend or config.ML_INFERENCE_BACKEND) == 'flat'
+        if flat and os.path.exists(flat_path):
+            # Лес - лениво: в памяти процесса только отображённые плоские массивы
+            model = FlatForest(arrays=joblib.load(flat_path, mmap_mode=mmap_mode),
+                               loader=lambda: joblib.load(model_path))
+        else:
+            model = joblib.load(model_path)
+            if flat and isinstance(model, RandomForestClassifier):
+                model = FlatForest.from_sklearn(model)
+        
+        # Пробный прогноз до замены: битая версия не должна вытеснить рабочую
+        model.predict_proba(scaler.transform(np.zeros((1, len(schema)))))
+        return ModelVersion(model, scaler, meta)
@@ -0,0 +1,217 @@
+"""
+Локальный колоночный архив исторических OHLCV свечей
+Свечи хранятся по дням: <dir>/<SYMBOL>/<timeframe>/YYYY-MM-DD.npy, массив
+(6, n) float64 - timestamp, open, high, low, close, volume, каждая колонка
+непрерывна. Файлы читаются через mmap, год 1m свечей - доли секунды.
+Догрузка истории идёт страницами fetch_ohlcv параллельно в пределах бюджета
+веса и продолжается с последней сохранённой свечи
+
+Запуск:
+    python ohlcv_archive.py --symbol BTC/USDT --timeframe 1m --days 365
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import config
+from candle_store import OHLCV_COLUMNS, timeframe_to_ms
+from candles import Candles
+from rate_budget import BudgetExceeded, BudgetedExchange, WeightBudget, PRIORITY_LOW, request_priority
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86_400_000
+
+def _day_name(ts_ms):
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def _day_start(name):
+    day = datetime.strptime(name, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return int(day.timestamp() * 1000)
+
+class OHLCVArchive:
+    """Архив свечей одной пары и таймфрейма, разбитый по дням (UTC)"""
+    
+    def __init__(self, symbol=None, timeframe='1m', directory=None):
+        self.symbol = symbol or config.SYMBOL
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.path = os.path.join(directory or config.ARCHIVE_DIR, self.symbol.replace('/', ''), timeframe)
+    
+    def days(self):
+        """Имена дней с данными ('YYYY-MM-DD'), по возрастанию"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.path) if name.endswith('.npy'))
+    
+    def _day_path(self, day):
+        return os.path.join(self.path, f"{day}.npy")
+    
+    def _load_day(self, day, mmap=True):
+        return np.load(self._day_path(day), mmap_mode='r' if mmap else None)
+    
+    def last_timestamp(self):
+        """Время открытия последней сохранённой свечи (мс) или None"""
+        days = self.days()
+        if not days:
+            return None
+        return int(self._load_day(days[-1])[0, -1])
+    
+    def write(self, ohlcv):
+        """
+        Добавляет свечи (формат fetch_ohlcv), дубликаты по времени заменяются
+        
+        Каждый затронутый день перезаписывается атомарно (tmp + rename).
+        
+        Returns:
+            int: Количество записанных свечей
+        """
+        if ohlcv is None or len(ohlcv) == 0:
+            return 0
+        data = np.asarray(ohlcv, dtype=np.float64)[:, :6].T
+        os.makedirs(self.path, exist_ok=True)
+        
+        day_ids = (data[0] // DAY_MS).astype(np.int64)
+        for day_id in np.unique(day_ids):
+            chunk = data[:, day_ids == day_id]
+            day = _day_name(int(day_id) * DAY_MS)
+            path = self._day_path(day)
+            if os.path.exists(path):
+                chunk = np.concatenate([self._load_day(day, mmap=False), chunk], axis=1)
+            # Последнее значение для каждого времени, по возрастанию
+            _, index = np.unique(chunk[0][::-1], return_index=True)
+            chunk = chunk[:, len(chunk[0]) - 1 - index]
+            
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(chunk))
+            os.replace(tmp_path, path)
+        return data.shape[1]
+    
+    def read(self, start_ms=None, end_ms=None):
+        """
+        Свечи в диапазоне [start_ms, end_ms)
+        
+        Returns:
+            tuple: (timestamps int64, values (5, n) float64) - как CandleSeries
+        """
+        days = self.days()
+        if start_ms is not None:
+            days = [d for d in days if _day_start(d) + DAY_MS > start_ms]
+        if end_ms is not None:
+            days = [d for d in days if _day_start(d) < end_ms]
+        if not days:
+            return np.empty(0, dtype=np.int64), np.empty((5, 0))
+        
+        data = np.concatenate([self._load_day(d) for d in days], axis=1)
+        ts = data[0].astype(np.int64)
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, 'left'))
+        hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, 'left'))
+        return ts[lo:hi], data[1:, lo:hi]
+    
+    def candles(self, start_ms=None, end_ms=None):
+        """✅ НОВОЕ: Свечи диапазона как компактные Candles (28 байт на свечу вместо 48)"""
+        ts, values = self.read(start_ms, end_ms)
+        return Candles.from_arrays(ts, values, (self.symbol, self.timeframe))
+    
+    def frame(self, start_ms=None, end_ms=None):
+        """Свечи диапазона как DataFrame (колонки как в get_ohlcv_data)"""
+        ts, values = self.read(start_ms, end_ms)
+        df = pd.DataFrame(values.T, columns=OHLCV_COLUMNS[1:])
+        df.insert(0, 'timestamp', pd.to_datetime(ts, unit='ms'))
+        return df
+
+async def _fetch_page(exchange, symbol, timeframe, since, limit):
+    """Одна страница истории; при исчерпании бюджета ждёт и повторяет"""
+    while True:
+        try:
+            return await exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+        except BudgetExceeded as e:
+            logger.info(f"Backfill paused: {e}")
+            await asyncio.sleep(config.BACKFILL_RETRY_DELAY)
+
+async def backfill(exchange, archive, since_ms, until_ms=None, concurrency=None, page_limit=None):
+    """
+    Догружает историю в архив с последней сохранённой свечи
+    
+    Страницы запрашиваются пачками по concurrency штук и пишутся по порядку,
+    поэтому после прерывания архив остаётся без дыр и догрузка продолжается.
+    Запросы идут с низким приоритетом - цикл мониторинга имеет преимущество.
+    
+    Args:
+        exchange: async ccxt биржа (желательно BudgetedExchange)
+        archive: OHLCVArchive
+        since_ms: начало истории, если архив пуст
+        until_ms: конец (по умолчанию - текущая закрытая свеча)
+    
+    Returns:
+        int: Количество записанных свечей
+    """
+    concurrency = concurrency or config.BACKFILL_CONCURRENCY
+    page_limit = page_limit or config.BACKFILL_PAGE_LIMIT
+    tf_ms = archive.tf_ms
+    if until_ms is None:
+        until_ms = int(time.time() * 1000)
+    until_ms -= until_ms % tf_ms  # Только закрытые свечи
+    
+    last = archive.last_timestamp()
+    start = since_ms - since_ms % tf_ms
+    if last is not None:
+        start = max(start, last + tf_ms)
+    else:
+        # Пустой архив: история пары может начинаться позже since_ms (листинг)
+        with request_priority(PRIORITY_LOW):
+            first = await _fetch_page(exchange, archive.symbol, archive.timeframe, start, 1)
+        if first:
+            start = max(start, int(first[0][0]))
+    page_ms = page_limit * tf_ms
+    pages = list(range(start, until_ms, page_ms))
+    if not pages:
+        return 0
+    logger.info(f"Backfill {archive.symbol} {archive.timeframe}: {len(pages)} pages from {_day_name(start)}")
+    
+    written = 0
+    with request_priority(PRIORITY_LOW):
+        for i in range(0, len(pages), concurrency):
+            batch = pages[i:i + concurrency]
+            results = await asyncio.gather(*[
+                _fetch_page(exchange, archive.symbol, archive.timeframe, page, page_limit) for page in batch
+            ])
+            for page, ohlcv in zip(batch, results):
+                # Только свечи своей страницы и до конца диапазона
+                end = min(page + page_ms, until_ms)
+                ohlcv = [c for c in ohlcv if page <= c[0] < end]
+                written += archive.write(ohlcv)
+            logger.info(f"Backfill {archive.symbol} {archive.timeframe}: {written} candles, up to {_day_name(batch[-1])}")
+    return written
+
+async def _run(args):
+    import ccxt.async_support as ccxt_async
+    
+    archive = OHLCVArchive(args.symbol, args.timeframe, args.directory)
+    exchange = BudgetedExchange(ccxt_async.binance({'enableRateLimit': True}), WeightBudget())
+    since_ms = int((time.time() - args.days * 86400) * 1000)
+    start = time.perf_counter()
+    try:
+        written = await backfill(exchange, archive, since_ms, concurrency=args.concurrency)
+    finally:
+        await exchange.close()
+    print(f"Backfilled {written} candles in {time.perf_counter() - start:.1f}s")
+    
+    start = time.perf_counter()
+    ts, _ = archive.read()
+    print(f"Archive: {len(ts)} candles in {len(archive.days())} days, read in {time.perf_counter() - start:.3f}s")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Backfill historical OHLCV into the local archive')
+    parser.add_argument('--symbol', default=config.SYMBOL)
+    parser.add_argument('--timeframe', default=config.BASE_TIMEFRAME)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--concurrency', type=int, default=config.BACKFILL_CONCURRENCY)
+    parser.add_argument('--directory', default=config.ARCHIVE_DIR)
+    asyncio.run(_run(parser.parse_args()))
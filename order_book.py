@@ -0,0 +1,248 @@
+"""
+Локальный стакан по потоку diff-обновлений Binance
+Бутстрап из REST снимка, применение depthUpdate событий с проверкой
+последовательности (U/u) и пересинхронизацией при разрыве. Уровни хранятся
+в отсортированных numpy массивах: лучшие цены и спред - O(1), объём
+в любой полосе от mid - O(log n) по накопленным суммам
+"""
+import logging
+from collections import deque
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+def _merge_levels(prices, qtys, updates):
+    """
+    Вливает обновления уровней в отсортированные по возрастанию массивы
+    
+    Количество 0 удаляет уровень. Один проход O(n + k) на событие.
+    
+    Returns:
+        tuple: (prices, qtys) - новые или изменённые на месте массивы
+    """
+    if len(updates) == 0:
+        return prices, qtys
+    upd = np.asarray(updates, dtype=np.float64).reshape(-1, 2)
+    upd = upd[np.argsort(upd[:, 0], kind='stable')]
+    # Повтор цены в одном событии - действует последнее значение
+    last = np.append(upd[1:, 0] != upd[:-1, 0], True)
+    p, q = upd[last, 0], upd[last, 1]
+    
+    idx = np.searchsorted(prices, p)
+    found = idx < len(prices)
+    found[found] = prices[idx[found]] == p[found]
+    
+    qtys[idx[found]] = q[found]
+    removed = found & (q == 0)
+    new = ~found & (q > 0)
+    if new.any():
+        prices = np.insert(prices, idx[new], p[new])
+        qtys = np.insert(qtys, idx[new], q[new])
+    if removed.any():
+        keep = qtys > 0
+        prices, qtys = prices[keep], qtys[keep]
+    return prices, qtys
+
+class LocalOrderBook:
+    """
+    Стакан пары, поддерживаемый diff-событиями
+    
+    Обе стороны хранятся по возрастанию цены: лучший bid - последний
+    элемент, лучший ask - первый. Накопленные суммы объёмов считаются
+    лениво один раз на версию стакана.
+    """
+    
+    def __init__(self, symbol=None, max_levels=None):
+        self.symbol = symbol or config.SYMBOL
+        self.max_levels = max_levels or config.ORDERBOOK_MAX_LEVELS
+        self.last_update_id = None  # None - стакан не синхронизирован
+        self.version = 0
+        self.resyncs = 0
+        self._buffer = deque(maxlen=config.ORDERBOOK_BUFFER_SIZE)
+        self._bid_prices = np.empty(0)
+        self._bid_qtys = np.empty(0)
+        self._ask_prices = np.empty(0)
+        self._ask_qtys = np.empty(0)
+        self._cum_version = -1
+        self._bid_cum = None
+        self._ask_cum = None
+    
+    @property
+    def synced(self):
+        return self.last_update_id is not None
+    
+    def __len__(self):
+        return len(self._bid_prices) + len(self._ask_prices)
+    
+    # ------------------------------------------------------------------
+    # Синхронизация
+    # ------------------------------------------------------------------
+    
+    def apply_snapshot(self, snapshot):
+        """
+        Загружает REST снимок и применяет накопленные события
+        
+        Args:
+            snapshot: ответ fetch_order_book ccxt ('nonce' = lastUpdateId)
+                      или /api/v3/depth Binance ('lastUpdateId')
+        
+        Returns:
+            bool: True если стакан синхронизирован; False если снимок старше
+                  накопленных событий (нужен новый снимок)
+        """
+        last_id = snapshot.get('nonce', snapshot.get('lastUpdateId'))
+        if last_id is None:
+            raise ValueError("Order book snapshot without update id")
+        last_id = int(last_id)
+        
+        bids = np.asarray(snapshot['bids'], dtype=np.float64).reshape(-1, 2)[:, :2]
+        asks = np.asarray(snapshot['asks'], dtype=np.float64).reshape(-1, 2)[:, :2]
+        bids = bids[np.argsort(bids[:, 0])]
+        asks = asks[np.argsort(asks[:, 0])]
+        self._bid_prices, self._bid_qtys = bids[:, 0].copy(), bids[:, 1].copy()
+        self._ask_prices, self._ask_qtys = asks[:, 0].copy(), asks[:, 1].copy()
+        self.last_update_id = last_id
+        self.version += 1
+        
+        pending = [e for e in self._buffer if int(e['u']) > last_id]
+        self._buffer.clear()
+        if pending and int(pending[0]['U']) > last_id + 1:
+            # Между снимком и первым событием есть пропуск
+            self.last_update_id = None
+            self._buffer.extend(pending)
+            return False
+        for event in pending:
+            self._apply(event)
+        self.resyncs += 1
+        return True
+    
+    def apply_diff(self, event):
+        """
+        Применяет depthUpdate событие
+        
+        Пока стакан не синхронизирован, события копятся для apply_snapshot.
+        
+        Returns:
+            bool: False если обнаружен разрыв последовательности и нужен
+                  новый снимок
+        """
+        if not self.synced:
+            self._buffer.append(event)
+            return False
+        
+        first_id, final_id = int(event['U']), int(event['u'])
+        if final_id <= self.last_update_id:
+            return True  # Уже учтено в снимке
+        if first_id > self.last_update_id + 1:
+            logger.warning(
+                f"Order book gap for {self.symbol}: expected {self.last_update_id + 1}, got {first_id}, resyncing"
+            )
+            self.last_update_id = None
+            self._buffer.clear()
+            self._buffer.append(event)
+            return False
+        
+        self._apply(event)
+        return True
+    
+    def _apply(self, event):
+        self._bid_prices, self._bid_qtys = _merge_levels(self._bid_prices, self._bid_qtys, event['b'])
+        self._ask_prices, self._ask_qtys = _merge_levels(self._ask_prices, self._ask_qtys, event['a'])
+        if len(self._bid_prices) > self.max_levels:
+            self._bid_prices = self._bid_prices[-self.max_levels:]
+            self._bid_qtys = self._bid_qtys[-self.max_levels:]
+        if len(self._ask_prices) > self.max_levels:
+            self._ask_prices = self._ask_prices[:self.max_levels]
+            self._ask_qtys = self._ask_qtys[:self.max_levels]
+        self.last_update_id = int(event['u'])
+        self.version += 1
+    
+    # ------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------
+    
+    @property
+    def best_bid(self):
+        return float(self._bid_prices[-1]) if len(self._bid_prices) else None
+    
+    @property
+    def best_ask(self):
+        return float(self._ask_prices[0]) if len(self._ask_prices) else None
+    
+    @property
+    def mid(self):
+        if not len(self._bid_prices) or not len(self._ask_prices):
+            return None
+        return (self._bid_prices[-1] + self._ask_prices[0]) / 2
+    
+    def spread(self):
+        """Спред в цене (или None)"""
+        if not len(self._bid_prices) or not len(self._ask_prices):
+            return None
+        return float(self._ask_prices[0] - self._bid_prices[-1])
+    
+    def spread_pct(self):
+        """Спред в процентах от лучшего bid - как в calculate_day_trading_indicators"""
+        spread = self.spread()
+        return None if spread is None else spread / float(self._bid_prices[-1]) * 100
+    
+    def _cumulative(self):
+        """Накопленные объёмы от лучшей цены вглубь (пересчёт раз на версию)"""
+        if self._cum_version != self.version:
+            self._bid_cum = np.cumsum(self._bid_qtys[::-1])
+            self._ask_cum = np.cumsum(self._ask_qtys)
+            self._cum_version = self.version
+        return self._bid_cum, self._ask_cum
+    
+    def volume_at_levels(self, levels):
+        """Суммарный объём лучших levels уровней каждой стороны: (bid, ask)"""
+        bid_cum, ask_cum = self._cumulative()
+        bid = float(bid_cum[min(levels, len(bid_cum)) - 1]) if len(bid_cum) else 0.0
+        ask = float(ask_cum[min(levels, len(ask_cum)) - 1]) if len(ask_cum) else 0.0
+        return bid, ask
+    
+    def depth(self, band_pct):
+        """
+        Объём в полосе ±band_pct% от mid: (bid, ask)
+        
+        Бинарный поиск по ценам и разность накопленных сумм - O(log n).
+        """
+        mid = self.mid
+        if mid is None:
+            return 0.0, 0.0
+        bid_cum, ask_cum = self._cumulative()
+        # Биды по возрастанию: уровни не ниже порога - хвост массива
+        n_bids = len(self._bid_prices) - int(np.searchsorted(self._bid_prices, mid * (1 - band_pct / 100), 'left'))
+        n_asks = int(np.searchsorted(self._ask_prices, mid * (1 + band_pct / 100), 'right'))
+        bid = float(bid_cum[n_bids - 1]) if n_bids else 0.0
+        ask = float(ask_cum[n_asks - 1]) if n_asks else 0.0
+        return bid, ask
+    
+    def imbalance(self, levels=None):
+        """Дисбаланс лучших levels уровней - как TechnicalIndicators.orderbook_imbalance"""
+        bid, ask = self.volume_at_levels(levels or config.STREAM_DEPTH_LEVELS)
+        total = bid + ask
+        return (bid - ask) / total if total else 0.0
+    
+    def top(self, levels=None):
+        """
+        Лучшие уровни в формате разобранного стакана DataCollector
+        
+        Returns:
+            dict: bids (по убыванию), asks (по возрастанию), bid_volume,
+                  ask_volume, best_bid, best_ask, spread_pct
+        """
+        levels = levels or config.STREAM_DEPTH_LEVELS
+        bids = np.column_stack([self._bid_prices[::-1][:levels], self._bid_qtys[::-1][:levels]])
+        asks = np.column_stack([self._ask_prices[:levels], self._ask_qtys[:levels]])
+        bid_volume, ask_volume = self.volume_at_levels(levels)
+        return {
+            'bids': bids.tolist(),
+            'asks': asks.tolist(),
+            'bid_volume': bid_volume,
+            'ask_volume': ask_volume,
+            'best_bid': self.best_bid,
+            'best_ask': self.best_ask,
+            'spread_pct': self.spread_pct()
+        }
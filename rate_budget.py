@@ -0,0 +1,220 @@
+"""
+Бюджет веса запросов к Binance
+ccxt enableRateLimit только разносит вызовы во времени и не знает о минутном
+лимите веса на IP. Планировщик учитывает вес каждого эндпоинта, сверяется с
+заголовком X-MBX-USED-WEIGHT-1M, пропускает цикл мониторинга вперёд запросов
+пользователя и при нехватке бюджета отказывает (BudgetExceeded), чтобы
+вызывающий код отдал данные из кэша вместо бана 429/418
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import ccxt
+import config
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0  # Цикл мониторинга
+PRIORITY_LOW = 1  # Запросы пользователя (/status и т.п.)
+
+_priority = contextvars.ContextVar('exchange_priority', default=PRIORITY_HIGH)
+
+USED_WEIGHT_HEADER = 'x-mbx-used-weight-1m'
+
+@contextmanager
+def request_priority(priority):
+    """Приоритет запросов к бирже внутри блока (наследуется созданными задачами)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority():
+    """Приоритет запросов текущего контекста (для RequestCoalescer)"""
+    return _priority.get()
+
+def _arg(args, kwargs, index, name, default=None):
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(name, default)
+
+def request_weight(method, args=(), kwargs=None):
+    """
+    Вес запроса по таблице Binance spot API
+    
+    Returns:
+        int: вес или None если метод не учитывается
+    """
+    kwargs = kwargs or {}
+    if method == 'fetch_ohlcv':
+        return 2
+    if method == 'fetch_ticker':
+        return 2
+    if method == 'fetch_tickers':
+        symbols = _arg(args, kwargs, 0, 'symbols')
+        if not symbols:
+            return 80
+        if len(symbols) <= 20:
+            return 2
+        return 40 if len(symbols) <= 100 else 80
+    if method == 'fetch_order_book':
+        limit = _arg(args, kwargs, 1, 'limit') or 100
+        if limit <= 100:
+            return 5
+        if limit <= 500:
+            return 25
+        return 50 if limit <= 1000 else 250
+    if method == 'load_markets':
+        return 20
+    return None
+
+class BudgetExceeded(Exception):
+    """Запрос отклонён: бюджет веса исчерпан или IP временно заблокирован"""
+
+class WeightBudget:
+    """
+    Учёт веса запросов в минутном окне Binance
+    
+    Приоритет HIGH может занимать до EXCHANGE_WEIGHT_SAFETY лимита и при
+    нехватке ждёт начала следующего окна (не дольше EXCHANGE_WEIGHT_MAX_WAIT),
+    LOW - только до EXCHANGE_WEIGHT_LOW_PRIORITY и сразу получает отказ.
+    """
+    
+    def __init__(self, limit=None, window=60, clock=time.time):
+        self.limit = limit or config.EXCHANGE_WEIGHT_LIMIT
+        self.window = window
+        self.clock = clock
+        self.used = 0
+        self.window_start = 0.0
+        self.banned_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'refused': 0, 'waits': 0, 'bans': 0}
+    
+    def _roll(self, now):
+        """Начинает новое окно, если текущее закончилось"""
+        start = now - now % self.window
+        if start > self.window_start:
+            self.window_start = start
+            self.used = 0
+    
+    def cap(self, priority):
+        """Сколько веса может занять приоритет в окне"""
+        share = config.EXCHANGE_WEIGHT_SAFETY if priority == PRIORITY_HIGH else config.EXCHANGE_WEIGHT_LOW_PRIORITY
+        return self.limit * share
+    
+    def reserve(self, weight, priority=None):
+        """
+        Резервирует вес под запрос
+        
+        Returns:
+            float: 0 если можно выполнять, иначе сколько секунд подождать
+                   и вызвать reserve снова
+        
+        Raises:
+            BudgetExceeded: если ждать нельзя
+        """
+        priority = _priority.get() if priority is None else priority
+        with self._lock:
+            now = self.clock()
+            if now < self.banned_until:
+                self.stats['refused'] += 1
+                raise BudgetExceeded(f"IP rate limited for {self.banned_until - now:.0f}s more")
+            
+            self._roll(now)
+            if self.used + weight <= self.cap(priority):
+                self.used += weight
+                self.stats['requests'] += 1
+                return 0.0
+            
+            wait = self.window_start + self.window - now
+            if priority == PRIORITY_HIGH and wait <= config.EXCHANGE_WEIGHT_MAX_WAIT:
+                self.stats['waits'] += 1
+                return wait + 0.05
+            
+            self.stats['refused'] += 1
+            raise BudgetExceeded(f"weight budget exhausted: {self.used}/{self.limit}, resets in {wait:.0f}s")
+    
+    def observe(self, headers):
+        """Сверяет учёт с использованным весом из заголовков ответа"""
+        if not headers:
+            return
+        for name, value in headers.items():
+            if name.lower() == USED_WEIGHT_HEADER:
+                try:
+                    used = int(value)
+                except (TypeError, ValueError):
+                    return
+                with self._lock:
+                    self._roll(self.clock())
+                    # Заголовок учитывает и чужие запросы с того же IP
+                    self.used = max(self.used, used)
+                return
+    
+    def on_rate_limited(self, headers=None):
+        """Биржа ответила 429/418: не отправляем запросы до Retry-After"""
+        retry_after = config.EXCHANGE_BAN_DEFAULT
+        for name, value in (headers or {}).items():
+            if name.lower() == 'retry-after':
+                try:
+                    retry_after = int(value)
+                except (TypeError, ValueError):
+                    pass
+        with self._lock:
+            self.banned_until = max(self.banned_until, self.clock() + retry_after)
+            self.stats['bans'] += 1
+        logger.error(f"Exchange rate limit hit, pausing requests for {retry_after}s")
+    
+    def snapshot(self):
+        """Текущее состояние для логов и мониторинга"""
+        with self._lock:
+            self._roll(self.clock())
+            return {'used': self.used, 'limit': self.limit, **self.stats}
+
+class BudgetedExchange:
+    """Прокси биржи ccxt (sync или async), пропускающий запросы через WeightBudget"""
+    
+    def __init__(self, exchange, budget):
+        self._exchange = exchange
+        self._budget = budget
+    
+    def _headers(self):
+        return getattr(self._exchange, 'last_response_headers', None)
+    
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if not callable(attr) or request_weight(name) is None:
+            return attr
+        budget = self._budget
+        
+        if asyncio.iscoroutinefunction(attr):
+            async def budgeted_async(*args, **kwargs):
+                weight = request_weight(name, args, kwargs)
+                while (wait := budget.reserve(weight)) > 0:
+                    logger.info(f"Weight budget: waiting {wait:.1f}s for the next window ({name})")
+                    await asyncio.sleep(wait)
+                try:
+                    return await attr(*args, **kwargs)
+                except (ccxt.DDoSProtection, ccxt.RateLimitExceeded) as e:
+                    budget.on_rate_limited(self._headers())
+                    raise BudgetExceeded(str(e)) from e
+                finally:
+                    budget.observe(self._headers())
+            return budgeted_async
+        
+        def budgeted(*args, **kwargs):
+            weight = request_weight(name, args, kwargs)
+            while (wait := budget.reserve(weight)) > 0:
+                logger.info(f"Weight budget: waiting {wait:.1f}s for the next window ({name})")
+                time.sleep(wait)
+            try:
+                return attr(*args, **kwargs)
+            except (ccxt.DDoSProtection, ccxt.RateLimitExceeded) as e:
+                budget.on_rate_limited(self._headers())
+                raise BudgetExceeded(str(e)) from e
+            finally:
+                budget.observe(self._headers())
+        return budgeted
@@ -0,0 +1,105 @@
+"""
+Объединение одинаковых запросов (single-flight) и короткий кэш результатов
+Одновременные вызовы с одним ключом ждут один и тот же запрос,
+а результат переиспользуется в пределах окна свежести
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class RequestCoalescer:
+    """Single-flight + кэш результатов с TTL по ключу"""
+    
+    def __init__(self, ttl=0, clock=time.monotonic, cache=True, priority=None):
+        self.ttl = ttl  # TTL по умолчанию (секунды); 0 - только объединение in-flight
+        self.clock = clock  # Часы окна свежести (при воспроизведении - время записи)
+        # False - только single-flight при любом ttl (результаты хранятся лишь для peek)
+        self.cache = cache
+        # Приоритет вызывающего (меньше - важнее): общий запрос выполняется в
+        # контексте создавшего его вызова, поэтому более важный вызов не
+        # присоединяется к запросу менее важного, а запускает свой
+        self.priority = priority
+        self._results = {}  # key -> (clock(), value)
+        self._inflight = {}  # key -> (asyncio.Task, приоритет)
+        self.stats = {'hits': 0, 'shared': 0, 'misses': 0}
+    
+    def _cached(self, key, ttl):
+        """Возвращает (найдено, значение) из кэша если оно моложе ttl"""
+        entry = self._results.get(key)
+        if self.cache and entry is not None and self.clock() - entry[0] < ttl:
+            self.stats['hits'] += 1
+            return True, entry[1]
+        return False, None
+    
+    def _store(self, key, value):
+        # Ошибки (None) не кэшируем - следующий вызов повторит запрос
+        if value is not None:
+            self._results[key] = (self.clock(), value)
+    
+    def get(self, key, fetch, ttl=None):
+        """
+        Синхронный вариант: значение из кэша или fetch()
+        
+        Args:
+            key: ключ запроса (hashable)
+            fetch: функция без аргументов, выполняющая запрос
+            ttl: окно свежести (секунды), по умолчанию self.ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        found, value = self._cached(key, ttl)
+        if found:
+            return value
+        
+        self.stats['misses'] += 1
+        value = fetch()
+        self._store(key, value)
+        return value
+    
+    async def get_async(self, key, fetch, ttl=None):
+        """
+        Асинхронный вариант: кэш, уже выполняющийся запрос или новый запрос
+        
+        Args:
+            key: ключ запроса (hashable)
+            fetch: корутинная функция без аргументов
+            ttl: окно свежести (секунды), по умолчанию self.ttl
+        
+        Отмена одного ожидающего (например, по таймауту) не отменяет
+        общий запрос для остальных.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        found, value = self._cached(key, ttl)
+        if found:
+            return value
+        
+        priority = self.priority() if self.priority is not None else 0
+        task, task_priority = self._inflight.get(key, (None, None))
+        if task is not None and task_priority <= priority:
+            self.stats['shared'] += 1
+        else:
+            self.stats['misses'] += 1
+            task = asyncio.create_task(fetch())
+            self._inflight[key] = (task, priority)
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+        
+        return await asyncio.shield(task)
+    
+    def _on_done(self, key, task):
+        if self._inflight.get(key, (None,))[0] is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+    
+    def peek(self, key):
+        """Последний успешный результат по ключу независимо от TTL (или None)"""
+        entry = self._results.get(key)
+        return None if entry is None else entry[1]
+    
+    def invalidate(self, key=None):
+        """Сбрасывает кэш (весь или по ключу)"""
+        if key is None:
+            self._results.clear()
+        else:
+            self._results.pop(key, None)
@@ -0,0 +1,267 @@
+"""
+Скользящий перцентильный ранг (объём, ATR, спред)
+Окно хранится как блочный отсортированный массив: вставка и вытеснение
+старейшего значения - O(sqrt n) (бинарный поиск блока и позиции, сдвиг
+внутри блока), ранг - O(log n) (бинарный поиск и дерево Фенвика по длинам
+блоков), без пересортировки окна на каждом цикле.
+Состояние ведётся по ряду (symbol, timeframe) между циклами, поэтому окно
+может быть длиннее загружаемой истории (например, 1440 1m свечей)
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import config
+from candles import timestamps_ms
+from indicator_engine import RollingWindow
+
+ATR_PERIOD = 14
+
+class SortedWindow:
+    """
+    Последние capacity значений в порядке сортировки
+    
+    Блоки по ~sqrt(capacity) элементов. push/replace_last - O(sqrt n):
+    поиск блока и позиции - O(log n), но сдвиг внутри блока
+    (list.insert/del) - O(sqrt n) с малой константой. rank - O(log n):
+    число значений в блоках левее найденного берётся из дерева Фенвика по
+    длинам блоков (перестраивается только при делении или удалении блока).
+    """
+    
+    def __init__(self, capacity, block_size=None):
+        self.capacity = capacity
+        self.block_size = block_size or max(16, int(capacity ** 0.5))
+        self._fifo = deque()
+        self._blocks = []
+        self._maxes = []  # Максимум каждого блока - для поиска блока
+        self._tree = [0]  # Дерево Фенвика по длинам блоков (с индекса 1)
+    
+    def __len__(self):
+        return len(self._fifo)
+    
+    def push(self, x):
+        """Добавляет значение, вытесняя самое старое при полном окне"""
+        x = float(x)
+        self._fifo.append(x)
+        self._insert(x)
+        if len(self._fifo) > self.capacity:
+            self._remove(self._fifo.popleft())
+    
+    def replace_last(self, x):
+        """Заменяет последнее добавленное значение (уточнение текущего бара)"""
+        if not self._fifo:
+            self.push(x)
+            return
+        self._remove(self._fifo.pop())
+        x = float(x)
+        self._fifo.append(x)
+        self._insert(x)
+    
+    def _insert(self, x):
+        if not self._blocks:
+            self._blocks.append([x])
+            self._maxes.append(x)
+            self._rebuild()
+            return
+        i = min(bisect_left(self._maxes, x), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, x)
+        self._maxes[i] = block[-1]
+        if len(block) > 2 * self.block_size:
+            # Делим переполненный блок пополам
+            half = len(block) // 2
+            self._blocks.insert(i + 1, block[half:])
+            del block[half:]
+            self._maxes[i] = block[-1]
+            self._maxes.insert(i + 1, self._blocks[i + 1][-1])
+            self._rebuild()
+        else:
+            self._add(i, 1)
+    
+    def _remove(self, x):
+        i = bisect_left(self._maxes, x)
+        block = self._blocks[i]
+        del block[bisect_left(block, x)]
+        if block:
+            self._maxes[i] = block[-1]
+            self._add(i, -1)
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+            self._rebuild()
+    
+    def _rebuild(self):
+        """Строит дерево Фенвика по длинам блоков за O(число блоков)"""
+        tree = [0] + [len(b) for b in self._blocks]
+        for i in range(1, len(tree)):
+            j = i + (i & -i)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self._tree = tree
+    
+    def _add(self, i, delta):
+        """Длина блока i изменилась на delta"""
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+    
+    def _prefix(self, i):
+        """Сколько значений в первых i блоках"""
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+    
+    def _count(self, x, right):
+        """Сколько значений < x (right=False) или <= x (right=True)"""
+        search = bisect_right if right else bisect_left
+        i = search(self._maxes, x)
+        count = self._prefix(i)
+        if i < len(self._blocks):
+            count += search(self._blocks[i], x)
+        return count
+    
+    def rank(self, x):
+        """
+        Перцентильный ранг x в окне (0..1): доля значений ниже x,
+        совпадающие значения - наполовину
+        """
+        n = len(self._fifo)
+        if n == 0:
+            return 0.5
+        below = self._count(x, right=False)
+        equal = self._count(x, right=True) - below
+        return (below + 0.5 * equal) / n
+    
+    def values(self):
+        """Значения окна по возрастанию"""
+        return [v for block in self._blocks for v in block]
+
+class SeriesRanks:
+    """Окна объёма и ATR закрытых свечей одного ряда"""
+    
+    def __init__(self, window=None):
+        window = window or config.RANK_WINDOW
+        self.volume = SortedWindow(window)
+        self.atr = SortedWindow(window)
+        self.spread = SortedWindow(window)
+        self.true_range = RollingWindow(ATR_PERIOD)
+        self.prev_close = None
+        self.last_ts = None
+        self.spread_ts = None
+    
+    def update(self, ts, high, low, close, volume):
+        """Вливает закрытые свечи (время в мс по возрастанию), которых ещё не было"""
+        start = 0 if self.last_ts is None else int(np.searchsorted(ts, self.last_ts, side='right'))
+        if start >= len(ts):
+            return
+        for h, l, c, v in zip(high[start:].tolist(), low[start:].tolist(), close[start:].tolist(), volume[start:].tolist()):
+            if self.prev_close is None:
+                tr = h - l
+            else:
+                tr = max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+            self.true_range.push(tr)
+            self.prev_close = c
+            self.volume.push(v)
+            if self.true_range.ready:
+                self.atr.push(self.true_range.mean)
+        self.last_ts = int(ts[-1])
+    
+    def observe_spread(self, ts, spread):
+        """Один замер спреда на бар: повторные замеры в том же баре уточняют его"""
+        if ts == self.spread_ts:
+            self.spread.replace_last(spread)
+        else:
+            self.spread.push(spread)
+            self.spread_ts = ts
+
+def _rank(window, value, exclude_last=False):
+    """Ранг с нейтральным 0.5 при нехватке истории или отсутствии значения"""
+    samples = len(window) - (1 if exclude_last else 0)
+    if value is None or not np.isfinite(value) or samples < config.RANK_MIN_SAMPLES:
+        return 0.5
+    return window.rank(value)
+
+class RankRegistry:
+    """Состояние рангов по рядам (id ряда из df.attrs['series_id'])"""
+    
+    def __init__(self, max_series=None):
+        self.max_series = max_series or config.RANK_MAX_SERIES
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def ranks(self, df, atr=None, spread=None):
+        """
+        Ранги текущего бара: объём и ATR против закрытых свечей окна,
+        спред - против замеров предыдущих баров
+        
+        Args:
+            df: DataFrame или Candles; последняя строка - текущий бар
+        
+        Returns:
+            dict: volume_rank, atr_rank, spread_rank (0..1, 0.5 - нет данных)
+        """
+        series_id = df.attrs.get('series_id')
+        with self._lock:
+            if series_id is None:
+                # Ряд не идентифицирован - окно только из переданной истории
+                tracker = SeriesRanks()
+            else:
+                tracker = self._series.get(series_id)
+                if tracker is None:
+                    tracker = self._series[series_id] = SeriesRanks()
+                    while len(self._series) > self.max_series:
+                        self._series.popitem(last=False)
+                self._series.move_to_end(series_id)
+            
+            # Окну нужны window свечей плюс прогрев ATR - остальная история не влияет
+            keep = tracker.volume.capacity + ATR_PERIOD + 1
+            ts = timestamps_ms(np.asarray(df['timestamp'])[-keep:])
+            high, low, close, volume = (np.asarray(df[c])[-keep:] for c in ('high', 'low', 'close', 'volume'))
+            tracker.update(ts[:-1], high[:-1], low[:-1], close[:-1], volume[:-1])
+            result = {
+                'volume_rank': _rank(tracker.volume, float(volume[-1])),
+                'atr_rank': _rank(tracker.atr, atr),
+                'spread_rank': 0.5
+            }
+            if spread is not None and series_id is not None:
+                ts = int(ts[-1])
+                if tracker.spread_ts == ts:
+                    tracker.spread.replace_last(spread)
+                    result['spread_rank'] = _rank(tracker.spread, spread, exclude_last=True)
+                else:
+                    result['spread_rank'] = _rank(tracker.spread, spread)
+                    tracker.observe_spread(ts, spread)
+            return result
+
+RANKS = RankRegistry()
+
+def rank_series(values, window=None, chunk=4096):
+    """
+    Ранг каждого значения среди window предыдущих (для матрицы признаков)
+    
+    Строка t совпадает с рангом, который RankRegistry дал бы на свече t;
+    NaN (прогрев ATR) в окно не попадают. История известна целиком, поэтому
+    окна сравниваются векторно блоками строк, а не через SortedWindow.
+    """
+    window = window or config.RANK_WINDOW
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), 0.5)
+    finite = np.flatnonzero(np.isfinite(values))
+    x = values[finite]
+    # Строка i - окно x[i - window:i], дополненное слева NaN (сравнения с NaN ложны)
+    windows = sliding_window_view(np.concatenate([np.full(window, np.nan), x[:-1]]), window)
+    ranks = np.full(len(x), 0.5)
+    for start in range(0, len(x), chunk):
+        current = x[start:start + chunk, None]
+        block = windows[start:start + len(current)]
+        below = np.count_nonzero(block < current, axis=1)
+        equal = np.count_nonzero(block == current, axis=1)
+        count = np.minimum(np.arange(start, start + len(current)), window)
+        enough = count >= config.RANK_MIN_SAMPLES
+        ranks[start:start + len(current)][enough] = (below + 0.5 * equal)[enough] / count[enough]
+    out[finite] = ranks
+    return out
@@ -0,0 +1,309 @@
+"""
+Потоковый сбор рыночных данных через Binance WebSocket
+Подписывается на kline, bookTicker, 24hr ticker и depth потоки, держит
+последнее состояние в памяти и переподключается с backoff. Стакан - либо
+partial depth снимки, либо локальный стакан по diff потоку (ORDERBOOK_MODE).
+Дополнительные пары (extra_symbols) получают только kline потоки
+в том же соединении - для мультисимвольного сканирования
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import aiohttp
+import config
+from candle_store import timeframe_to_ms
+from order_book import LocalOrderBook
+
+logger = logging.getLogger(__name__)
+
+class StreamCollector:
+    """WebSocket подписка на рыночные данные пары (и свечи дополнительных пар)"""
+    
+    def __init__(self, candle_store, symbol=None, timeframes=None, url=None, depth_levels=None, extra_symbols=None,
+                 depth_mode=None, snapshot_fetcher=None):
+        self.candle_store = candle_store
+        self.symbol = symbol or config.SYMBOL
+        self.extra_symbols = [s for s in (extra_symbols or []) if s != self.symbol]
+        # BTCUSDT -> BTC/USDT для разбора kline сообщений
+        self._symbols_by_id = {
+            s.replace('/', '').upper(): s for s in [self.symbol] + self.extra_symbols
+        }
+        # Производные таймфреймы досчитываются из базовых - подписка только на базовые
+        self.timeframes = timeframes or list(dict.fromkeys(
+            candle_store.source_timeframe(tf) for tf in (config.TIMEFRAME, config.DAY_TIMEFRAME)
+        ))
+        self.url = url or config.BINANCE_WS_URL
+        self.depth_levels = depth_levels or config.STREAM_DEPTH_LEVELS
+        # 'diff' - локальный стакан из diff потока (бутстрап через snapshot_fetcher),
+        # 'partial' - снимки лучших depth_levels уровней
+        self.depth_mode = depth_mode or config.ORDERBOOK_MODE
+        self.order_book = LocalOrderBook(self.symbol) if self.depth_mode == 'diff' else None
+        self.snapshot_fetcher = snapshot_fetcher  # async () -> ответ fetch_order_book
+        self._resync_task = None
+        self._stale_snapshots = 0  # ✅ НОВОЕ: подряд устаревших снимков (для растущей паузы)
+        
+        # Последнее состояние (в формате, близком к ответам ccxt)
+        self.ticker = None
+        self.orderbook = None
+        self.last_message_at = None  # time.monotonic()
+        
+        self.connected = False
+        self.reconnects = 0
+        self._stopping = False
+        self._task = None
+        self._ws = None
+        self._candle_closed = {}
+    
+    @property
+    def stream_symbol(self):
+        """BTC/USDT -> btcusdt"""
+        return self.symbol.replace('/', '').lower()
+    
+    def stream_url(self):
+        """URL комбинированной подписки на все потоки"""
+        s = self.stream_symbol
+        streams = [f"{s}@kline_{tf}" for tf in self.timeframes]
+        depth = f"{s}@depth@100ms" if self.order_book is not None else f"{s}@depth{self.depth_levels}@100ms"
+        streams += [f"{s}@bookTicker", f"{s}@ticker", depth]
+        for symbol in self.extra_symbols:
+            extra = symbol.replace('/', '').lower()
+            streams += [f"{extra}@kline_{tf}" for tf in self.timeframes]
+        return f"{self.url}/stream?streams={'/'.join(streams)}"
+    
+    async def start(self):
+        """Запускает фоновую задачу подписки"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"Stream collector started: {self.stream_url()}")
+    
+    async def stop(self):
+        """Останавливает подписку и закрывает соединение"""
+        self._stopping = True
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        logger.info("Stream collector stopped")
+    
+    async def run(self):
+        """Цикл подключения с экспоненциальным backoff"""
+        delay = config.STREAM_RECONNECT_MIN
+        async with aiohttp.ClientSession() as session:
+            while not self._stopping:
+                try:
+                    async with session.ws_connect(self.stream_url(), heartbeat=20) as ws:
+                        self._ws = ws
+                        self.connected = True
+                        delay = config.STREAM_RECONNECT_MIN
+                        logger.info("✅ Market data stream connected")
+                        
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self.handle_message(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Market data stream error: {e}")
+                finally:
+                    self.connected = False
+                    self._ws = None
+                
+                if self._stopping:
+                    break
+                
+                self.reconnects += 1
+                sleep_s = delay * (1 + random.uniform(0, 0.25))
+                logger.info(f"Reconnecting market data stream in {sleep_s:.1f}s (attempt {self.reconnects})")
+                await asyncio.sleep(sleep_s)
+                delay = min(delay * 2, config.STREAM_RECONNECT_MAX)
+    
+    def handle_message(self, message):
+        """Разбирает сообщение комбинированного потока и обновляет состояние"""
+        stream = message.get('stream', '')
+        data = message.get('data', {})
+        self.last_message_at = time.monotonic()
+        
+        try:
+            if '@kline_' in stream:
+                self._on_kline(data['k'], self._symbols_by_id.get(data.get('s'), self.symbol))
+            elif stream.endswith('@bookTicker'):
+                self._on_book_ticker(data)
+            elif stream.endswith('@ticker'):
+                self._on_ticker(data)
+            elif '@depth' in stream:
+                if self.order_book is not None:
+                    self._on_depth_diff(data)
+                else:
+                    self._on_depth(data)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.debug(f"Malformed stream message ({stream}): {e}")
+    
+    def _on_kline(self, k, symbol):
+        """Вливает свечу в общее хранилище свечей"""
+        timeframe = k['i']
+        series = self.candle_store.get_series(symbol, timeframe)
+        open_ts = int(k['t'])
+        
+        # Разрыв между историей и потоком (например, после переподключения):
+        # сбрасываем историю, следующий запрос перезагрузит окно через REST
+        last_ts = series.last_timestamp
+        if last_ts is not None and open_ts > last_ts + timeframe_to_ms(timeframe):
+            logger.info(f"Kline gap detected for {symbol} {timeframe}, history will be reloaded")
+            series.reset()
+        
+        series.merge([[open_ts, float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]])
+        
+        if k.get('x') and symbol == self.symbol:
+            self._candle_event(timeframe).set()
+            if timeframe == self.candle_store.base_timeframe:
+                # Закрытие базовой свечи на границе закрывает и производные бары
+                close_ts = open_ts + timeframe_to_ms(timeframe)
+                for derived in self.candle_store.derived_timeframes:
+                    if close_ts % timeframe_to_ms(derived) == 0:
+                        self._candle_event(derived).set()
+    
+    def _on_book_ticker(self, data):
+        """Лучшие bid/ask"""
+        ticker = self.ticker or {}
+        ticker.update({
+            'bid': float(data['b']),
+            'bidVolume': float(data['B']),
+            'ask': float(data['a']),
+            'askVolume': float(data['A'])
+        })
+        self.ticker = ticker
+    
+    def _on_ticker(self, data):
+        """24h статистика и последняя цена"""
+        ticker = self.ticker or {}
+        ticker.update({
+            'last': float(data['c']),
+            'quoteVolume': float(data['q']),
+            'percentage': float(data['P']),
+            'high': float(data['h']),
+            'low': float(data['l'])
+        })
+        self.ticker = ticker
+    
+    def _on_depth(self, data):
+        """Снимок стакана partial depth"""
+        self.orderbook = {
+            'bids': [[float(p), float(q)] for p, q in data['bids']],
+            'asks': [[float(p), float(q)] for p, q in data['asks']]
+        }
+    
+    def _on_depth_diff(self, data):
+        """Diff-обновление локального стакана; при разрыве - пересинхронизация"""
+        if not self.order_book.apply_diff(data):
+            self._schedule_resync()
+    
+    def _schedule_resync(self):
+        if self.snapshot_fetcher is None:
+            return
+        if self._resync_task is None or self._resync_task.done():
+            self._resync_task = asyncio.create_task(self._resync())
+    
+    async def _resync(self):
+        """Загружает REST снимок (события тем временем копятся в стакане)"""
+        try:
+            snapshot = await self.snapshot_fetcher()
+            if self.order_book.apply_snapshot(snapshot):
+                self._stale_snapshots = 0
+                logger.info(f"Order book synced at update {self.order_book.last_update_id} ({len(self.order_book)} levels)")
+            else:
+                # ✅ НОВОЕ: устаревший снимок - тоже пауза, иначе каждое событие
+                # потока запрашивает новый снимок (вес 50). Пауза растёт вдвое
+                # на каждый следующий устаревший снимок подряд.
+                self._stale_snapshots += 1
+                delay = min(config.ORDERBOOK_RESYNC_BACKOFF * 2 ** (self._stale_snapshots - 1),
+                            config.ORDERBOOK_RESYNC_MAX_BACKOFF)
+                logger.info(f"Order book snapshot older than buffered updates, retrying in {delay}s")
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Order book snapshot failed: {e}")
+            # Задача остаётся активной на время паузы - не долбим REST
+            await asyncio.sleep(config.ORDERBOOK_RESYNC_BACKOFF)
+    
+    def get_orderbook(self, levels=None):
+        """
+        Стакан из памяти: лучшие уровни локального стакана или partial снимок
+        
+        Returns:
+            dict или None если стакан ещё не получен
+        """
+        if self.order_book is not None:
+            return self.order_book.top(levels or self.depth_levels) if self.order_book.synced else None
+        return self.orderbook
+    
+    def _candle_event(self, timeframe):
+        if timeframe not in self._candle_closed:
+            self._candle_closed[timeframe] = asyncio.Event()
+        return self._candle_closed[timeframe]
+    
+    async def wait_candle_close(self, timeframe, timeout):
+        """
+        Ждёт закрытия свечи таймфрейма
+        
+        Returns:
+            bool: True если свеча закрылась, False по таймауту
+        """
+        event = self._candle_event(timeframe)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        event.clear()
+        return True
+    
+    def is_fresh(self):
+        """Подключены и получали сообщения недавно"""
+        if not self.connected or self.last_message_at is None:
+            return False
+        return time.monotonic() - self.last_message_at < config.STREAM_STALE_AFTER
+    
+    def get_snapshot(self, timeframe, limit):
+        """
+        Текущее состояние из памяти без сетевых запросов
+        
+        Returns:
+            dict: {'df', 'ticker', 'orderbook'} или None если данных недостаточно
+                  (тогда нужно использовать REST)
+        """
+        if self.ticker is None or 'last' not in self.ticker:
+            return None
+        
+        df = self.get_candles(self.symbol, timeframe, limit)
+        if df is None:
+            return None
+        
+        return {
+            'df': df,
+            'ticker': self.ticker,
+            'orderbook': self.get_orderbook()
+        }
+    
+    def get_candles(self, symbol, timeframe, limit):
+        """
+        Свечи пары из памяти, если поток свежий и истории достаточно
+        
+        Returns:
+            DataFrame или None (тогда нужно догрузить через REST)
+        """
+        if not self.is_fresh():
+            return None
+        return self.candle_store.candles(symbol, timeframe, limit)
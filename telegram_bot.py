@@ -3,6 +3,7 @@ from telegram.ext import Application, CommandHandler, CallbackQueryHandler, Cont
 import config
 import logging
 from database import Database
+from rate_budget import request_priority, PRIORITY_LOW
 from datetime import datetime
 import asyncio
 
@@ -151,8 +152,9 @@ class TelegramBot:
                 async with self.main_bot._mode_lock:
                     mode = self.main_bot.current_mode
                 
-                # Выполняем анализ
-                analysis = await self.main_bot.analyze_market_with_mode(mode)
+                # Выполняем анализ (цикл мониторинга имеет приоритет по бюджету запросов)
+                with request_priority(PRIORITY_LOW):
+                    analysis = await self.main_bot.analyze_market_with_mode(mode)
                 
                 if analysis:
                     market_data = analysis['market_data']
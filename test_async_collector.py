@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест асинхронного параллельного сбора рыночных данных (без сети)"""
+
+import asyncio
+import time
+import config
+from data_collector import DataCollector
+
+DELAY = 0.3
+
+class FakeAsyncExchange:
+    """Имитация ccxt.async_support.binance с задержкой на каждый запрос"""
+    
+    def __init__(self, delay=DELAY):
+        self.delay = delay
+        self.calls = []
+    
+    async def fetch_ohlcv(self, symbol, timeframe='5m', since=None, limit=100):
+        self.calls.append('fetch_ohlcv')
+        await asyncio.sleep(self.delay)
+        base = 1_700_000_000_000
+        return [[base + i * 60_000, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 10.0] for i in range(limit)]
+    
+    async def fetch_ticker(self, symbol):
+        self.calls.append('fetch_ticker')
+        await asyncio.sleep(self.delay)
+        return {'last': 200.0, 'quoteVolume': 1e6, 'percentage': 1.5, 'high': 210.0, 'low': 190.0}
+    
+    async def fetch_order_book(self, symbol, limit=20):
+        self.calls.append('fetch_order_book')
+        await asyncio.sleep(self.delay)
+        return {'bids': [[199.9, 1.0], [199.8, 2.0]], 'asks': [[200.1, 1.5]]}
+    
+    async def close(self):
+        pass
+
+def test_async_market_data():
+    print("Testing async market data collection...")
+    
+    async def run():
+        dc = DataCollector()
+        exchange = FakeAsyncExchange()
+        dc.async_exchange = exchange
+        
+        async def slow_fng():
+            await asyncio.sleep(DELAY)
+            return 42
+        
+        async def slow_oi():
+            await asyncio.sleep(DELAY)
+            return dc._record_open_interest(1000.0)
+        
+        dc.fetch_fear_greed_async = slow_fng
+        dc.fetch_open_interest_async = slow_oi
+        
+        start = time.perf_counter()
+        market_data = await dc.get_market_data_async(timeframe='1m', limit=100)
+        elapsed = time.perf_counter() - start
+        await dc.close()
+        return exchange, market_data, elapsed
+    
+    exchange, market_data, elapsed = asyncio.run(run())
+    
+    assert market_data is not None, "Market data is None"
+    assert market_data['current_price'] == 200.0
+    assert market_data['fear_greed'] == 42
+    assert market_data['open_interest'] == 1000.0
+    assert market_data['stats_24h']['price_change_24h'] == 1.5
+    assert market_data['orderbook']['bid_volume'] == 3.0
+    assert len(market_data['df']) == 100
+    # Тикер запрашивается один раз на цикл
+    assert exchange.calls.count('fetch_ticker') == 1
+    # 5 источников по DELAY: параллельно ≈ DELAY, последовательно ≈ 5 * DELAY
+    assert elapsed < DELAY * 2.5, f"Sources were not fetched concurrently: {elapsed:.2f}s"
+    
+    print(f"  OK: Cycle took {elapsed:.2f}s (sequential would be ~{DELAY * 5:.2f}s)")
+
+def test_async_source_timeout():
+    print("Testing per-source timeout...")
+    
+    async def run():
+        dc = DataCollector()
+        dc.async_exchange = FakeAsyncExchange(delay=0.01)
+        
+        async def hanging_oi():
+            await asyncio.sleep(60)
+        
+        dc.fetch_open_interest_async = hanging_oi
+        
+        async def cached_fng():
+            return 55
+        
+        dc.fetch_fear_greed_async = cached_fng
+        
+        saved = dict(config.SOURCE_TIMEOUTS)
+        config.SOURCE_TIMEOUTS['open_interest'] = 0.2
+        try:
+            start = time.perf_counter()
+            market_data = await dc.get_market_data_async(timeframe='5m', limit=60)
+            elapsed = time.perf_counter() - start
+        finally:
+            config.SOURCE_TIMEOUTS.clear()
+            config.SOURCE_TIMEOUTS.update(saved)
+        return market_data, elapsed
+    
+    market_data, elapsed = asyncio.run(run())
+    
+    assert market_data is not None, "Slow OI must not fail the whole cycle"
+    assert market_data['open_interest'] == 0, "OI should fall back to defaults"
+    assert elapsed < 1.0, f"Timeout not applied: {elapsed:.2f}s"
+    
+    print(f"  OK: Hanging OI source cut off after {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    test_async_market_data()
+    test_async_source_timeout()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест фонового обновления F&G и Open Interest (без сети)"""
+
+import asyncio
+import time
+from aiohttp import web
+import config
+import data_collector as data_collector_module
+from data_collector import DataCollector
+from test_async_collector import FakeAsyncExchange
+
+UPSTREAM_DELAY = 0.5
+
+async def start_slow_sources(calls):
+    """Медленные F&G и OI эндпоинты; F&G обновляется через 1 секунду"""
+    async def fear_greed(request):
+        calls.append('fear_greed')
+        await asyncio.sleep(UPSTREAM_DELAY)
+        return web.json_response({'data': [{
+            'value': str(40 + len(calls)), 'value_classification': 'Fear', 'time_until_update': '1'
+        }]})
+    
+    async def open_interest(request):
+        calls.append('open_interest')
+        await asyncio.sleep(UPSTREAM_DELAY)
+        return web.json_response({'openInterest': '1000.0'})
+    
+    app = web.Application()
+    app.router.add_get('/fng', fear_greed)
+    app.router.add_get('/oi', open_interest)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+def test_background_refresh():
+    print("Testing stale-while-revalidate refresh of F&G and OI...")
+    saved = (config.FEAR_GREED_API, data_collector_module.OPEN_INTEREST_URL,
+             config.FNG_REFRESH_MIN, config.FNG_REFRESH_DELAY, config.COALESCE_TTL['market_data'])
+    
+    async def run():
+        calls = []
+        runner, url = await start_slow_sources(calls)
+        config.FEAR_GREED_API = f"{url}/fng"
+        data_collector_module.OPEN_INTEREST_URL = f"{url}/oi"
+        config.FNG_REFRESH_MIN, config.FNG_REFRESH_DELAY = 0.2, 0.1
+        config.COALESCE_TTL['market_data'] = 0
+        
+        dc = DataCollector()
+        dc.async_exchange = FakeAsyncExchange(delay=0.01)
+        try:
+            await dc.start_background_refresh()
+            first_fng = dc._fng_cache['value']
+            
+            cycle_times = []
+            ages = []
+            for _ in range(8):
+                start = time.perf_counter()
+                market_data = await dc.get_market_data_async(timeframe='1m', limit=100)
+                cycle_times.append(time.perf_counter() - start)
+                ages.append(market_data['data_age'])
+                await asyncio.sleep(0.25)
+            return calls, first_fng, market_data, cycle_times, ages
+        finally:
+            await dc.close()
+            await runner.cleanup()
+    
+    try:
+        calls, first_fng, market_data, cycle_times, ages = asyncio.run(run())
+    finally:
+        (config.FEAR_GREED_API, data_collector_module.OPEN_INTEREST_URL,
+         config.FNG_REFRESH_MIN, config.FNG_REFRESH_DELAY, config.COALESCE_TTL['market_data']) = saved
+    
+    assert first_fng is not None, "Values must be warm before analysis starts"
+    assert max(cycle_times) < UPSTREAM_DELAY / 2, f"Analysis waited on upstreams: {max(cycle_times):.2f}s"
+    assert market_data['open_interest'] == 1000.0
+    assert calls.count('fear_greed') >= 2, "F&G must be refreshed after time_until_update"
+    assert market_data['fear_greed'] != first_fng
+    assert all(age['fear_greed'] is not None and age['open_interest'] is not None for age in ages)
+    assert max(age['open_interest'] for age in ages) > 0.5, "Age must grow between refreshes"
+    
+    print(f"  OK: Slowest cycle {max(cycle_times) * 1000:.0f}ms with {UPSTREAM_DELAY}s upstreams, "
+          f"{calls.count('fear_greed')} F&G refreshes")
+
+if __name__ == "__main__":
+    test_background_refresh()
+    print("\nSUCCESS: All tests passed!")
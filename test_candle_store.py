@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест инкрементального хранилища свечей (без сети)"""
+
+import time
+import numpy as np
+import pandas as pd
+import config
+from candle_store import CandleStore
+from data_collector import DataCollector
+
+TF_MS = 60_000
+START = 1_700_000_000_000
+
+class FakeKlines:
+    """Биржа с детерминированной историей 1m свечей и семантикой since/limit"""
+    
+    def __init__(self, n):
+        self.n = n  # последняя свеча (n-1) ещё формируется
+        self.revision = 0
+        self.requested = 0
+    
+    def candle(self, i):
+        close = 100.0 + i + (0.5 * self.revision if i == self.n - 1 else 0)
+        return [START + i * TF_MS, close - 0.5, close + 1, close - 1, close, 10.0 + i]
+    
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=100):
+        if since is None:
+            first = max(0, self.n - limit)
+        else:
+            first = (since - START) // TF_MS
+        rows = [self.candle(i) for i in range(first, min(self.n, first + limit))]
+        self.requested += len(rows)
+        return rows
+    
+    def now_ms(self):
+        return START + (self.n - 1) * TF_MS + TF_MS // 2
+
+def fetch(store, ex, limit):
+    since, fetch_limit = store.fetch_params('BTC/USDT', '1m', limit, now_ms=ex.now_ms())
+    ohlcv = ex.fetch_ohlcv('BTC/USDT', '1m', since=since, limit=fetch_limit)
+    return store.update('BTC/USDT', '1m', ohlcv, limit, full=since is None)
+
+def test_incremental_fetch():
+    print("Testing incremental candle fetch...")
+    
+    store = CandleStore(max_candles=300)
+    ex = FakeKlines(n=500)
+    limit = 100
+    
+    df = fetch(store, ex, limit)
+    assert len(df) == limit
+    assert ex.requested == limit, "First fetch loads the full window"
+    
+    # Формирующаяся свеча обновилась, новых нет
+    ex.requested = 0
+    ex.revision += 1
+    df = fetch(store, ex, limit)
+    assert ex.requested <= 2, f"Too many candles requested: {ex.requested}"
+    assert df['close'].iloc[-1] == ex.candle(ex.n - 1)[4], "Forming candle not updated in place"
+    
+    # Прошло 600 циклов по одной свече: переполнение буфера и компактизация
+    for _ in range(600):
+        ex.n += 1
+        ex.requested = 0
+        df = fetch(store, ex, limit)
+        assert ex.requested <= 3, f"Too many candles requested: {ex.requested}"
+    
+    expected = np.array([ex.candle(i) for i in range(ex.n - limit, ex.n)])
+    assert len(df) == limit
+    assert np.allclose(df[['open', 'high', 'low', 'close', 'volume']].to_numpy(), expected[:, 1:])
+    assert df['timestamp'].is_monotonic_increasing
+    assert int(df['timestamp'].iloc[-1].timestamp() * 1000) == int(expected[-1, 0])
+    
+    print(f"  OK: Window of {limit} candles kept in sync with ~{ex.requested} candles per cycle")
+
+def test_gap_reload():
+    print("Testing reload after a long gap...")
+    
+    store = CandleStore(max_candles=300)
+    ex = FakeKlines(n=200)
+    fetch(store, ex, 100)
+    
+    ex.n += 500  # Бот был остановлен дольше окна
+    ex.requested = 0
+    df = fetch(store, ex, 100)
+    assert ex.requested == 100, "Gap larger than window must trigger full reload"
+    assert len(store.get_series('BTC/USDT', '1m')) == 100, "Stale history must be dropped"
+    assert df['close'].iloc[0] == ex.candle(ex.n - 100)[4]
+    
+    print("  OK: History replaced after gap")
+
+def test_resample_matches_pandas():
+    print("Testing incremental resampling from 1m...")
+    
+    store = CandleStore(max_candles=1000, derived_timeframes=['5m', '15m', '1h'])
+    ex = FakeKlines(n=700)
+    fetch(store, ex, 600)
+    store.candles('BTC/USDT', '5m', 10)
+    
+    # Новые 1m свечи и обновления формирующейся приходят по одной
+    for _ in range(37):
+        ex.n += 1
+        fetch(store, ex, 600)
+        store.candles('BTC/USDT', '5m', 10)
+        ex.revision += 1
+        fetch(store, ex, 600)
+    
+    base = store.candles('BTC/USDT', '1m', 600).set_index('timestamp')
+    for timeframe, rule in (('5m', '5min'), ('15m', '15min'), ('1h', '1h')):
+        expected = base.resample(rule).agg({
+            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
+        }).iloc[1:]  # первый бар окна неполный
+        n = min(len(expected), len(store.get_series('BTC/USDT', timeframe)))
+        df = store.candles('BTC/USDT', timeframe, n)
+        assert df is not None, timeframe
+        assert np.allclose(df[['open', 'high', 'low', 'close', 'volume']].to_numpy(), expected.tail(n).to_numpy()), timeframe
+        assert (df['timestamp'].to_numpy() == expected.tail(n).index.to_numpy()).all(), timeframe
+    
+    print("  OK: 5m/15m/1h bars match pandas resample of the 1m base")
+
+def test_modes_share_base_series():
+    print("Testing that swing and day modes share one 1m request...")
+    
+    class RecordingExchange(FakeKlines):
+        def __init__(self, n):
+            super().__init__(n)
+            self.timeframes = []
+        
+        def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=100):
+            self.timeframes.append(timeframe)
+            return super().fetch_ohlcv(symbol, timeframe, since, limit)
+    
+    dc = DataCollector()
+    # История заканчивается текущей минутой - хранилище догружает только новые свечи
+    dc.exchange = ex = RecordingExchange(n=(int(time.time() * 1000) - START) // TF_MS + 1)
+    for _ in range(3):
+        swing = dc.get_ohlcv_data(config.TIMEFRAME, 100)
+        day = dc.get_ohlcv_data(config.DAY_TIMEFRAME, config.DAY_LIMIT)
+        ex.n += 1
+    
+    assert set(ex.timeframes) == {config.BASE_TIMEFRAME}, ex.timeframes
+    assert ex.requested < 505 + 20, f"Base history must be fetched incrementally: {ex.requested}"
+    assert len(swing) == 100 and len(day) == config.DAY_LIMIT
+    assert swing['close'].iloc[-1] == day['close'].iloc[-1]
+    
+    print(f"  OK: {len(ex.timeframes)} requests, all {config.BASE_TIMEFRAME}")
+
+if __name__ == "__main__":
+    test_incremental_fetch()
+    test_gap_reload()
+    test_resample_matches_pandas()
+    test_modes_share_base_series()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест компактного контейнера свечей: представления, память, индикаторы"""
+
+import numpy as np
+import pandas as pd
+import config
+from candle_store import CandleStore
+from candles import Candles
+from fake_ohlcv import make_ohlcv
+from indicators import TechnicalIndicators
+
+def test_views_and_memory():
+    print("Testing compact candles views and memory...")
+    ohlcv = make_ohlcv(100_000, seed=11)
+    candles = Candles.from_ohlcv(ohlcv, (config.SYMBOL, '1m'))
+    
+    # Колонки и срезы - представления структурированного массива
+    assert np.shares_memory(candles['close'], candles.data)
+    tail = candles[-500:]
+    assert np.shares_memory(tail['volume'], candles.data) and len(tail) == 500
+    assert tail.attrs['series_id'] == (config.SYMBOL, '1m')
+    assert candles.timestamps[-1] == ohlcv[-1][0]
+    
+    # DataFrame строится только при обращении и совпадает с float32 значениями
+    assert candles._df is None
+    df = candles.df
+    assert candles.df is df and df['close'].dtype == np.float64
+    assert (df['timestamp'] == pd.to_datetime([c[0] for c in ohlcv], unit='ms')).all()
+    assert np.allclose(df['close'], [c[4] for c in ohlcv], rtol=1e-6)
+    
+    frame_bytes = df.memory_usage(deep=True).sum()
+    ratio = frame_bytes / candles.nbytes
+    assert candles.nbytes == 28 * len(ohlcv) and ratio > 1.7, ratio
+    print(f"  OK: {candles.nbytes / 1e6:.1f} MB vs DataFrame {frame_bytes / 1e6:.1f} MB ({ratio:.2f}x)")
+
+def test_indicators_from_candles():
+    print("Testing indicators on compact candles...")
+    store = CandleStore(max_candles=300)
+    df = store.update(config.SYMBOL, '1m', make_ohlcv(300, seed=11), 300, full=True)
+    candles = Candles.from_frame(df, ('COMPACT', '1m'))
+    
+    for mode in ('swing', 'day'):
+        expected = TechnicalIndicators.calculate_all_indicators(df, mode=mode)
+        for backend in ('numpy', 'pandas'):
+            result = TechnicalIndicators.calculate_all_indicators(candles, mode=mode, backend=backend)
+            for key, value in expected.items():
+                if isinstance(value, float):
+                    assert isinstance(result[key], float), (key, type(result[key]))
+                    assert np.isclose(result[key], value, rtol=1e-4), (mode, backend, key, result[key], value)
+                elif key != 'day_trading':
+                    assert result[key] == value, (mode, backend, key)
+    print("  OK")
+
+if __name__ == "__main__":
+    test_views_and_memory()
+    test_indicators_from_candles()
+    print("\nSUCCESS: All tests passed!")
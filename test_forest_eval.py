@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест FlatForest: побитовое совпадение с sklearn и выбор бэкенда в load_model"""
+
+import os
+import tempfile
+import numpy as np
+import joblib
+from sklearn.preprocessing import StandardScaler
+import config
+from forest_eval import FlatForest
+from ml_model import MLPredictor, default_model
+
+def make_data(n=3000, features=18, seed=7):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 0.5, n) > 0).astype(int) + (X[:, 3] > 1.5)
+    return X, y
+
+def test_bit_identical():
+    print("Testing flat forest against sklearn predict_proba...")
+    X, y = make_data()
+    X_nan = X.copy()
+    X_nan[::50, 4] = np.nan
+    model = default_model(n_estimators=30, n_jobs=1).fit(X_nan, y)
+    flat = FlatForest.from_sklearn(model)
+    
+    for rows in (X[:1], X[:17], X_nan[:200], np.float32(X[:100]) * 1.0001):
+        assert np.array_equal(flat.predict_proba(rows), model.predict_proba(rows))
+        assert np.array_equal(flat.predict(rows), model.predict(rows))
+    # Большой блок уходит в исходный лес
+    assert np.array_equal(flat.predict_proba(X), model.predict_proba(X))
+    print(f"  OK: {len(model.estimators_)} trees, depth {flat.max_depth}")
+
+def test_load_model_backend():
+    print("Testing MLPredictor.load_model backend selection...")
+    X, y = make_data()
+    scaler = StandardScaler().fit(X)
+    model = default_model(n_estimators=20, n_jobs=1).fit(scaler.transform(X), y)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        predictor = MLPredictor()
+        predictor.model_path = os.path.join(tmp, 'model.pkl')
+        predictor.scaler_path = os.path.join(tmp, 'scaler.pkl')
+        predictor.model, predictor.scaler = model, scaler
+        predictor.save_model()
+        
+        results = {}
+        for backend in ('sklearn', 'flat'):
+            predictor.load_model(backend=backend)
+            results[backend] = predictor.predict_batch(X[:config.FLAT_FOREST_MAX_ROWS], 'swing')
+        assert isinstance(predictor.model, FlatForest)
+        for key in ('probability', 'prediction', 'signal'):
+            assert np.array_equal(results['flat'][key], results['sklearn'][key]), key
+        
+        # На диск сохраняется исходный лес, а не плоское представление
+        predictor.save_model()
+        assert type(joblib.load(predictor.model_path)).__name__ == 'RandomForestClassifier'
+    print("  OK")
+
+if __name__ == "__main__":
+    test_bit_identical()
+    test_load_model_backend()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест потокового расчёта индикаторов против батч-расчёта"""
+
+import math
+import time
+import numpy as np
+import pandas as pd
+from indicators import TechnicalIndicators
+from indicator_engine import StreamingIndicators, RollingWindow
+
+KEYS = ['bb_upper', 'bb_middle', 'bb_lower', 'bb_position', 'ema_50', 'ema_200',
+        'volume_ratio', 'is_high_volume', 'momentum', 'atr', 'vwap']
+
+def make_df(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.002, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.002, n))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='1min'),
+        'open': open_, 'high': high, 'low': low, 'close': close,
+        'volume': rng.uniform(1, 100, n)
+    })
+
+def assert_close(actual, expected, key):
+    if isinstance(expected, (str, bool, np.bool_)) or expected is None:
+        assert actual == expected, f"{key}: {actual} != {expected}"
+    else:
+        assert math.isclose(actual, float(expected), rel_tol=1e-9, abs_tol=1e-9), f"{key}: {actual} != {expected}"
+
+def test_matches_batch():
+    print("Testing streaming indicators against batch...")
+    df = make_df(400)
+    engine = StreamingIndicators.from_frame(df.iloc[:60])
+    
+    for i in range(60, len(df)):
+        row = df.iloc[i]
+        engine.update(row['open'], row['high'], row['low'], row['close'], row['volume'])
+        if i % 37 == 0 or i == len(df) - 1:
+            batch = TechnicalIndicators.calculate_all_indicators(df.iloc[:i + 1])
+            streamed = engine.snapshot()
+            for key in KEYS:
+                assert_close(streamed[key], batch[key], key)
+    assert engine.snapshot()['ema_200'] is not None
+    print(f"  OK: {engine.count} candles match batch indicators")
+
+def test_rolling_window_drift():
+    print("Testing rolling window over many updates...")
+    rng = np.random.default_rng(1)
+    values = 60000 + rng.normal(0, 50, 50_000)
+    window = RollingWindow(20)
+    
+    start = time.perf_counter()
+    for v in values:
+        window.push(float(v))
+    per_update = (time.perf_counter() - start) / len(values)
+    
+    expected = pd.Series(values[-20:])
+    assert math.isclose(window.mean, expected.mean(), rel_tol=1e-12)
+    assert math.isclose(window.std, expected.std(), rel_tol=1e-6)
+    print(f"  OK: {per_update * 1e6:.2f}us per update, no drift after {len(values)} updates")
+
+if __name__ == "__main__":
+    test_matches_batch()
+    test_rolling_window_drift()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест графа индикаторов: общие промежуточные и кэш по последней свече"""
+
+import numpy as np
+import config
+import indicator_graph
+from candle_store import CandleStore
+from fake_ohlcv import make_ohlcv
+from indicators import TechnicalIndicators
+
+def test_shared_nodes_and_cache():
+    print("Testing indicator graph cache...")
+    cache = indicator_graph.IndicatorCache(maxsize=4)
+    saved = indicator_graph.CACHE
+    indicator_graph.CACHE = cache
+    try:
+        store = CandleStore(max_candles=300)
+        ohlcv = make_ohlcv(301, seed=3)
+        df = store.update(config.SYMBOL, '1m', ohlcv[:300], 200, full=True)
+        
+        swing = TechnicalIndicators.calculate_all_indicators(df, mode='swing')
+        graph = cache.graph(df)
+        swing_nodes = graph.computed
+        assert cache.hits == 1 and cache.misses == 1
+        
+        # Day режим после swing: общий граф, считаются только новые узлы
+        day = TechnicalIndicators.calculate_all_indicators(df, mode='day')
+        assert cache.graph(df) is graph
+        assert ('mean', 'volume', 20) in graph.values
+        day_nodes = graph.computed - swing_nodes
+        assert 0 < day_nodes < 12, f"Day mode computed {day_nodes} nodes"
+        
+        # /status сразу после цикла - из кэша, без новых вычислений
+        computed = graph.computed
+        again = TechnicalIndicators.calculate_all_indicators(df, mode='day')
+        assert graph.computed == computed
+        assert again['bb_upper'] == day['bb_upper'] == swing['bb_upper']
+        
+        # Результат совпадает с pandas бэкендом
+        expected = TechnicalIndicators.calculate_all_indicators(df, mode='day', backend='pandas')
+        assert np.isclose(again['atr'], expected['atr']) and np.isclose(again['ema_50'], expected['ema_50'])
+        assert again['day_trading']['signals'] == expected['day_trading']['signals']
+        
+        # Формирующаяся свеча изменилась - новый граф
+        forming = list(ohlcv[299])
+        forming[4] *= 1.01
+        forming[5] += 5
+        df2 = store.update(config.SYMBOL, '1m', [forming], 200)
+        assert cache.graph(df2) is not graph
+        
+        # Новая свеча - новый ключ; старые графы вытесняются по LRU
+        df3 = store.update(config.SYMBOL, '1m', ohlcv[300:], 200)
+        fresh = TechnicalIndicators.calculate_all_indicators(df3, mode='swing')
+        expected = TechnicalIndicators.calculate_all_indicators(df3, mode='swing', backend='pandas')
+        assert np.isclose(fresh['vwap'], expected['vwap'])
+        print(f"  OK: swing {swing_nodes} nodes, day +{day_nodes}, hits {cache.hits}, misses {cache.misses}")
+    finally:
+        indicator_graph.CACHE = saved
+
+if __name__ == "__main__":
+    test_shared_nodes_and_cache()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест NumPy бэкенда индикаторов против pandas бэкенда"""
+
+import math
+import numpy as np
+import pandas as pd
+from indicators import TechnicalIndicators
+
+def make_df(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.004, n))
+    volume = rng.uniform(1, 100, n)
+    volume[-1] *= rng.choice([1, 5])  # Иногда всплеск объёма
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='1min'),
+        'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume
+    })
+
+def assert_same(numpy_value, pandas_value, key):
+    if isinstance(pandas_value, dict):
+        for k in pandas_value:
+            assert_same(numpy_value[k], pandas_value[k], f"{key}.{k}")
+    elif isinstance(pandas_value, (str, bool, np.bool_)) or pandas_value is None:
+        assert numpy_value == pandas_value, f"{key}: {numpy_value} != {pandas_value}"
+    else:
+        assert math.isclose(numpy_value, pandas_value, rel_tol=1e-9, abs_tol=1e-9), \
+            f"{key}: {numpy_value} != {pandas_value}"
+
+def test_backends_match():
+    print("Testing numpy backend against pandas backend...")
+    orderbook = {'bids': [[59990.0, 1.0]], 'asks': [[60010.0, 2.0]]}
+    checked = 0
+    for seed, n in enumerate([50, 51, 100, 199, 200, 1000] * 4):
+        df = make_df(n, seed)
+        for mode in ('swing', 'day'):
+            ob = orderbook if seed % 2 else None
+            expected = TechnicalIndicators.calculate_all_indicators(df, ob, mode=mode, backend='pandas')
+            actual = TechnicalIndicators.calculate_all_indicators(df, ob, mode=mode, backend='numpy')
+            assert set(actual) == set(expected), set(actual) ^ set(expected)
+            for key in expected:
+                assert_same(actual[key], expected[key], key)
+            checked += 1
+    print(f"  OK: {checked} frames match")
+
+def encode(key, value):
+    if value is None:
+        return np.nan if key == 'ema_200' else 0  # ma_cross None - нет пересечения
+    if isinstance(value, str):
+        return {'above_upper': 1, 'below_lower': -1, 'bullish': 1, 'bearish': -1, 'up': 1, 'down': -1,
+                'buy': 1, 'sell': -1}.get(value, 0)
+    return value
+
+def test_series_matches_last_values():
+    print("Testing full-series mode against per-row calculation...")
+    df = make_df(400, 99)
+    df.loc[df.index[-120:], 'volume'] *= np.linspace(1, 6, 120)  # Всплески объёма для day сигналов
+    for mode in ('swing', 'day'):
+        features = TechnicalIndicators.calculate_indicator_series(df, mode=mode)
+        assert len(features) == len(df) and (features['timestamp'] == df['timestamp']).all()
+        for t in list(range(49, 400, 23)) + [399]:
+            expected = TechnicalIndicators.calculate_all_indicators(df.iloc[:t + 1], mode=mode, backend='pandas')
+            row = features.iloc[t]
+            flat = {k: v for k, v in expected.items() if k != 'day_trading'}
+            if mode == 'day':
+                day = expected['day_trading']
+                flat.update({f"day_{k}": v for k, v in day.items() if k != 'signals'})
+                flat.update({f"day_{k}": v for k, v in day['signals'].items()})
+            for key, value in flat.items():
+                actual, value = row[key], encode(key, value)
+                if isinstance(value, float) and np.isnan(value):
+                    assert np.isnan(actual), f"{mode} row {t} {key}: {actual}"
+                else:
+                    assert_same(actual, value, f"{mode} row {t} {key}")
+    print(f"  OK: {len(features.columns) - 1} day features per row match")
+
+def test_day_tail_window():
+    print("Testing day indicators on the tail window...")
+    lookback = TechnicalIndicators.day_trading_lookback()
+    for seed in range(5):
+        df = make_df(5000, 200 + seed)
+        full = TechnicalIndicators.calculate_day_trading_indicators(df, tail=False)
+        tail = TechnicalIndicators.calculate_day_trading_indicators(df)
+        assert_same(tail, full, 'day_trading')
+        # Хвост ровно lookback свечей даёт тот же результат
+        assert_same(TechnicalIndicators.calculate_day_trading_indicators(df.iloc[-lookback:], tail=False), full, 'slice')
+    print(f"  OK: {lookback}-candle tail matches the full 5000-candle history")
+
+if __name__ == "__main__":
+    test_backends_match()
+    test_series_matches_last_values()
+    test_day_tail_window()
+    print("\nSUCCESS: All tests passed!")
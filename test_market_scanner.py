@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест мультисимвольного сканера (без сети)"""
+
+import asyncio
+import numpy as np
+from candle_store import timeframe_to_ms
+from data_collector import DataCollector
+from market_scanner import MarketScanner
+
+class FakeScanExchange:
+    """Биржа со многими USDT парами, считает параллельные запросы OHLCV"""
+    
+    def __init__(self, n_symbols):
+        self.symbols = [f"C{i:03d}/USDT" for i in range(n_symbols)] + ['C000/BTC']
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+    
+    async def load_markets(self):
+        return {
+            s: {'symbol': s, 'spot': True, 'active': True, 'quote': s.split('/')[1]}
+            for s in self.symbols
+        }
+    
+    async def fetch_tickers(self, symbols=None):
+        self.calls.append('fetch_tickers')
+        symbols = symbols or self.symbols
+        return {
+            s: {'symbol': s, 'last': 10.0 + i, 'quoteVolume': 5e6 + i * 1e5,
+                'percentage': 1.0, 'high': 11.0 + i, 'low': 9.0 + i}
+            for i, s in enumerate(symbols)
+        }
+    
+    async def fetch_ohlcv(self, symbol, timeframe='5m', since=None, limit=100):
+        self.calls.append('fetch_ohlcv')
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.02)
+        self.active -= 1
+        rng = np.random.default_rng(abs(hash(symbol)) % 1000)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, limit)))
+        base = 1_700_000_000_000
+        tf_ms = timeframe_to_ms(timeframe)
+        return [[base + i * tf_ms, c, c * 1.001, c * 0.999, c, float(rng.uniform(1, 10))]
+                for i, c in enumerate(close)]
+    
+    async def close(self):
+        pass
+
+def test_scan_many_symbols():
+    print("Testing multi-symbol scan...")
+    
+    async def run():
+        dc = DataCollector()
+        exchange = FakeScanExchange(60)
+        dc.async_exchange = exchange
+        
+        async def fng():
+            return 50
+        
+        dc.fetch_fear_greed_async = fng
+        scanner = MarketScanner(data_collector=dc, concurrency=5)
+        symbols = await scanner.discover_symbols(top_n=50)
+        exchange.calls.clear()
+        results = await scanner.scan(mode='swing')
+        await dc.close()
+        return exchange, symbols, results, scanner.last_stats
+    
+    exchange, symbols, results, stats = asyncio.run(run())
+    
+    assert len(symbols) == 50 and all(s.endswith('/USDT') for s in symbols)
+    assert symbols[0] == 'C059/USDT', "Universe must be sorted by 24h volume"
+    assert exchange.calls.count('fetch_tickers') == 1, "Tickers must be fetched in one batch"
+    assert exchange.calls.count('fetch_ohlcv') == 50
+    assert exchange.max_active <= 5, f"Concurrency limit exceeded: {exchange.max_active}"
+    assert len(results) == 50
+    assert {r['signal'] for r in results} <= {'PUMP', 'DUMP', 'NEUTRAL'}
+    assert stats['symbols_per_sec'] > 0
+    
+    print(f"  OK: {stats['analysed']} symbols in {stats['elapsed']:.2f}s ({stats['symbols_per_sec']:.0f} symbols/s)")
+
+if __name__ == "__main__":
+    test_scan_many_symbols()
+    print("\nSUCCESS: All tests passed!")
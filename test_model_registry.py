@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест реестра моделей: версии, схемы признаков, mmap загрузка и горячая замена в MLPredictor"""
+
+import asyncio
+import os
+import tempfile
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+import config
+from feature_schema import FEATURE_SCHEMAS
+from forest_eval import FlatForest
+from ml_model import MLPredictor, default_model
+from model_registry import ModelRegistry
+
+def make_version(seed, mode='swing'):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(1500, len(FEATURE_SCHEMAS[mode])))
+    y = (X[:, 0] + rng.normal(0, 0.5, len(X)) > 0).astype(int) + (X[:, 1] > 1.2)
+    scaler = StandardScaler().fit(X)
+    model = default_model(n_estimators=10, n_jobs=1).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+def meta(mode):
+    schema = FEATURE_SCHEMAS[mode]
+    return {'mode': mode, 'timeframe': '5m', 'features': len(schema), 'schema': schema.to_meta(),
+            'start': '2026-01-01', 'end': '2026-06-01'}
+
+def test_versions_and_mmap():
+    print("Testing registry versions and mmap loading...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        assert registry.latest() is None
+        model, scaler, X = make_version(1)
+        swing = os.path.basename(registry.save(model, scaler, meta('swing')))
+        time.sleep(1.1)
+        day = os.path.basename(registry.save(*make_version(2, 'day')[:2], meta('day')))
+        os.makedirs(os.path.join(tmp, '20990101-000000-swing.tmp'))  # Недописанная версия
+        assert registry.versions() == [swing, day]
+        assert registry.latest('swing') == swing and registry.latest('day') == day
+        
+        version = registry.load(swing, backend='flat')
+        assert version.version == swing and isinstance(version.model, FlatForest)
+        assert isinstance(version.model.value.base, np.memmap) and isinstance(version.scaler.mean_, np.memmap)
+        rows = version.scaler.transform(X[:50])
+        assert np.array_equal(version.model.predict_proba(rows), model.predict_proba(rows))
+        # Лес sklearn не загружается, пока хватает плоских массивов
+        assert version.model._forest is None
+        rows = version.scaler.transform(X[:config.FLAT_FOREST_MAX_ROWS + 1])
+        assert np.array_equal(version.model.predict_proba(rows), model.predict_proba(rows))
+        assert isinstance(version.model.forest, RandomForestClassifier)
+    print("  OK")
+
+def test_schema_check():
+    print("Testing feature schema check at load time...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        model, scaler, _ = make_version(5)
+        changed = meta('swing')
+        changed['schema']['columns'][0] = ['rsi', 'int8']
+        version = os.path.basename(registry.save(model, scaler, changed))
+        try:
+            registry.load(version)
+            raise AssertionError("schema mismatch was not detected")
+        except ValueError as e:
+            assert 'schema' in str(e)
+        
+        # Версия без схемы (до её появления) - по числу признаков; свинг модель как day - отказ
+        legacy = {'mode': 'day', 'features': len(FEATURE_SCHEMAS['swing'])}
+        time.sleep(1.1)
+        version = os.path.basename(registry.save(model, scaler, legacy))
+        try:
+            registry.load(version)
+            raise AssertionError("feature count mismatch was not detected")
+        except ValueError as e:
+            assert 'features' in str(e)
+        
+        predictor = MLPredictor(registry=registry)
+        assert predictor.model_version('swing') is None and predictor.model_version('day') is None
+    print("  OK")
+
+def test_models_per_mode():
+    print("Testing mode-keyed models...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        swing_model, swing_scaler, X_swing = make_version(6)
+        day_model, day_scaler, X_day = make_version(7, 'day')
+        registry.save(swing_model, swing_scaler, meta('swing'))
+        registry.save(day_model, day_scaler, meta('day'))
+        predictor = MLPredictor(registry=registry)
+        
+        for mode, model, scaler, X in (('swing', swing_model, swing_scaler, X_swing), ('day', day_model, day_scaler, X_day)):
+            assert predictor.model_version(mode).meta['mode'] == mode
+            batch = predictor.predict_batch(X[:30], mode, {'is_valid_for_daytrading': np.ones(30)} if mode == 'day' else None)
+            expected = model.predict_proba(scaler.transform(X[:30]))
+            if mode == 'day':
+                expected = expected * 0.7 * 0.8 * 0.6
+            assert np.array_equal(batch['probabilities'], expected), mode
+        
+        # Модель без режима подходит только режиму со своим числом признаков
+        unbound = MLPredictor(registry=ModelRegistry(os.path.join(tmp, 'empty')))
+        unbound.scaler, unbound.model = swing_scaler, swing_model
+        assert unbound.model_version('swing') is not None and unbound.model_version('day') is None
+    print("  OK")
+
+def test_legacy_model_with_partial_registry():
+    print("Testing legacy model alongside a registry version of another mode...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(os.path.join(tmp, 'models'))
+        registry.save(*make_version(9, 'day')[:2], meta('day'))
+        swing_model, swing_scaler, X = make_version(10)
+        model_path, scaler_path = config.MODEL_PATH, config.SCALER_PATH
+        config.MODEL_PATH = os.path.join(tmp, 'btc_model.pkl')
+        config.SCALER_PATH = os.path.join(tmp, 'scaler.pkl')
+        try:
+            joblib.dump(swing_model, config.MODEL_PATH)
+            joblib.dump(swing_scaler, config.SCALER_PATH)
+            predictor = MLPredictor(registry=registry)
+        finally:
+            config.MODEL_PATH, config.SCALER_PATH = model_path, scaler_path
+        
+        # day - из реестра, swing - прежняя модель без режима
+        assert predictor.model_version('day').meta['mode'] == 'day'
+        swing = predictor.model_version('swing')
+        assert swing is not None and swing.version is None
+        batch = predictor.predict_batch(X[:20], 'swing')
+        assert np.array_equal(batch['probabilities'], swing_model.predict_proba(swing_scaler.transform(X[:20])))
+    print("  OK")
+
+def test_hot_swap():
+    print("Testing hot swap of a new model version...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        first, scaler, X = make_version(3)
+        registry.save(first, scaler, meta('swing'))
+        predictor = MLPredictor(registry=registry)
+        old = predictor.models['swing']
+        assert old.version is not None and predictor.model_version('swing') is old
+        
+        async def run():
+            await predictor.start_watching(interval=0.05)
+            await asyncio.sleep(0.2)
+            assert predictor.models['swing'] is old  # Новой версии нет - ничего не меняется
+            time.sleep(1.1)
+            second, scaler2, _ = make_version(4)
+            path = registry.save(second, scaler2, meta('swing'))
+            for _ in range(100):
+                if predictor.models['swing'] is not old:
+                    break
+                await asyncio.sleep(0.05)
+            await predictor.stop_watching()
+            return second, scaler2, os.path.basename(path)
+        
+        second, scaler2, version = asyncio.run(run())
+        assert predictor.models['swing'].version == version and predictor.model_version('day') is None
+        batch = predictor.predict_batch(X[:20], 'swing')
+        assert np.array_equal(batch['probabilities'], second.predict_proba(scaler2.transform(X[:20])))
+        # Прежняя версия продолжает работать у тех, кто держит ссылку
+        assert old.model.predict_proba(old.scaler.transform(X[:1])).shape == (1, 3)
+    print("  OK")
+
+if __name__ == "__main__":
+    test_versions_and_mmap()
+    test_schema_check()
+    test_models_per_mode()
+    test_legacy_model_with_partial_registry()
+    test_hot_swap()
+    print("\nSUCCESS: All tests passed!")
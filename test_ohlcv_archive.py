@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест архива исторических свечей и догрузки истории"""
+
+import asyncio
+import tempfile
+import time
+import numpy as np
+from ohlcv_archive import OHLCVArchive, backfill
+from rate_budget import BudgetedExchange, WeightBudget
+
+START = 1_700_006_400_000  # 2023-11-15 00:00 UTC
+MINUTE = 60_000
+
+def candle(ts):
+    price = 30000 + (ts - START) / MINUTE
+    return [ts, price, price + 5, price - 5, price + 1, 2.0]
+
+class HistoryExchange:
+    """Биржа с непрерывной историей 1m свечей, начиная с START"""
+    
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+    
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=500):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise ConnectionError("network down")
+        await asyncio.sleep(0)
+        first = max(since, START)
+        return [candle(first + i * MINUTE) for i in range(limit)]
+
+def test_backfill_resumes_without_gaps():
+    print("Testing backfill and resume...")
+    
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = OHLCVArchive('BTC/USDT', '1m', tmp)
+            until = START + 3 * 86_400_000 + 17 * MINUTE
+            
+            # Обрыв после 3 страниц: сохранены только полные пачки по порядку
+            exchange = BudgetedExchange(HistoryExchange(fail_after=3), WeightBudget())
+            try:
+                await backfill(exchange, archive, START - 86_400_000, until, concurrency=2, page_limit=1000)
+                raise AssertionError("Expected network error")
+            except ConnectionError:
+                pass
+            assert archive.last_timestamp() == START + 1999 * MINUTE
+            
+            # Продолжение с последней свечи
+            history = HistoryExchange()
+            written = await backfill(BudgetedExchange(history, WeightBudget()), archive,
+                                     START - 86_400_000, until, concurrency=2, page_limit=1000)
+            ts, values = archive.read()
+            assert written == len(ts) - 2000
+            assert len(ts) == (until - START) // MINUTE
+            assert np.all(np.diff(ts) == MINUTE), "Archive must be gapless"
+            assert values[3, -1] == candle(int(ts[-1]))[4]
+            assert archive.days() == ['2023-11-15', '2023-11-16', '2023-11-17', '2023-11-18']
+            
+            # Повторный запуск ничего не запрашивает
+            calls = history.calls
+            assert await backfill(BudgetedExchange(history, WeightBudget()), archive, START, until) == 0
+            assert history.calls == calls
+            
+            df = archive.frame(START + 86_400_000, START + 86_400_000 + 10 * MINUTE)
+            assert len(df) == 10 and list(df.columns) == ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+            print(f"  OK: {len(ts)} candles, resumed after failure, no gaps")
+    
+    asyncio.run(run())
+
+def test_year_read_speed():
+    print("Testing year read speed...")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = OHLCVArchive('BTC/USDT', '1m', tmp)
+        n = 365 * 1440
+        ts = START + np.arange(n, dtype=np.int64) * MINUTE
+        price = 30000 + np.cumsum(np.random.default_rng(0).normal(0, 5, n))
+        archive.write(np.column_stack([ts, price, price + 5, price - 5, price, np.ones(n)]))
+        
+        start = time.perf_counter()
+        read_ts, values = archive.read()
+        elapsed = time.perf_counter() - start
+        assert len(read_ts) == n and np.array_equal(read_ts, ts)
+        assert np.allclose(values[3], price)
+        assert elapsed < 1.0, f"Year read took {elapsed:.2f}s"
+        print(f"  OK: {n} candles in {len(archive.days())} files read in {elapsed * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    test_backfill_resumes_without_gaps()
+    test_year_read_speed()
+    print("\nSUCCESS: All tests passed!")
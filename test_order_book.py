@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест локального стакана по diff потоку"""
+
+import asyncio
+import random
+import config
+from order_book import LocalOrderBook
+from stream_collector import StreamCollector
+from candle_store import CandleStore
+from fake_binance_ws import FakeBinanceStream
+
+def test_diff_updates_match_reference():
+    print("Testing diff updates against a dict order book...")
+    rng = random.Random(7)
+    book = LocalOrderBook(max_levels=10_000)
+    bids = {round(100 - i * 0.1, 1): 1.0 for i in range(50)}
+    asks = {round(100.1 + i * 0.1, 1): 1.0 for i in range(50)}
+    
+    # Событие до снимка буферизуется, устаревшее отбрасывается при снимке
+    assert not book.apply_diff({'U': 5, 'u': 9, 'b': [['99.0', '7']], 'a': []})
+    assert book.apply_snapshot({'bids': [[p, q] for p, q in bids.items()],
+                                'asks': [[p, q] for p, q in asks.items()], 'nonce': 10})
+    
+    update_id = 10
+    for _ in range(300):
+        b = [[str(round(rng.uniform(94, 100), 1)), str(rng.choice([0, 0, 0.5, 2.0]))] for _ in range(8)]
+        a = [[str(round(rng.uniform(100.1, 106), 1)), str(rng.choice([0, 0, 0.5, 2.0]))] for _ in range(8)]
+        for side, updates in ((bids, b), (asks, a)):
+            for p, q in updates:
+                if float(q) == 0:
+                    side.pop(float(p), None)
+                else:
+                    side[float(p)] = float(q)
+        assert book.apply_diff({'U': update_id + 1, 'u': update_id + 3, 'b': b, 'a': a})
+        update_id += 3
+    
+    top = book.top(20)
+    expected_bids = sorted(bids.items(), reverse=True)[:20]
+    expected_asks = sorted(asks.items())[:20]
+    assert [tuple(x) for x in top['bids']] == expected_bids
+    assert [tuple(x) for x in top['asks']] == expected_asks
+    assert book.best_bid == expected_bids[0][0] and book.best_ask == expected_asks[0][0]
+    assert abs(top['bid_volume'] - sum(q for _, q in expected_bids)) < 1e-9
+    
+    # Объём в полосе от mid совпадает с прямым подсчётом
+    mid = (book.best_bid + book.best_ask) / 2
+    bid_band, ask_band = book.depth(1.0)
+    assert abs(bid_band - sum(q for p, q in bids.items() if p >= mid * 0.99)) < 1e-9
+    assert abs(ask_band - sum(q for p, q in asks.items() if p <= mid * 1.01)) < 1e-9
+    
+    # Разрыв последовательности -> стакан требует новый снимок
+    assert not book.apply_diff({'U': update_id + 5, 'u': update_id + 6, 'b': [], 'a': []})
+    assert not book.synced
+    print(f"  OK: {len(book)} levels, spread {book.spread_pct():.4f}%, gap detected")
+
+def test_stream_resync_after_gap():
+    print("Testing stream order book resync...")
+    
+    async def run():
+        server = FakeBinanceStream(ticks_per_candle=5)
+        await server.start()
+        snapshots = []
+        
+        async def fetch_snapshot():
+            snapshots.append(server.update_id)
+            return server.order_book_snapshot(config.ORDERBOOK_SNAPSHOT_LIMIT)
+        
+        stream = StreamCollector(CandleStore(), timeframes=['1m'], url=server.url,
+                                 depth_mode='diff', snapshot_fetcher=fetch_snapshot)
+        
+        async def wait_synced():
+            for _ in range(250):
+                if stream.order_book.synced and stream.order_book.last_update_id == server.update_id:
+                    return
+                await asyncio.sleep(0.02)
+            raise AssertionError("Order book not synced in time")
+        
+        try:
+            await stream.start()
+            await wait_synced()
+            assert stream.get_orderbook()['bids'][0][0] == max(server.book['bids'])
+            
+            # Потерянные события -> разрыв U/u -> новый снимок
+            server.drop_depth_updates = 2
+            await asyncio.sleep(0.1)
+            await wait_synced()
+            assert len(snapshots) >= 2, f"Expected resync, snapshots: {snapshots}"
+            
+            book = stream.get_orderbook(levels=10)
+            assert book['bids'] == [[p, q] for p, q in sorted(server.book['bids'].items(), reverse=True)[:10]]
+            assert book['asks'] == [[p, q] for p, q in sorted(server.book['asks'].items())[:10]]
+            print(f"  OK: Resynced after gap ({len(snapshots)} snapshots, {stream.order_book.resyncs} syncs)")
+        finally:
+            await stream.stop()
+            await server.stop()
+    
+    asyncio.run(run())
+
+def test_stale_snapshot_backoff():
+    print("Testing backoff on stale snapshots...")
+    
+    async def run():
+        fetches = []
+        
+        async def fetch_stale():
+            # Снимок всегда старше накопленных событий
+            fetches.append(len(fetches))
+            return {'bids': [[100.0, 1.0]], 'asks': [[100.1, 1.0]], 'nonce': 1}
+        
+        stream = StreamCollector(CandleStore(), timeframes=['1m'], depth_mode='diff',
+                                 snapshot_fetcher=fetch_stale)
+        update_id = 100
+        for _ in range(50):
+            stream._on_depth_diff({'U': update_id + 1, 'u': update_id + 2, 'b': [], 'a': []})
+            update_id += 2
+            await asyncio.sleep(0.01)
+        
+        assert len(fetches) == 1, f"Expected one snapshot during backoff, got {len(fetches)}"
+        assert stream._stale_snapshots == 1
+        assert not stream._resync_task.done(), "Resync task should stay alive while sleeping"
+        stream._resync_task.cancel()
+        print(f"  OK: {len(fetches)} snapshot for 50 events")
+    
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test_diff_updates_match_reference()
+    test_stream_resync_after_gap()
+    test_stale_snapshot_backoff()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест predict_batch: совпадение с построчным прогнозом и пакетный прогноз сканера"""
+
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+import train_model
+from data_collector import DataCollector
+from indicators import TechnicalIndicators
+from market_scanner import MarketScanner
+from ml_model import MLPredictor, default_model
+from test_market_scanner import FakeScanExchange
+
+def make_frame(n, seed=31):
+    rng = np.random.default_rng(seed)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(1_700_000_000_000 + np.arange(n) * 60_000, unit='ms'),
+        'open': close, 'high': close * 1.002, 'low': close * 0.998, 'close': close,
+        'volume': rng.uniform(1, 100, n)
+    })
+
+def trained_predictor(df, mode):
+    X, y, _ = train_model.build_dataset(df, '1m', mode, horizon=30)
+    predictor = MLPredictor()
+    predictor.scaler = StandardScaler().fit(X)
+    predictor.model = default_model(n_estimators=20).fit(predictor.scaler.transform(X), y)
+    return predictor, X
+
+def two_pass(predictor, row, mode, indicators):
+    """Прежний построчный путь: predict + predict_proba + validate_day_trading_signal"""
+    scaled = predictor.scaler.transform(row.reshape(1, -1))
+    prediction = predictor.model.predict(scaled)[0]
+    probabilities = predictor.model.predict_proba(scaled)[0]
+    if mode == 'day':
+        prediction, probabilities = predictor.validate_day_trading_signal(prediction, probabilities, indicators)
+    return prediction, max(probabilities)
+
+def test_batch_matches_rows():
+    print("Testing predict_batch against per-row prediction...")
+    df = make_frame(3000)
+    for mode in ('swing', 'day'):
+        predictor, X = trained_predictor(df, mode)
+        series = TechnicalIndicators.calculate_indicator_series(df, mode=mode).iloc[-len(X):]
+        conditions = series if mode == 'day' else None
+        batch = predictor.predict_batch(X, mode, conditions, chunk_size=700)
+        
+        for i in range(0, len(X), 97):
+            indicators = {}
+            if mode == 'day':
+                row = series.iloc[i]
+                indicators = {
+                    'is_valid_for_daytrading': bool(row['is_valid_for_daytrading']),
+                    'day_trading': {'is_volatile': bool(row['day_is_volatile']), 'signals': {
+                        'spread_ok': bool(row['day_spread_ok']), 'volume_confirmed': bool(row['day_volume_confirmed'])
+                    }}
+                }
+            prediction, probability = two_pass(predictor, X[i], mode, indicators)
+            assert batch['prediction'][i] == prediction, (mode, i)
+            assert batch['probability'][i] == probability, (mode, i)
+        signals = {str(s): int(c) for s, c in zip(*np.unique(batch['signal'], return_counts=True))}
+        print(f"  OK {mode}: {signals}")
+    
+    start = time.perf_counter()
+    rows = np.repeat(X, 100, axis=0)
+    predictor.predict_batch(rows, 'day', series.iloc[np.repeat(np.arange(len(X)), 100)])
+    print(f"  {len(rows)} rows in {time.perf_counter() - start:.2f}s")
+
+def test_scanner_batches_predictions():
+    print("Testing scanner batch prediction...")
+    predictor, _ = trained_predictor(make_frame(3000), 'swing')
+    calls = []
+    scalar_predict = predictor.predict
+    predictor.predict = lambda *args, **kwargs: calls.append(args) or scalar_predict(*args, **kwargs)
+    
+    async def run():
+        dc = DataCollector()
+        dc.async_exchange = FakeScanExchange(20)
+        
+        async def fng():
+            return 50
+        
+        dc.fetch_fear_greed_async = fng
+        scanner = MarketScanner(data_collector=dc, ml_predictor=predictor, concurrency=5)
+        await scanner.discover_symbols(top_n=20)
+        results = await scanner.scan(mode='swing')
+        await dc.close()
+        return results
+    
+    results = asyncio.run(run())
+    assert len(results) == 20 and not calls
+    assert all(r['signal'] in ('PUMP', 'DUMP', 'NEUTRAL') and '_inputs' not in r for r in results)
+    print("  OK")
+
+if __name__ == "__main__":
+    test_batch_matches_rows()
+    test_scanner_batches_predictions()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест бюджета веса запросов к бирже (без сети)"""
+
+import asyncio
+import ccxt
+import config
+from data_collector import DataCollector
+from rate_budget import (WeightBudget, BudgetedExchange, BudgetExceeded,
+                         request_priority, PRIORITY_HIGH, PRIORITY_LOW)
+
+class FakeClock:
+    def __init__(self, now=1_700_000_090.0):  # 10 секунд до конца минутного окна
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+class FakeWeightedExchange:
+    """Биржа, возвращающая used-weight в заголовках и 429 по требованию"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.server_used = 0
+        self.rate_limited = False
+        self.last_response_headers = None
+    
+    async def fetch_ticker(self, symbol):
+        self.calls += 1
+        if self.rate_limited:
+            self.last_response_headers = {'Retry-After': '120'}
+            raise ccxt.RateLimitExceeded('429 Too Many Requests')
+        self.server_used += 2
+        self.last_response_headers = {'X-MBX-USED-WEIGHT-1M': str(self.server_used)}
+        return {'last': 100.0 + self.calls, 'quoteVolume': 1e6, 'percentage': 0.1, 'high': 110.0, 'low': 90.0}
+    
+    async def close(self):
+        pass
+
+def test_priorities_and_windows():
+    print("Testing weight budget priorities...")
+    clock = FakeClock(1_700_000_098.0)  # Новое окно - через 2с, в пределах EXCHANGE_WEIGHT_MAX_WAIT
+    budget = WeightBudget(limit=100, clock=clock)
+    
+    low = high = 0
+    try:
+        while True:
+            budget.reserve(5, PRIORITY_LOW)
+            low += 5
+    except BudgetExceeded:
+        pass
+    while budget.reserve(5, PRIORITY_HIGH) == 0:
+        high += 5
+    
+    assert low == 100 * config.EXCHANGE_WEIGHT_LOW_PRIORITY
+    assert low + high == 100 * config.EXCHANGE_WEIGHT_SAFETY, "Monitoring loop must be able to use the reserve"
+    
+    # До нового окна дольше EXCHANGE_WEIGHT_MAX_WAIT - отказ (вызывающий отдаст кэш), а не ожидание
+    clock.now -= 10
+    try:
+        budget.reserve(5, PRIORITY_HIGH)
+        raise AssertionError("Monitoring loop must not wait longer than the source timeout")
+    except BudgetExceeded:
+        pass
+    clock.now += 10
+    
+    clock.now += 61
+    assert budget.reserve(5, PRIORITY_LOW) == 0, "New window must reset the budget"
+    
+    budget.observe({'x-mbx-used-weight-1m': '95'})
+    assert budget.used == 95, "Used weight header must be respected"
+    
+    print(f"  OK: user requests capped at {low}, monitoring loop at {low + high} of 100")
+
+def test_rate_limit_and_stale_fallback():
+    print("Testing 429 handling and cached fallback...")
+    saved_ttl = config.COALESCE_TTL['ticker']
+    config.COALESCE_TTL['ticker'] = 0
+    
+    async def run():
+        dc = DataCollector()
+        dc.budget.clock = FakeClock()
+        exchange = FakeWeightedExchange()
+        dc.async_exchange = BudgetedExchange(exchange, dc.budget)
+        
+        first = await dc.fetch_ticker_async()
+        assert dc.budget.used == 2
+        
+        # Бюджет почти исчерпан чужими запросами: пользователь получает кэш,
+        # а запрос к бирже не отправляется
+        dc.budget.observe({'X-MBX-USED-WEIGHT-1M': str(int(dc.budget.limit * 0.7))})
+        calls = exchange.calls
+        with request_priority(PRIORITY_LOW):
+            stale = await dc.fetch_ticker_async()
+        assert stale == first and exchange.calls == calls
+        
+        # Цикл мониторинга ещё проходит
+        fresh = await dc.fetch_ticker_async()
+        assert fresh['last'] != first['last']
+        
+        # Запрос начат из /status: цикл мониторинга не наследует его приоритет LOW
+        async def status():
+            with request_priority(PRIORITY_LOW):
+                return await dc.fetch_ticker_async()
+        
+        calls = exchange.calls
+        user, monitoring = await asyncio.gather(status(), dc.fetch_ticker_async())
+        assert monitoring['last'] != fresh['last'] and exchange.calls == calls + 1
+        assert user['last'] in (fresh['last'], monitoring['last'])  # Пользователю - кэш
+        fresh = monitoring
+        
+        # 429: биржа больше не опрашивается до Retry-After, отдаётся кэш
+        exchange.rate_limited = True
+        limited = await dc.fetch_ticker_async()
+        calls = exchange.calls
+        again = await dc.fetch_ticker_async()
+        assert limited == fresh and again == fresh
+        assert exchange.calls == calls, "Requests must pause after 429"
+        assert dc.budget.banned_until - dc.budget.clock() > 100
+        await dc.close()
+    
+    try:
+        asyncio.run(run())
+    finally:
+        config.COALESCE_TTL['ticker'] = saved_ttl
+    
+    print("  OK: Cached ticker served under budget pressure and after 429")
+
+if __name__ == "__main__":
+    test_priorities_and_windows()
+    test_rate_limit_and_stale_fallback()
+    print("\nSUCCESS: All tests passed!")
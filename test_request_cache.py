@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест объединения одинаковых запросов к бирже (без сети)"""
+
+import asyncio
+from data_collector import DataCollector
+from request_cache import RequestCoalescer
+from test_async_collector import FakeAsyncExchange
+
+class FakeSyncExchange:
+    def __init__(self):
+        self.calls = []
+    
+    def fetch_ticker(self, symbol):
+        self.calls.append('fetch_ticker')
+        return {'last': 200.0, 'quoteVolume': 1e6, 'percentage': 1.5, 'high': 210.0, 'low': 190.0}
+
+def test_concurrent_callers_share_requests():
+    print("Testing request coalescing for concurrent callers...")
+    
+    async def run():
+        dc = DataCollector()
+        exchange = FakeAsyncExchange(delay=0.1)
+        dc.async_exchange = exchange
+        oi_calls = []
+        
+        async def fng():
+            return 50
+        
+        async def oi():
+            oi_calls.append(1)
+            await asyncio.sleep(0.1)
+            return dc._record_open_interest(1000.0)
+        
+        dc.fetch_fear_greed_async = fng
+        dc.fetch_open_interest_async = oi
+        
+        # Цикл мониторинга + 20 пользователей нажали /status одновременно
+        results = await asyncio.gather(*[dc.get_market_data_async('1m', 100) for _ in range(21)])
+        # Повторный /status внутри окна свежести
+        again = await dc.get_market_data_async('1m', 100)
+        await dc.close()
+        return exchange, oi_calls, results, again
+    
+    exchange, oi_calls, results, again = asyncio.run(run())
+    
+    assert all(r is results[0] for r in results), "Callers must share one snapshot"
+    assert again is results[0], "Snapshot must be reused within the freshness window"
+    assert exchange.calls.count('fetch_ticker') == 1, exchange.calls
+    assert exchange.calls.count('fetch_ohlcv') == 1, exchange.calls
+    assert exchange.calls.count('fetch_order_book') == 1, exchange.calls
+    assert len(oi_calls) == 1
+    
+    print(f"  OK: 22 callers -> {len(exchange.calls)} exchange calls")
+
+def test_ticker_fetched_once_sync():
+    print("Testing sync price + 24h stats share one ticker...")
+    
+    dc = DataCollector()
+    dc.exchange = FakeSyncExchange()
+    current = dc.get_current_price()
+    stats = dc.get_24h_stats()
+    
+    assert current['price'] == 200.0
+    assert stats['price_change_24h'] == 1.5
+    assert dc.exchange.calls == ['fetch_ticker'], dc.exchange.calls
+    
+    print("  OK: One fetch_ticker per cycle")
+
+def test_cache_disabled():
+    print("Testing coalescer without TTL cache (replay mode)...")
+    
+    coalescer = RequestCoalescer(ttl=60, cache=False)
+    calls = []
+    for _ in range(3):
+        coalescer.get('key', lambda: calls.append(1) or len(calls))
+    assert len(calls) == 3 and coalescer.peek('key') == 3
+    
+    print("  OK: Every call fetches, last result kept for peek")
+
+if __name__ == "__main__":
+    test_concurrent_callers_share_requests()
+    test_ticker_fetched_once_sync()
+    test_cache_disabled()
+    print("\nSUCCESS: All tests passed!")
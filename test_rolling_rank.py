@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест скользящего перцентильного ранга: окно, состояние по ряду, совпадение с рядом признаков"""
+
+import numpy as np
+import pandas as pd
+import config
+from candle_store import CandleStore
+from fake_ohlcv import make_ohlcv
+from rolling_rank import RankRegistry, SortedWindow, rank_series
+
+def brute_rank(window, x):
+    window = np.asarray(window)
+    return ((window < x).sum() + 0.5 * (window == x).sum()) / len(window)
+
+def test_sorted_window():
+    print("Testing sorted window against brute force...")
+    rng = np.random.default_rng(1)
+    # Маленькие блоки - проверяются деление и удаление пустых блоков
+    window = SortedWindow(100, block_size=4)
+    history = []
+    for value in rng.integers(0, 30, 2000).astype(float):
+        window.push(value)
+        history = (history + [value])[-100:]
+        probe = float(rng.integers(-1, 32))
+        assert window.rank(probe) == brute_rank(history, probe)
+    assert window.values() == sorted(history)
+    
+    # Дерево Фенвика совпадает с длинами блоков после делений и удалений
+    sizes = [len(b) for b in window._blocks]
+    assert [window._prefix(i) for i in range(len(sizes) + 1)] == [sum(sizes[:i]) for i in range(len(sizes) + 1)]
+    
+    window.replace_last(1000.0)
+    assert window.values() == sorted(history[:-1] + [1000.0])
+    assert window.rank(1000.0) == brute_rank(history[:-1] + [1000.0], 1000.0)
+    print(f"  OK: {len(window)} values in {len(window._blocks)} blocks")
+
+def test_series_state():
+    print("Testing rank state across cycles...")
+    registry = RankRegistry()
+    store = CandleStore(max_candles=200)
+    ohlcv = make_ohlcv(600, seed=5)
+    
+    # Окно рангов копит свечи между циклами - длиннее загружаемых 100
+    for end in range(100, 601, 50):
+        df = store.update(config.SYMBOL, '1m', ohlcv[:end], 100, full=end == 100)
+        registry.ranks(df)
+    tracker = registry._series[(config.SYMBOL, '1m')]
+    assert len(tracker.volume) == 599, len(tracker.volume)
+    
+    # Всплеск объёма на формирующейся свече - максимальный ранг, хотя
+    # повторный вызов в том же цикле ничего не добавляет в окно
+    spike = list(ohlcv[-1])
+    spike[5] = 1000.0
+    df = store.update(config.SYMBOL, '1m', [spike], 100)
+    assert registry.ranks(df)['volume_rank'] == 1.0
+    assert registry.ranks(df)['volume_rank'] == 1.0 and len(tracker.volume) == 599
+    
+    # Спред: один замер на бар, повторный в том же баре заменяет его
+    for i in range(config.RANK_MIN_SAMPLES):
+        bar = pd.DataFrame({'timestamp': [i, i + 1], 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0})
+        bar.attrs['series_id'] = ('SPREAD', '1m')
+        registry.ranks(bar, spread=0.01 + i * 0.001)
+        registry.ranks(bar, spread=0.01 + i * 0.001)
+    assert len(registry._series[('SPREAD', '1m')].spread) == config.RANK_MIN_SAMPLES
+    bar['timestamp'] += 1
+    assert registry.ranks(bar, spread=1.0)['spread_rank'] == 1.0
+    print("  OK")
+
+def test_rank_series_matches_registry():
+    print("Testing rank series against per-candle ranks...")
+    ohlcv = np.array(make_ohlcv(400, seed=9))
+    volume = ohlcv[:, 5]
+    series = rank_series(volume, window=120)
+    window = SortedWindow(120)
+    for t, value in enumerate(volume):
+        expected = window.rank(value) if len(window) >= config.RANK_MIN_SAMPLES else 0.5
+        assert series[t] == expected
+        window.push(value)
+    print("  OK")
+
+if __name__ == "__main__":
+    test_sorted_window()
+    test_series_state()
+    test_rank_series_matches_registry()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест WebSocket потока рыночных данных на локальном фейковом сервере"""
+
+import asyncio
+import config
+from data_collector import DataCollector
+from fake_binance_ws import FakeBinanceStream
+
+class NoNetworkExchange:
+    """Асинхронная биржа, отдающая историю фейкового сервера"""
+    
+    def __init__(self, server):
+        self.server = server
+        self.calls = []
+    
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=100):
+        self.calls.append('fetch_ohlcv')
+        return self.server.history(timeframe, limit)
+    
+    async def fetch_ticker(self, symbol):
+        self.calls.append('fetch_ticker')
+        raise AssertionError("Ticker must be served from the stream")
+    
+    async def fetch_order_book(self, symbol, limit=20):
+        # Только снимок для бутстрапа локального стакана
+        self.calls.append('fetch_order_book')
+        return self.server.order_book_snapshot(limit)
+    
+    async def close(self):
+        pass
+
+async def wait_until(predicate, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.02)
+
+def test_stream_market_data():
+    print("Testing stream market data...")
+    
+    async def run():
+        server = FakeBinanceStream(ticks_per_candle=5)
+        server.seed_history('1m', 150)
+        await server.start()
+        
+        saved = (config.BINANCE_WS_URL, config.STREAM_RECONNECT_MIN)
+        config.BINANCE_WS_URL = server.url
+        config.STREAM_RECONNECT_MIN = 0.05
+        dc = DataCollector()
+        exchange = NoNetworkExchange(server)
+        dc.async_exchange = exchange
+        
+        async def fng():
+            return 50
+        
+        async def oi():
+            return dc._record_open_interest(1000.0)
+        
+        dc.fetch_fear_greed_async = fng
+        dc.fetch_open_interest_async = oi
+        
+        try:
+            await dc.start_stream(timeframes=['1m'])
+            await wait_until(lambda: dc.stream.is_fresh() and dc.stream.ticker and 'last' in dc.stream.ticker)
+            await wait_until(lambda: dc.stream.order_book.synced)
+            
+            # Бутстрап истории через REST, дальше только поток
+            dc.candle_store.update(config.SYMBOL, '1m', server.history('1m', 100), 100, full=True)
+            exchange.calls.clear()
+            
+            assert await dc.stream.wait_candle_close('1m', timeout=2), "Candle close event not received"
+            market_data = await dc.get_market_data_async(timeframe='1m', limit=100)
+            assert market_data is not None
+            assert exchange.calls == [], f"Unexpected exchange calls: {exchange.calls}"
+            assert len(market_data['df']) == 100
+            assert market_data['df']['timestamp'].is_monotonic_increasing
+            assert abs(market_data['current_price'] - server.price) / server.price < 0.01
+            assert len(market_data['orderbook']['bids']) == config.STREAM_DEPTH_LEVELS
+            stream_close = market_data['df']['close'].iloc[-1]
+            assert stream_close == server.candles['1m'][-1][4] or stream_close == server.candles['1m'][-2][4]
+            print(f"  OK: Snapshot from memory, price ${market_data['current_price']:,.2f}")
+            
+            # Разрыв соединения -> переподключение с backoff
+            await server.drop_connections()
+            await wait_until(lambda: dc.stream.reconnects >= 1 and dc.stream.connected)
+            before = server.messages_sent
+            await wait_until(lambda: server.messages_sent > before + 10)
+            assert dc.stream.is_fresh()
+            print(f"  OK: Reconnected after drop ({dc.stream.reconnects} reconnect)")
+        finally:
+            await dc.close()
+            await server.stop()
+            config.BINANCE_WS_URL, config.STREAM_RECONNECT_MIN = saved
+    
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test_stream_market_data()
+    print("\nSUCCESS: All tests passed!")
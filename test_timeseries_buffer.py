@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест кольцевого буфера временного ряда"""
+
+import os
+import tempfile
+import time
+import numpy as np
+from timeseries_buffer import TimeSeriesBuffer
+
+def test_lookup_matches_linear_scan():
+    print("Testing bisect lookup vs linear scan...")
+    
+    rng = np.random.default_rng(0)
+    buf = TimeSeriesBuffer(capacity=60)
+    history = []
+    ts = 1_700_000_000.0
+    for _ in range(500):  # Многократный оборот кольца
+        ts += float(rng.uniform(10, 400))
+        value = float(rng.uniform(1e5, 2e5))
+        buf.append(value, ts=ts)
+        history.append((ts, value))
+        history = history[-60:]
+    
+    assert len(buf) == 60
+    assert np.all(np.diff(buf.timestamps) > 0), "Buffer must stay sorted"
+    assert np.allclose(buf.timestamps, [h[0] for h in history])
+    
+    for lookback in (0, 300, 3600, 4 * 3600, 10 * 86400):
+        target = ts - lookback
+        expected = min(history, key=lambda h: abs(h[0] - target))[1]
+        assert buf.value_at(target) == expected
+        expected_change = round((history[-1][1] - expected) / expected * 100, 2)
+        assert buf.change_pct(lookback, now=ts) == expected_change
+    
+    print("  OK: Nearest-point lookups match linear scan")
+
+def test_min_interval_and_order():
+    print("Testing min interval and out-of-order points...")
+    
+    buf = TimeSeriesBuffer(capacity=10, min_interval=30)
+    buf.append(1.0, ts=100)
+    buf.append(2.0, ts=110)  # ближе 30с - обновляет значение последней точки
+    buf.append(3.0, ts=150)
+    assert not buf.append(9.0, ts=120), "Older point must be rejected"
+    assert len(buf) == 2
+    assert list(buf.values) == [2.0, 3.0]
+    assert list(buf.timestamps) == [100.0, 150.0], "Updated point must keep its time"
+    
+    # Вызовы чаще min_interval не останавливают рост истории
+    frequent = TimeSeriesBuffer(capacity=10, min_interval=30)
+    for ts in range(0, 100, 10):
+        frequent.append(float(ts), ts=ts)
+    assert list(frequent.timestamps) == [0.0, 30.0, 60.0, 90.0]
+    assert list(frequent.values) == [20.0, 50.0, 80.0, 90.0]
+    
+    print("  OK: Points are spaced and sorted")
+
+def test_snapshot_roundtrip():
+    print("Testing snapshot to disk...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'series', 'oi.npz')
+        now = time.time()
+        buf = TimeSeriesBuffer(capacity=100, snapshot_path=path)
+        for i in range(50):
+            buf.append(1000.0 + i, ts=now - 5 * 3600 + i * 360)
+        buf.save()
+        
+        restored = TimeSeriesBuffer(capacity=100, snapshot_path=path)
+        assert restored.load() == 50
+        assert np.array_equal(restored.timestamps, buf.timestamps)
+        assert restored.change_pct(4 * 3600, now=now) == buf.change_pct(4 * 3600, now=now)
+        
+        # Точки старше max_age отбрасываются
+        fresh = TimeSeriesBuffer(capacity=100, snapshot_path=path)
+        loaded = fresh.load(max_age=3600)
+        assert 0 < loaded < 50
+        assert fresh.timestamps[0] >= now - 3600 - 1
+    
+    print("  OK: 4h change available right after restart")
+
+if __name__ == "__main__":
+    test_lookup_matches_linear_scan()
+    test_min_interval_and_order()
+    test_snapshot_roundtrip()
+    print("\nSUCCESS: All tests passed!")
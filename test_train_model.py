@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Тест офлайн обучения: матрица признаков, метки, walk-forward, артефакты"""
+
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import config
+import train_model
+from data_collector import DataCollector
+from fake_ohlcv import make_ohlcv
+from indicators import TechnicalIndicators
+from ml_model import MLPredictor
+from ohlcv_archive import OHLCVArchive
+
+def make_train_ohlcv(n):
+    return make_ohlcv(n, seed=21, volatility=0.004, spread=0.002)
+
+def test_feature_matrix_matches_prepare_features():
+    print("Testing batch feature matrix against prepare_features...")
+    ohlcv = make_train_ohlcv(400)
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    close, volume = df['close'].to_numpy(), df['volume'].to_numpy()
+    
+    for mode in ('swing', 'day'):
+        series = TechnicalIndicators.calculate_indicator_series(df, mode=mode)
+        market = train_model.market_columns(close, volume, 1)
+        X = MLPredictor.prepare_features_batch(series, market, mode)
+        for t in (49, 120, 250, 399):
+            prefix = df.iloc[:t + 1]
+            indicators = TechnicalIndicators.calculate_all_indicators(prefix, mode=mode)
+            market_data = {
+                'price_change_1h': DataCollector.calculate_price_change(None, prefix, 60),
+                'price_change_4h': DataCollector.calculate_price_change(None, prefix, 240),
+                'fear_greed': None,
+                'current_volume': market['current_volume'][t]
+            }
+            expected = MLPredictor.prepare_features(None, indicators, market_data, mode)[0]
+            assert np.allclose(X[t], expected, rtol=1e-6, atol=1e-9), (mode, t, X[t] - expected)
+    print(f"  OK: {X.shape[1]} day features")
+
+def test_labels_and_splits():
+    print("Testing labels and walk-forward splits...")
+    close = np.array([100, 104, 100, 96, 100, 100.0])
+    assert train_model.forward_labels(close, 1).tolist() == [2, 0, 0, 2, 1, -1]
+    
+    splits = train_model.walk_forward_splits(1000, 4, gap=10)
+    assert len(splits) == 4
+    for train, test in splits:
+        assert train[-1] + 10 < test[0]
+    assert splits[-1][1][-1] == 999
+    print("  OK")
+
+def test_train_and_install():
+    print("Testing training pipeline end to end...")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = OHLCVArchive(config.SYMBOL, '1m', tmp)
+        archive.write(make_train_ohlcv(6000))
+        df = train_model.load_candles(archive, '5m')
+        assert len(df) == 1200
+        
+        model, scaler, meta = train_model.train(df, '5m', mode='swing', folds=3, n_jobs=2)
+        assert len(meta['cv']) == 3 and meta['features'] == 18 and meta['horizon'] == 12
+        path = train_model.save_artifacts(model, scaler, meta, os.path.join(tmp, 'models'))
+        with open(os.path.join(path, 'meta.json')) as f:
+            assert json.load(f)['version'] == os.path.basename(path)
+        
+        # Установленная версия загружается ботом вместо rule-based
+        saved = config.MODEL_PATH, config.SCALER_PATH
+        config.MODEL_PATH, config.SCALER_PATH = os.path.join(tmp, 'model.pkl'), os.path.join(tmp, 'scaler.pkl')
+        try:
+            train_model.install(path)
+            predictor = MLPredictor()
+            assert predictor.model is not None
+            indicators = TechnicalIndicators.calculate_all_indicators(df, mode='swing')
+            market_data = {'price_change_1h': 0.5, 'price_change_4h': 1.0, 'fear_greed': 40, 'current_volume': 1e6}
+            prediction = predictor.predict(indicators, market_data)
+            assert prediction['signal'] in ('PUMP', 'DUMP', 'NEUTRAL') and 'reasons' not in prediction
+        finally:
+            config.MODEL_PATH, config.SCALER_PATH = saved
+        print(f"  OK: {meta['rows']} rows, fold accuracy {[round(f['accuracy'], 3) for f in meta['cv']]}")
+
+if __name__ == "__main__":
+    test_feature_matrix_matches_prepare_features()
+    test_labels_and_splits()
+    test_train_and_install()
+    print("\nSUCCESS: All tests passed!")
@@ -0,0 +1,174 @@
+"""
+Кольцевой буфер временного ряда на numpy
+Фиксированная ёмкость, отсортирован по времени, поиск по времени через
+бинарный поиск (O(log n)) и опциональный снапшот на диск, чтобы изменения
+за 1h/4h были осмысленными сразу после перезапуска
+"""
+import logging
+import os
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class TimeSeriesBuffer:
+    """
+    Кольцевой буфер (timestamp, value) с поиском по времени
+    
+    Каждая точка пишется в позиции i и i + capacity массива двойной длины,
+    поэтому активное окно всегда непрерывно и отсортировано - searchsorted
+    работает по представлению без копирования.
+    """
+    
+    def __init__(self, capacity, min_interval=0, snapshot_path=None, snapshot_every=60):
+        self.capacity = capacity
+        self.min_interval = min_interval  # Точки ближе min_interval секунд обновляют значение последней
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every  # Как часто сохранять снапшот (секунды)
+        self._ts = np.zeros(capacity * 2, dtype=np.float64)
+        self._values = np.zeros(capacity * 2, dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        self._last_snapshot = 0.0
+    
+    def __len__(self):
+        return self._size
+    
+    @property
+    def timestamps(self):
+        """Время точек (unix секунды), по возрастанию - представление без копии"""
+        return self._ts[self._start:self._start + self._size]
+    
+    @property
+    def values(self):
+        """Значения точек - представление без копии"""
+        return self._values[self._start:self._start + self._size]
+    
+    def latest(self):
+        """Последняя точка (timestamp, value) или None"""
+        if self._size == 0:
+            return None
+        i = self._start + self._size - 1
+        return float(self._ts[i]), float(self._values[i])
+    
+    def _write(self, slot, ts, value):
+        self._ts[slot] = self._ts[slot + self.capacity] = ts
+        self._values[slot] = self._values[slot + self.capacity] = value
+    
+    def append(self, value, ts=None):
+        """
+        Добавляет точку
+        
+        Args:
+            value: значение
+            ts: unix время в секундах (по умолчанию сейчас)
+        
+        Returns:
+            bool: False если точка старше последней и была отброшена
+        """
+        ts = time.time() if ts is None else float(ts)
+        last = self.latest()
+        
+        if last is not None and ts < last[0]:
+            logger.debug(f"Out-of-order point dropped: {ts} < {last[0]}")
+            return False
+        
+        if last is not None and ts - last[0] < self.min_interval:
+            # Слишком часто - обновляем значение последней точки; её время не
+            # сдвигаем, иначе при частых вызовах история перестаёт расти
+            slot = (self._start + self._size - 1) % self.capacity
+            ts = last[0]
+        elif self._size < self.capacity:
+            slot = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        
+        self._write(slot, ts, value)
+        
+        if self.snapshot_path and ts - self._last_snapshot >= self.snapshot_every:
+            self.save()
+        return True
+    
+    def index_at(self, ts):
+        """Индекс точки, ближайшей по времени к ts (или None если буфер пуст)"""
+        if self._size == 0:
+            return None
+        timestamps = self.timestamps
+        i = int(np.searchsorted(timestamps, ts))
+        if i == 0:
+            return 0
+        if i == self._size:
+            return self._size - 1
+        return i if timestamps[i] - ts < ts - timestamps[i - 1] else i - 1
+    
+    def value_at(self, ts):
+        """Значение в точке, ближайшей по времени к ts"""
+        i = self.index_at(ts)
+        return None if i is None else float(self.values[i])
+    
+    def change_pct(self, lookback, now=None):
+        """
+        Изменение последнего значения относительно значения lookback секунд назад (%)
+        
+        Returns:
+            float: изменение в процентах, 0.0 если данных недостаточно
+        """
+        if self._size < 2:
+            return 0.0
+        now = time.time() if now is None else now
+        past = self.value_at(now - lookback)
+        current = self.latest()[1]
+        if not past:
+            return 0.0
+        return round((current - past) / past * 100, 2)
+    
+    def save(self, path=None):
+        """Атомарно сохраняет буфер в .npz"""
+        path = path or self.snapshot_path
+        if not path:
+            return
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, ts=self.timestamps, values=self.values)
+            os.replace(tmp_path, path)
+            self._last_snapshot = self.latest()[0] if self._size else time.time()
+        except Exception as e:
+            logger.warning(f"Could not save series snapshot {path}: {e}")
+    
+    def load(self, path=None, max_age=None):
+        """
+        Загружает снапшот (точки старше max_age секунд отбрасываются)
+        
+        Returns:
+            int: Количество загруженных точек
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path) as data:
+                ts, values = data['ts'], data['values']
+        except Exception as e:
+            logger.warning(f"Could not load series snapshot {path}: {e}")
+            return 0
+        
+        if max_age is not None:
+            keep = ts >= time.time() - max_age
+            ts, values = ts[keep], values[keep]
+        ts, values = ts[-self.capacity:], values[-self.capacity:]
+        
+        n = len(ts)
+        self._start = 0
+        self._size = n
+        self._ts[:n] = self._ts[self.capacity:self.capacity + n] = ts
+        self._values[:n] = self._values[self.capacity:self.capacity + n] = values
+        if n:
+            self._last_snapshot = float(ts[-1])
+        logger.info(f"Loaded {n} points from {path}")
+        return n
@@ -0,0 +1,248 @@
+"""
+Офлайн обучение MLPredictor на исторических свечах
+Матрица признаков prepare_features строится по всей истории одним векторным
+проходом (calculate_indicator_series + prepare_features_batch), метка строки -
+доходность через горизонт относительно MIN_PRICE_CHANGE_PUMP/DUMP.
+Walk-forward кросс-валидация: фолды обучаются параллельно на всех ядрах
+(joblib), между обучающей и тестовой частью - зазор в горизонт метки, чтобы
+метки обучения не заглядывали в тестовый период. Артефакты пишутся в
+<MODEL_DIR>/<версия>/ (model.pkl, scaler.pkl, meta.json)
+
+Запуск (свечи - из архива ohlcv_archive.py):
+    python ohlcv_archive.py --days 365
+    python train_model.py --mode day --days 365 --install
+"""
+import argparse
+import logging
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+from sklearn.preprocessing import StandardScaler
+import config
+from candle_store import OHLCV_COLUMNS, resample_ohlcv, timeframe_to_ms
+from feature_schema import schema_for
+from indicators import TechnicalIndicators
+from ml_model import MLPredictor, default_model
+from model_registry import ModelRegistry
+from ohlcv_archive import OHLCVArchive
+
+logger = logging.getLogger(__name__)
+
+# Классы как signal_map в MLPredictor.predict
+DUMP, NEUTRAL, PUMP = 0, 1, 2
+
+# calculate_all_indicators возвращает None на меньшей истории
+MIN_HISTORY = 50
+
+def load_candles(archive, timeframe, start_ms=None):
+    """Свечи архива как DataFrame; старший таймфрейм агрегируется из базового"""
+    ts, values = archive.read(start_ms)
+    if timeframe != archive.timeframe and len(ts):
+        # Первый бар может быть неполным - начинаем с границы (как CandleStore.resample)
+        tf_ms = timeframe_to_ms(timeframe)
+        start = int(np.searchsorted(ts, -(-int(ts[0]) // tf_ms) * tf_ms))
+        bars = resample_ohlcv(ts[start:], values[:, start:], tf_ms)
+        ts, values = bars[:, 0].astype(np.int64), bars[:, 1:].T
+    df = pd.DataFrame(values.T, columns=OHLCV_COLUMNS[1:])
+    df.insert(0, 'timestamp', pd.to_datetime(ts, unit='ms'))
+    return df
+
+def market_columns(close, volume, tf_minutes):
+    """
+    Колонки market_data на каждой свече (как _build_market_data)
+    
+    Истории F&G нет - NaN (prepare_features подставляет 50); объём за 24ч
+    тикера приближается суммой close * volume свечей за сутки.
+    """
+    n = len(close)
+    
+    def price_change(periods):
+        # calculate_price_change: close[-1] против close[-periods], 0 при нехватке истории
+        past = np.r_[np.full(periods - 1, np.nan), close[:n - periods + 1]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.round((close - past) / past * 100, 2)
+        return np.where(np.isfinite(change), change, 0.0)
+    
+    day = max(1, 1440 // tf_minutes)
+    quote = np.cumsum(close * volume)
+    quote[day:] -= quote[:-day].copy()
+    
+    return {
+        'price_change_1h': price_change(max(1, 60 // tf_minutes)),
+        'price_change_4h': price_change(max(1, 240 // tf_minutes)),
+        'fear_greed': np.full(n, np.nan),
+        'current_volume': quote
+    }
+
+def forward_labels(close, horizon):
+    """
+    Класс строки по доходности через horizon свечей
+    
+    Returns:
+        numpy array: PUMP / DUMP / NEUTRAL; -1 - будущего ещё нет
+    """
+    labels = np.full(len(close), -1, dtype=np.int8)
+    if horizon < len(close):
+        change = (close[horizon:] - close[:-horizon]) / close[:-horizon] * 100
+        labels[:-horizon] = np.where(change >= config.MIN_PRICE_CHANGE_PUMP, PUMP,
+                                     np.where(change <= config.MIN_PRICE_CHANGE_DUMP, DUMP, NEUTRAL))
+    return labels
+
+def build_dataset(df, timeframe, mode='swing', horizon=None):
+    """
+    Матрица признаков и метки по истории свечей
+    
+    Args:
+        horizon: горизонт метки в свечах (по умолчанию TRAIN_HORIZON_MINUTES)
+    
+    Returns:
+        tuple: (X, y, timestamps) только по строкам с признаками и меткой
+    """
+    tf_minutes = timeframe_to_ms(timeframe) // 60_000
+    horizon = horizon or max(1, config.TRAIN_HORIZON_MINUTES // tf_minutes)
+    series = TechnicalIndicators.calculate_indicator_series(df, mode=mode)
+    close = df['close'].to_numpy(dtype=np.float64)
+    market = market_columns(close, df['volume'].to_numpy(dtype=np.float64), tf_minutes)
+    
+    X = MLPredictor.prepare_features_batch(series, market, mode)
+    y = forward_labels(close, horizon)
+    valid = (y >= 0) & np.isfinite(X).all(axis=1)
+    valid[:MIN_HISTORY - 1] = False
+    return X[valid], y[valid], df['timestamp'].to_numpy()[valid]
+
+def walk_forward_splits(n, folds, gap):
+    """
+    Walk-forward разбиение: тест - очередной отрезок, обучение - всё до него
+    
+    Первый из folds + 1 отрезков - только обучение; последние gap строк
+    перед тестом выбрасываются (их метки смотрят в тестовый период).
+    """
+    edges = np.linspace(0, n, folds + 2).astype(int)
+    splits = []
+    for k in range(1, folds + 1):
+        train_end = edges[k] - gap
+        if train_end <= 0 or edges[k + 1] <= edges[k]:
+            continue
+        splits.append((np.arange(train_end), np.arange(edges[k], edges[k + 1])))
+    return splits
+
+def _fit_fold(X, y, train, test):
+    """Обучение и оценка одного фолда (в отдельном процессе)"""
+    scaler = StandardScaler().fit(X[train])
+    model = default_model(n_jobs=1).fit(scaler.transform(X[train]), y[train])
+    predicted = model.predict(scaler.transform(X[test]))
+    actual = y[test]
+    classes = [DUMP, PUMP]
+    precision = precision_score(actual, predicted, labels=classes, average=None, zero_division=0)
+    recall = recall_score(actual, predicted, labels=classes, average=None, zero_division=0)
+    return {
+        'train': len(train),
+        'test': len(test),
+        'accuracy': float(accuracy_score(actual, predicted)),
+        'precision_dump': float(precision[0]),
+        'precision_pump': float(precision[1]),
+        'recall_dump': float(recall[0]),
+        'recall_pump': float(recall[1]),
+        'signals': float(np.mean(predicted != NEUTRAL))
+    }
+
+def cross_validate(X, y, folds=None, gap=0, n_jobs=-1):
+    """Walk-forward кросс-валидация, фолды - параллельно (joblib, по процессу на фолд)"""
+    splits = walk_forward_splits(len(y), folds or config.TRAIN_CV_FOLDS, gap)
+    return Parallel(n_jobs=n_jobs)(delayed(_fit_fold)(X, y, train, test) for train, test in splits)
+
+def train(df, timeframe, mode='swing', horizon=None, folds=None, n_jobs=-1):
+    """
+    Кросс-валидация и итоговая модель на всей истории
+    
+    Returns:
+        tuple: (model, scaler, meta) - meta с параметрами и метриками фолдов
+    """
+    tf_minutes = timeframe_to_ms(timeframe) // 60_000
+    horizon = horizon or max(1, config.TRAIN_HORIZON_MINUTES // tf_minutes)
+    X, y, timestamps = build_dataset(df, timeframe, mode, horizon)
+    if len(y) == 0:
+        raise ValueError("No labelled rows: history is too short")
+    logger.info(f"Dataset {mode} {timeframe}: {X.shape[0]} rows x {X.shape[1]} features, "
+                f"classes {np.bincount(y, minlength=3).tolist()}")
+    
+    start = time.perf_counter()
+    cv = cross_validate(X, y, folds, gap=horizon, n_jobs=n_jobs)
+    logger.info(f"Cross-validation: {len(cv)} folds in {time.perf_counter() - start:.1f}s")
+    
+    scaler = StandardScaler().fit(X)
+    model = default_model(n_jobs=n_jobs).fit(scaler.transform(X), y)
+    meta = {
+        'mode': mode,
+        'timeframe': timeframe,
+        'horizon': horizon,
+        'features': X.shape[1],
+        'schema': schema_for(mode).to_meta(),
+        'rows': X.shape[0],
+        'classes': np.bincount(y, minlength=3).tolist(),
+        'start': str(pd.Timestamp(timestamps[0])),
+        'end': str(pd.Timestamp(timestamps[-1])),
+        'pump_threshold': config.MIN_PRICE_CHANGE_PUMP,
+        'dump_threshold': config.MIN_PRICE_CHANGE_DUMP,
+        'cv': cv
+    }
+    return model, scaler, meta
+
+def save_artifacts(model, scaler, meta, directory=None):
+    """
+    Пишет версию артефактов в реестр: <directory>/<UTC время>-<режим>/
+    
+    Запущенный бот подхватывает её за config.MODEL_RELOAD_INTERVAL.
+    
+    Returns:
+        str: Путь к версии
+    """
+    return ModelRegistry(directory).save(model, scaler, meta)
+
+def install(path, model_path=None, scaler_path=None):
+    """Копирует версию в пути, которые загружает MLPredictor (атомарно, по файлу)"""
+    for name, target in (('model.pkl', model_path or config.MODEL_PATH), ('scaler.pkl', scaler_path or config.SCALER_PATH)):
+        shutil.copyfile(os.path.join(path, name), f"{target}.tmp")
+        os.replace(f"{target}.tmp", target)
+
+def _run(args):
+    timeframe = args.timeframe or (config.DAY_TIMEFRAME if args.mode == 'day' else config.TIMEFRAME)
+    archive = OHLCVArchive(args.symbol, config.BASE_TIMEFRAME, args.archive_dir)
+    start_ms = int((time.time() - args.days * 86400) * 1000) if args.days else None
+    
+    start = time.perf_counter()
+    df = load_candles(archive, timeframe, start_ms)
+    print(f"Loaded {len(df)} {timeframe} candles in {time.perf_counter() - start:.1f}s")
+    
+    horizon = max(1, args.horizon // (timeframe_to_ms(timeframe) // 60_000))
+    model, scaler, meta = train(df, timeframe, args.mode, horizon, args.folds, args.jobs)
+    meta['symbol'] = archive.symbol
+    for i, fold in enumerate(meta['cv']):
+        print(f"fold {i}: train {fold['train']}, test {fold['test']}, accuracy {fold['accuracy']:.3f}, "
+              f"precision PUMP {fold['precision_pump']:.3f} DUMP {fold['precision_dump']:.3f}, "
+              f"signals {fold['signals']:.1%}")
+    
+    path = save_artifacts(model, scaler, meta, args.model_dir)
+    print(f"Saved {path} ({time.perf_counter() - start:.1f}s total)")
+    if args.install:
+        install(path)
+        print(f"Installed as {config.MODEL_PATH}, {config.SCALER_PATH}")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Train MLPredictor on archived candles')
+    parser.add_argument('--symbol', default=config.SYMBOL)
+    parser.add_argument('--mode', default=config.TRADING_MODE, choices=['swing', 'day'])
+    parser.add_argument('--timeframe', default=None, help='Default: TIMEFRAME for swing, DAY_TIMEFRAME for day')
+    parser.add_argument('--days', type=int, default=None, help='Default: the whole archive')
+    parser.add_argument('--horizon', type=int, default=config.TRAIN_HORIZON_MINUTES, help='Label horizon in minutes')
+    parser.add_argument('--folds', type=int, default=config.TRAIN_CV_FOLDS)
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--archive-dir', default=config.ARCHIVE_DIR)
+    parser.add_argument('--model-dir', default=config.MODEL_DIR)
+    parser.add_argument('--install', action='store_true', help='Copy the new version to MODEL_PATH / SCALER_PATH')
+    _run(parser.parse_args())